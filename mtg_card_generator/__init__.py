@@ -1,6 +1,12 @@
-import logging
 import os
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(filename)s - %(levelname)s - %(message)s')
-
 REPOSITORY_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def configure_logging():
+    """
+    Sets up the log format used by the scripts. Only the scripts call this, so importing the package doesn't
+    configure logging for programs that use it as a library.
+    """
+    import logging
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(filename)s - %(levelname)s - %(message)s')
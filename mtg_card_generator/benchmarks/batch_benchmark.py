@@ -0,0 +1,51 @@
+"""
+Benchmark comparing cards per second when generating one card at a time with generate_card against
+generating the whole batch with generate_cards, as the batch size grows. Each is timed --repeat times and the
+fastest is reported, as the slower runs only measure whatever else the machine was doing.
+
+Usage: python -m mtg_card_generator.benchmarks.batch_benchmark [-c CARD_TYPE] [-n 10 100 1000] [-tcl LENGTH]
+                                                              [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+
+import mtg_card_generator
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark cards per second of single and batch card generation.")
+    parser.add_argument("-c", "--card-type", default="Creature")
+    parser.add_argument("-n", "--number", help="Batch sizes to time.", nargs="+", type=int,
+                        default=[10, 100, 1000, 10000])
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    parser.add_argument("--repeat", help="Times to time each batch size.", type=int, default=5)
+    args = parser.parse_args()
+    mtg_card_generator.configure_logging()
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length)
+    # Warm the successor tables up so that neither side pays for building them
+    generate_card.generate_cards(model, args.card_type, 1000, seed=0)
+
+    print(f"{'n':>8} {'single (cards/s)':>18} {'batch (cards/s)':>18}")
+    for number in args.number:
+        single_seconds, batch_seconds = [], []
+        for repeat in range(args.repeat):
+            rng = random.Random(repeat)
+            start = time.perf_counter()
+            for i in range(number):
+                generate_card.generate_card(model, args.card_type, rng)
+            single_seconds.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            generate_card.generate_cards(model, args.card_type, number, seed=repeat)
+            batch_seconds.append(time.perf_counter() - start)
+        single, batch = number / min(single_seconds), number / min(batch_seconds)
+        print(f"{number:>8} {single:>18.0f} {batch:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
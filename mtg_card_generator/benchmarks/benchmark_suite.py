@@ -0,0 +1,185 @@
+"""
+Times each stage of the pipeline on synthetic corpora of increasing size (see synthetic_corpus), offline:
+    training      aggregator.gather_data, in cards per second
+    tokenization  tokenizer.read_tokens and chunkify on every line of rules text, in lines per second
+    walking       generate_card.generate_text_chunk_list, in cards per second
+    inference     generate_card.determine_random_card_variable for the cmc, colors and rarity, in cards per second
+    mana_cost     generate_card.determine_mana_cost, in cards per second
+    rendering     render_text.render_text, in cards per second
+
+Each stage is timed `--repeats` times and the fastest is kept. The results can be written as JSON with --output,
+and compared against the JSON of an earlier run with --baseline, which exits with status 1 if any stage got
+slower by more than --tolerance.
+
+Usage: python -m mtg_card_generator.benchmarks.benchmark_suite [-s 1000 10000 100000] [-o RESULTS.json]
+                                                                [--baseline OLD.json]
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from typing import Callable, Dict, List
+
+from mtg_card_generator import REPOSITORY_PATH
+import mtg_card_generator.benchmarks.synthetic_corpus as synthetic_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.render_text as render_text
+
+STAGES = ("training", "tokenization", "walking", "inference", "mana_cost", "rendering")
+# Card types walked, so that the creature and planeswalker parameters are covered
+CARD_TYPES = ("Creature", "Instant", "Planeswalker")
+INFERRED_ATTRIBUTES = (["cmcs"], ["colors"], ["rarities"])
+
+
+def best_time(stage: Callable[[], None], repeats: int) -> float:
+    """
+    Returns the fewest seconds the stage took over a number of runs.
+    """
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_scale(scale: int, chunk_length: int, cards_generated: int, repeats: int, seed: int) -> List[Dict]:
+    """
+    Times every stage on a synthetic corpus of `scale` cards.
+
+    Returns:
+        List[Dict]: For each stage, its name, the number of operations it timed, the seconds they took and the
+                    operations per second
+    """
+    cards = list(synthetic_corpus.synthetic_cards(scale, seed))
+    lines = [line.strip() for card_type, c, card_lines in aggregator.preprocess(cards) for line in card_lines]
+
+    def tokenize():
+        # The line cache would otherwise turn every repeat after the first into lookups
+        tokenizer._read_line.cache_clear()
+        for tokens in tokenizer.read_tokens(lines):
+            tokenizer.chunkify(tokens, chunk_length)
+
+    model = aggregator.gather_data(cards, chunk_length)
+    rng = random.Random(seed)
+    walked = [(card_type, generate_card.generate_text_chunk_list(model, card_type, rng))
+              for card_type in CARD_TYPES for i in range(cards_generated // len(CARD_TYPES))]
+    costs = [(rng.randint(0, 3), rng.randint(3, 6), rng.choice([["W"], ["U", "B"], ["R", "G", "W"]]))
+             for i in range(len(walked))]
+
+    def walk():
+        walk_rng = random.Random(seed)
+        for card_type, generated_lines in walked:
+            generate_card.generate_text_chunk_list(model, card_type, walk_rng)
+
+    def infer():
+        infer_rng = random.Random(seed)
+        for card_type, generated_lines in walked:
+            for var_names in INFERRED_ATTRIBUTES:
+                generate_card.determine_random_card_variable(generated_lines, var_names, infer_rng)
+
+    def mana_cost():
+        cost_rng = random.Random(seed)
+        for pip_intensity, cmc, colors in costs:
+            generate_card.determine_mana_cost(pip_intensity, cmc, colors, False, cost_rng)
+
+    def render():
+        for card_type, generated_lines in walked:
+            render_text.render_text(generated_lines)
+
+    stages = {
+        "training": (len(cards), lambda: aggregator.gather_data(cards, chunk_length)),
+        "tokenization": (len(lines), tokenize),
+        "walking": (len(walked), walk),
+        "inference": (len(walked), infer),
+        "mana_cost": (len(costs), mana_cost),
+        "rendering": (len(walked), render),
+    }
+    results = []
+    for stage in STAGES:
+        operations, function = stages[stage]
+        seconds = best_time(function, repeats)
+        results.append({"scale": scale, "stage": stage, "operations": operations, "seconds": round(seconds, 6),
+                        "per_second": round(operations / seconds, 1)})
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPOSITORY_PATH, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> bool:
+    """
+    Prints the change in operations per second of each stage against an earlier run.
+
+    Returns:
+        bool: Whether no stage got slower by more than the tolerance (a fraction)
+    """
+    previous = {(r["scale"], r["stage"]): r["per_second"] for r in baseline["results"]}
+    passed = True
+    print(f"\nAgainst {baseline.get('commit', 'baseline')}:")
+    for r in results:
+        if (r["scale"], r["stage"]) not in previous:
+            continue
+        change = r["per_second"] / previous[r["scale"], r["stage"]] - 1
+        regressed = change < -tolerance
+        passed &= not regressed
+        print(f"{r['scale']:>8} {r['stage']:>14} {change:>+9.1%}{'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark every stage of the pipeline on synthetic card corpora.")
+    parser.add_argument("-s", "--scales", help="Numbers of synthetic cards to train on.", nargs="+", type=int,
+                        default=[1000, 10000])
+    parser.add_argument("-n", "--number", help="Cards to generate for the generation stages at each scale.",
+                        type=int, default=3000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    parser.add_argument("-r", "--repeats", help="Times to run each stage, keeping the fastest.", type=int, default=3)
+    parser.add_argument("--seed", help="Seed of the synthetic corpora and generated cards.", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--tolerance", help="Slowdown of a stage that counts as a regression against the "
+                                            "baseline. Defaults to 0.1 (10%%).", type=float, default=0.1)
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "text_chunk_length": args.text_chunk_length,
+        "seed": args.seed,
+        "results": [],
+    }
+    print(f"{'scale':>8} {'stage':>14} {'ops':>8} {'seconds':>10} {'ops/s':>12}")
+    for scale in args.scales:
+        for r in run_scale(scale, args.text_chunk_length, args.number, args.repeats, args.seed):
+            print(f"{r['scale']:>8} {r['stage']:>14} {r['operations']:>8} {r['seconds']:>10.4f} "
+                  f"{r['per_second']:>12.0f}")
+            report["results"].append(r)
+
+    if args.output:
+        with open(args.output, "w") as F:
+            json.dump(report, F, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as F:
+            baseline = json.load(F)
+        sys.exit(0 if compare(report["results"], baseline, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
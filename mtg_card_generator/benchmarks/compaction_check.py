@@ -0,0 +1,112 @@
+"""
+Checks that compacting the chunk graph (see sampling.ChainSampler.compact) leaves the generated lines unchanged, and
+reports how many fewer steps walks take with it and how much less time.
+
+For each card type, walks the same seeded cards with a sampler that draws one chunk at a time and with a compacted
+one, both one card at a time and in batches, with and without a cap on line length, and checks that every line is
+the same. Identical lines from identical seeds are a stronger check than comparing the distributions of lines, and
+the counts of distinct lines are printed too. The times are the fastest of --repeat walks of each, taking turns so
+that both see the same load on the machine. Exits with status 1 if any line differs.
+
+Usage: python -m mtg_card_generator.benchmarks.compaction_check [-n 20000] [-tcl 3] [--cap 8] [--repeat 5]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from collections import Counter
+from typing import List, Optional
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.sampling as sampling
+
+
+def walk_steps(run_ends, line: List[int]) -> int:
+    """
+    Counts the steps a compacted walk takes to walk a line: one per chunk drawn and one per run taken.
+    """
+    steps, i = 0, 0
+    while i < len(line) - 1:
+        end = run_ends[line[i]]
+        i += 1
+        if end >= 0:
+            while line[i] != end:
+                i += 1
+        steps += 1
+    return steps
+
+
+def walk_cards(sampler, number: int, seed: int, batch: bool, max_line_chunks: Optional[int]):
+    """
+    Returns:
+        Tuple[List[List[List[int]]], float]: The walked cards, and the seconds they took to walk
+    """
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    if batch:
+        cards = sampler.walk_batch(number, rng, max_line_chunks)
+    else:
+        cards = [sampler.walk(rng, max_line_chunks) for i in range(number)]
+    return cards, time.perf_counter() - start
+
+
+def check(type_model, number: int, seed: int, cap: int, repeat: int = 1) -> bool:
+    stepwise = sampling.ChainSampler(type_model)
+    compacted = sampling.ChainSampler(type_model).compact()
+    in_runs = sum(1 for end in compacted.run_ends if end >= 0)
+    held = sum(len(run) for run in {id(run): run for run in compacted.runs if run is not None}.values())
+    print(f"\n{type_model.card_type}: {len(type_model)} chunks, {in_runs} with a single successor, "
+          f"{held} chunks held in run tuples")
+    print(f"{'walk':>6} {'cap':>4} {'chunks/line':>12} {'steps/line':>11} {'lines':>8} {'distinct':>9} "
+          f"{'stepwise s':>11} {'compact s':>10} {'speedup':>8} {'same':>5}")
+
+    same_everywhere = True
+    for batch in (False, True):
+        for max_line_chunks in (None, cap):
+            stepwise_seconds = compacted_seconds = float("inf")
+            for i in range(repeat):
+                expected, seconds = walk_cards(stepwise, number, seed, batch, max_line_chunks)
+                stepwise_seconds = min(stepwise_seconds, seconds)
+                actual, seconds = walk_cards(compacted, number, seed, batch, max_line_chunks)
+                compacted_seconds = min(compacted_seconds, seconds)
+            same = expected == actual
+            same_everywhere &= same
+            lines = [tuple(line) for card in actual for line in card]
+            chunks = sum(len(line) for line in lines)
+            steps = sum(walk_steps(compacted.run_ends, list(line)) + 1 for line in lines)
+            same_distribution = Counter(tuple(line) for card in expected for line in card) == Counter(lines)
+            print(f"{'batch' if batch else 'card':>6} {max_line_chunks or '-':>4} "
+                  f"{chunks / max(len(lines), 1):>12.2f} {steps / max(len(lines), 1):>11.2f} {len(lines):>8} "
+                  f"{len(set(lines)):>9} {stepwise_seconds:>11.3f} {compacted_seconds:>10.3f} "
+                  f"{stepwise_seconds / compacted_seconds:>7.2f}x "
+                  f"{'yes' if same and same_distribution else 'NO':>5}")
+    return same_everywhere
+
+
+def main():
+    parser = argparse.ArgumentParser("Check that compacting the chunk graph leaves generated lines unchanged.")
+    parser.add_argument("-c", "--card-type", nargs="+", choices=list(mtg_text_classes.CARD_TYPE_TO_CLASS),
+                        default=list(mtg_text_classes.CARD_TYPE_TO_CLASS))
+    parser.add_argument("-n", "--number", help="Cards to walk for each card type.", type=int, default=20000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    parser.add_argument("--cap", help="Value of --max-line-chunks to check with.", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", help="Walks to time of each kind, keeping the fastest.", type=int, default=5)
+    args = parser.parse_args()
+
+    mtg_card_generator.configure_logging()
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length)
+    if not all([check(model[card_type], args.number, args.seed, args.cap, args.repeat)
+                for card_type in args.card_type]):
+        print("\nCompacted walks differ from stepwise walks.")
+        sys.exit(1)
+    print("\nCompacted walks match stepwise walks.")
+
+
+if __name__ == "__main__":
+    main()
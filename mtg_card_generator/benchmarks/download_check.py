@@ -0,0 +1,158 @@
+"""
+Checks api_fetch.download_cards against a local stand-in for the magicthegathering.io cards endpoint,
+without touching the network:
+    - a flaky server, whose first request for every page fails, still yields every card in page order,
+      with several requests in flight at once
+    - a download interrupted by a page that keeps failing resumes from its checkpointed pages, requesting
+      only the pages that were missing
+
+The stand-in can also be left running for manual use with --serve.
+
+Usage: python -m mtg_card_generator.benchmarks.download_check [--cards N] [--workers N] [--serve PORT]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch
+
+
+class StubCardsAPI(ThreadingHTTPServer):
+    """
+    Serves `num_cards` synthetic cards in pages of api_fetch.PAGE_SIZE at /v1/cards?page=N, starting from page 0.
+    Keeps count of the requests made for each page and of the most requests in flight at once.
+    """
+    daemon_threads = True
+
+    def __init__(self, num_cards: int, fail_first: bool = False, broken_pages=(), delay: float = 0.01,
+                 port: int = 0):
+        """
+        Parameters:
+            num_cards (int): Number of cards to serve
+            fail_first (bool): Whether to answer the first request for every page with a 500
+            broken_pages (Iterable[int]): Pages to always answer with a 503
+            delay (float): Seconds to take over every response
+            port (int): Port to listen on, any free port by default
+        """
+        super().__init__(("127.0.0.1", port), StubCardsHandler)
+        self.num_cards = num_cards
+        self.fail_first = fail_first
+        self.broken_pages = set(broken_pages)
+        self.delay = delay
+
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/cards"
+
+    def page(self, page: int):
+        return [{"name": f"Card {i}", "types": ["Instant"], "text": f"Draw {i} cards."}
+                for i in range(page * api_fetch.PAGE_SIZE, min((page + 1) * api_fetch.PAGE_SIZE, self.num_cards))]
+
+
+class StubCardsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        page = int(parse_qs(urlparse(self.path).query).get("page", ["0"])[0])
+        with server.lock:
+            server.requests[page] = server.requests.get(page, 0) + 1
+            first_request = server.requests[page] == 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            if page in server.broken_pages:
+                self.send_error(503)
+            elif server.fail_first and first_request:
+                self.send_error(500)
+            else:
+                body = json.dumps({"cards": server.page(page)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serving(server: StubCardsAPI) -> StubCardsAPI:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def check_flaky_download(num_cards: int, workers: int):
+    server = serving(StubCardsAPI(num_cards, fail_first=True))
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_path = os.path.join(directory, "pages")
+        cards = api_fetch.download_cards(checkpoint_path, server.url, workers, retries=2, backoff=0.01)
+        assert [c["name"] for c in cards] == [f"Card {i}" for i in range(num_cards)], "cards missing or out of order"
+        assert not os.path.exists(checkpoint_path), "checkpoint left behind after a complete download"
+    server.shutdown()
+    assert server.max_in_flight > 1 or workers == 1, "pages were not requested concurrently"
+    print(f"flaky download: {len(cards)} cards, {sum(server.requests.values())} requests, "
+          f"up to {server.max_in_flight} in flight")
+
+
+def check_resumed_download(num_cards: int, workers: int):
+    broken_page = num_cards // api_fetch.PAGE_SIZE // 2
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_path = os.path.join(directory, "pages")
+
+        server = serving(StubCardsAPI(num_cards, broken_pages=[broken_page]))
+        try:
+            api_fetch.download_cards(checkpoint_path, server.url, workers, retries=1, backoff=0.01)
+            raise AssertionError("download with a broken page did not fail")
+        except api_fetch.requests.RequestException:
+            pass
+        server.shutdown()
+        checkpointed = len(os.listdir(checkpoint_path))
+        assert checkpointed >= broken_page, "completed pages were not checkpointed"
+
+        server = serving(StubCardsAPI(num_cards))
+        cards = api_fetch.download_cards(checkpoint_path, server.url, workers, retries=1, backoff=0.01)
+        server.shutdown()
+        assert [c["name"] for c in cards] == [f"Card {i}" for i in range(num_cards)], "cards missing or out of order"
+        assert broken_page in server.requests and len(server.requests) < num_cards // api_fetch.PAGE_SIZE + 1, \
+            "checkpointed pages were requested again"
+    print(f"resumed download: {checkpointed} pages checkpointed before the failure, "
+          f"{len(server.requests)} requested on resuming")
+
+
+def main():
+    parser = argparse.ArgumentParser("Check the card downloader against a local stand-in for the API.")
+    parser.add_argument("--cards", help="Number of cards the stand-in serves.", type=int, default=2050)
+    parser.add_argument("--workers", help="Number of pages to request at once.", type=int, default=8)
+    parser.add_argument("--serve", help="Keep the stand-in running on this port instead of running the checks.",
+                        type=int)
+    args = parser.parse_args()
+    mtg_card_generator.configure_logging()
+
+    if args.serve is not None:
+        server = StubCardsAPI(args.cards, delay=0, port=args.serve)
+        print(f"Serving {args.cards} cards at {server.url}")
+        server.serve_forever()
+        return
+
+    check_flaky_download(args.cards, args.workers)
+    check_resumed_download(args.cards, args.workers)
+
+
+if __name__ == "__main__":
+    main()
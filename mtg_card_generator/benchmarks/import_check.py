@@ -0,0 +1,85 @@
+"""
+Runs make_mtg_card under `python -X importtime` and fails if a run that doesn't need them imports the download
+or training code: nltk, requests and the aggregator are never needed to generate cards from a saved model, and
+--help needs none of the model code at all. Prints the import time of each run and its slowest imports.
+
+The model is trained and saved first if it isn't saved already, so the generation run only loads it.
+
+Usage: python -m mtg_card_generator.benchmarks.import_check [-tcl N] [--show N]
+"""
+
+import argparse
+import subprocess
+import sys
+
+from typing import List, Tuple
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+SCRIPT = "mtg_card_generator.scripts.make_mtg_card"
+# Modules (and their submodules) that each run mustn't import
+GENERATION_FORBIDDEN = ("nltk", "requests", "multiprocessing",
+                        "mtg_card_generator.data_processing.card_data_aggregator.aggregator",
+                        "mtg_card_generator.data_processing.card_data_aggregator.api_fetch")
+HELP_FORBIDDEN = GENERATION_FORBIDDEN + ("mtg_card_generator.data_processing",
+                                         "mtg_card_generator.generator.generate_card")
+
+
+def import_times(arguments: List[str]) -> List[Tuple[str, int, int, int]]:
+    """
+    Runs the script with -X importtime.
+
+    Returns:
+        List[Tuple[str, int, int, int]]: Every module imported, with how deeply it is nested in other imports and
+                                         its own and cumulative import time in microseconds
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-m", SCRIPT] + arguments,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(f"{SCRIPT} {' '.join(arguments)} failed:\n{process.stderr}")
+
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            # Nested imports are indented by two spaces per level
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            times.append((name.strip(), depth, int(own), int(cumulative)))
+    return times
+
+
+def check(arguments: List[str], forbidden: Tuple[str, ...], show: int) -> bool:
+    times = import_times(arguments)
+    total = sum(cumulative for name, depth, own, cumulative in times if depth == 0)
+    found = [name for name, depth, own, cumulative in times
+             if any(name == f or name.startswith(f + ".") for f in forbidden)]
+
+    print(f"make_mtg_card {' '.join(arguments)}: {len(times)} modules, {total / 1000:.1f} ms importing")
+    for name, depth, own, cumulative in sorted(times, key=lambda t: t[3], reverse=True)[:show]:
+        print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+    if found:
+        print(f"    imported {', '.join(found)}, which it doesn't need")
+    return not found
+
+
+def main():
+    parser = argparse.ArgumentParser("Check that make_mtg_card only imports what each run needs.")
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to generate with.", type=int,
+                        default=3)
+    parser.add_argument("--show", help="Number of slowest imports to print for each run.", type=int, default=5)
+    args = parser.parse_args()
+    mtg_card_generator.configure_logging()
+
+    # Trains and saves the model if it isn't saved already
+    initialize.initialize_aggregated_data(args.text_chunk_length)
+
+    passed = check(["--help"], HELP_FORBIDDEN, args.show)
+    passed &= check(["--no-server", "-tcl", str(args.text_chunk_length)], GENERATION_FORBIDDEN, args.show)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark comparing attribute inference with Fractions against the log-space inference engine,
+over cards of increasing length.
+
+Usage: python -m mtg_card_generator.benchmarks.inference_benchmark [-c CARD_TYPE] [-tcl LENGTH]
+"""
+
+import argparse
+import random
+import time
+
+from fractions import Fraction
+from types import SimpleNamespace
+
+import mtg_card_generator
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.inference as inference
+import mtg_card_generator.generator.probability_calculation as probability_calculation
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+CARD_LENGTHS = [10, 20, 40, 80, 160]
+
+
+def fraction_determine_random_card_variable(lines, var_names):
+    """
+    The attribute inference as it was before generator.inference, kept here as the baseline.
+    Takes the lines from legacy_lines.
+    """
+    probability_dict = {}
+    fallback_total = 1
+    for line in lines:
+        for text_chunk in line:
+            dictionary_to_use = vars(text_chunk)[var_names[0]]
+            for i in range(1, len(var_names)):
+                dictionary_to_use = dictionary_to_use.get(var_names[i], {})
+
+            probability_dict = probability_calculation.multiply_probability(
+                probability_dict,
+                dictionary_to_use,
+                Fraction(1, fallback_total),
+                Fraction(1, text_chunk.total_cards_registered)
+            )
+            fallback_total *= text_chunk.total_cards_registered
+
+    return generate_card.select_random(probability_dict)
+
+
+def log_space_determine_random_card_variable(lines, var_names):
+    return inference.sample(inference.log_posterior(lines, var_names))
+
+
+def legacy_lines(lines):
+    """
+    Copies the dictionaries of proportions off the text chunks, as they used to be stored on them.
+    """
+    return [[SimpleNamespace(total_cards_registered=chunk.total_cards_registered,
+                             **{attribute: getattr(chunk, attribute) for attribute in ["cmcs", "colors", "rarities"]})
+             for chunk in line] for line in lines]
+
+
+def card_of_length(model, card_type: str, length: int):
+    """
+    Walks lines until the card holds at least `length` text chunks.
+    """
+    lines = []
+    while sum(len(line) for line in lines) < length:
+        lines.extend(generate_card.generate_text_chunk_list(model, card_type))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark attribute inference over cards of increasing length.")
+    parser.add_argument("-c", "--card-type", default="Planeswalker")
+    parser.add_argument("-r", "--repeats", help="Cards to time per length.", type=int, default=5)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    args = parser.parse_args()
+    mtg_card_generator.configure_logging()
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length)
+    random.seed(0)
+
+    print(f"{'chunks':>8} {'Fraction (s/card)':>20} {'log space (s/card)':>20}")
+    for length in CARD_LENGTHS:
+        cards = [card_of_length(model, args.card_type, length) for i in range(args.repeats)]
+        timings = []
+        for determine, card_lines in [(fraction_determine_random_card_variable, [legacy_lines(c) for c in cards]),
+                                      (log_space_determine_random_card_variable, cards)]:
+            start = time.perf_counter()
+            for lines in card_lines:
+                for var_names in [["cmcs"], ["colors"], ["rarities"]]:
+                    determine(lines, var_names)
+            timings.append((time.perf_counter() - start) / len(cards))
+        print(f"{length:>8} {timings[0]:>20.5f} {timings[1]:>20.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Reports how long walked lines get, and how long each card takes to walk, with and without --max-line-chunks.
+
+For each card type, prints the chain analysis of the model (see chain_analysis): how many chunks can't reach a
+full stop, and the largest fewest and expected steps from a chunk to one. Then walks cards one at a time
+uncapped and with each cap, and prints the percentiles of the chunks per line and of the time per card.
+
+Usage: python -m mtg_card_generator.benchmarks.line_length_report [-n 20000] [-tcl 2] [--caps 8 16]
+"""
+
+import argparse
+import random
+import time
+
+from typing import List, Optional, Sequence
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentiles(values: List[float]) -> List[float]:
+    """
+    Returns the values at PERCENTILES followed by the largest value.
+    """
+    values = sorted(values)
+    return [values[min(len(values) - 1, int(len(values) * p / 100))] for p in PERCENTILES] + [values[-1]]
+
+
+def walk_cards(sampler, number: int, seed: int, max_line_chunks: Optional[int]):
+    """
+    Walks cards one at a time.
+
+    Returns:
+        Tuple[List[int], List[float]]: The chunks on every line walked, and the seconds each card took
+    """
+    rng = random.Random(seed)
+    line_chunks, seconds = [], []
+    for i in range(number):
+        start = time.perf_counter()
+        lines = sampler.walk(rng, max_line_chunks)
+        seconds.append(time.perf_counter() - start)
+        line_chunks += [len(line) for line in lines]
+    return line_chunks, seconds
+
+
+def report(model, card_types: Sequence[str], number: int, seed: int, caps: Sequence[int]):
+    headings = [f"p{p}" for p in PERCENTILES] + ["max"]
+    for card_type in card_types:
+        type_model = model[card_type]
+        analysis = type_model.analysis_arrays()
+        steps, expected = analysis["steps_to_full_stop"], analysis["expected_steps"]
+        terminating = [e for s, e in zip(steps, expected) if s >= 0]
+        print(f"\n{card_type}: {len(type_model)} chunks, {len(steps) - len(terminating)} can't reach a full stop, "
+              f"at most {max(steps)} steps from one, at most {max(terminating):.1f} expected steps")
+        print(f"{'cap':>6} {'':>14} " + " ".join(f"{h:>9}" for h in headings))
+        for cap in [None] + list(caps):
+            line_chunks, seconds = walk_cards(type_model.sampler, number, seed, cap)
+            print(f"{cap or '-':>6} {'chunks/line':>14} " + " ".join(f"{v:>9}" for v in percentiles(line_chunks)))
+            print(f"{'':>6} {'us/card':>14} " + " ".join(f"{v * 1e6:>9.1f}" for v in percentiles(seconds)))
+
+
+def main():
+    parser = argparse.ArgumentParser("Report line lengths and walk times with and without a cap on line length.")
+    parser.add_argument("-c", "--card-type", nargs="+", choices=list(mtg_text_classes.CARD_TYPE_TO_CLASS),
+                        default=["Creature", "Instant"])
+    parser.add_argument("-n", "--number", help="Cards to walk for each card type and cap.", type=int, default=20000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=2)
+    parser.add_argument("--caps", help="Values of --max-line-chunks to compare.", nargs="+", type=int,
+                        default=[8, 16])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mtg_card_generator.configure_logging()
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length)
+    report(model, args.card_type, args.number, args.seed, args.caps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Reports how long the search for the most probable lines (see line_search.top_lines) takes with each beam width,
+and checks the lines it finds against sampling.
+
+For each card type, searches for the k most probable lines with each beam width and prints the time taken and the
+log probability of the best and k-th best line found. Wider beams can only find lines at least as probable. Then
+walks lines at random and prints, for each line the widest search found, its probability next to how often it was
+walked, which should agree to within sampling noise.
+
+Usage: python -m mtg_card_generator.benchmarks.line_search_report [-k 10] [--beam-widths 10 100 1000] [-n 200000]
+"""
+
+import argparse
+import math
+import random
+import time
+
+from collections import Counter
+from typing import Sequence
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.line_search as line_search
+import mtg_card_generator.generator.render_text as render_text
+
+
+def report(type_model, k: int, beam_widths: Sequence[int], max_line_chunks: int, number: int, seed: int):
+    print(f"\n{type_model.card_type}: {len(type_model)} chunks")
+    print(f"{'beam':>6} {'ms':>9} {'best':>9} {'k-th':>9}")
+    lines = []
+    for beam_width in beam_widths:
+        start = time.perf_counter()
+        lines = line_search.top_lines(type_model, k, beam_width, max_line_chunks)
+        seconds = time.perf_counter() - start
+        print(f"{beam_width:>6} {seconds * 1000:>9.2f} {lines[0][0]:>9.3f} {lines[-1][0]:>9.3f}" if lines else
+              f"{beam_width:>6} {seconds * 1000:>9.2f} {'-':>9} {'-':>9}")
+
+    rng = random.Random(seed)
+    walked = Counter(tuple(type_model.sampler.walk_line(rng)) for i in range(number))
+    print(f"{'p':>9} {'walked':>9}  line")
+    for log_probability, line in lines:
+        text = render_text.render_words(type_model.line_tokens(line)).strip()
+        print(f"{math.exp(log_probability):>9.5f} {walked[tuple(line)] / number:>9.5f}  {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser("Report the time and results of searching for the most probable lines.")
+    parser.add_argument("-c", "--card-type", nargs="+", choices=list(mtg_text_classes.CARD_TYPE_TO_CLASS),
+                        default=["Creature", "Instant"])
+    parser.add_argument("-k", help="Number of lines to search for.", type=int, default=10)
+    parser.add_argument("--beam-widths", help="Beam widths to compare.", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--max-line-chunks", help="Most chunks a line may have.", type=int,
+                        default=line_search.DEFAULT_MAX_LINE_CHUNKS)
+    parser.add_argument("-n", "--number", help="Lines to walk for each card type.", type=int, default=200000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mtg_card_generator.configure_logging()
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length, card_types=args.card_type)
+    for card_type in args.card_type:
+        report(model[card_type], args.k, args.beam_widths, args.max_line_chunks, args.number, args.seed)
+
+
+if __name__ == "__main__":
+    main()
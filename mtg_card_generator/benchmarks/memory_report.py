@@ -0,0 +1,127 @@
+"""
+Reports the resident memory taken by the trained model in each of its representations:
+    - objects: one Python object per text chunk holding OrderedDicts of Fractions, as before markov_model
+    - arrays: the array-backed model held in process memory, as after training
+    - mmap: the array-backed model read from its memory-mapped file
+
+Every measurement runs in a fresh interpreter so that they don't share freed memory.
+
+Usage: python -m mtg_card_generator.benchmarks.memory_report [-tcl 2 3 4]
+"""
+
+import argparse
+import array
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from collections import OrderedDict
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.card_data_aggregator.model_store as model_store
+import mtg_card_generator.generator.probability_calculation as probability_calculation
+
+REPRESENTATIONS = ["objects", "arrays", "mmap"]
+
+
+class LegacyTextChunk:
+    """
+    Stand-in with the same attributes as the TextChunk objects that used to make up the model.
+    """
+    def __init__(self, type_model, index: int):
+        self.text_chunk = type_model.tokens(index)
+        self.is_full_stop = bool(type_model.full_stop[index])
+        self.total_cards_registered = type_model.cards_registered[index]
+        self.successors = OrderedDict()
+        self.formatted = True
+        for attribute, table in type_model.satellites.items():
+            dictionary = table.dictionary(index)
+            for inner in (dictionary.values() if table.nested else [dictionary]):
+                probability_calculation.format_dictionary(inner)
+            setattr(self, attribute, dictionary)
+
+
+def resident_memory() -> int:
+    """
+    Returns the resident set size of this process in bytes (the peak, where the current size is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as F:
+            return int(F.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(path: str, corpus_key: str, chunk_length: int, representation: str) -> int:
+    """
+    Loads the model at path in the given representation and returns how much resident memory that took.
+    """
+    gc.collect()
+    before = resident_memory()
+    model = model_store.load_model(path, corpus_key, chunk_length)
+
+    if representation == "objects":
+        legacy = {}
+        for card_type in model:
+            type_model = model[card_type]
+            chunks = [LegacyTextChunk(type_model, i) for i in range(len(type_model))]
+            for i, chunk in enumerate(chunks):
+                chunk.successors.update((chunks[t], c) for t, c in type_model.successor_items(i))
+                probability_calculation.format_dictionary(chunk.successors)
+            legacy[card_type] = chunks
+        del model
+    else:
+        for type_model in [model[card_type] for card_type in model]:
+            owners = [(type_model, name) for name in type_model.ARRAY_NAMES]
+            owners += [(table, name) for table in type_model.satellites.values()
+                       for name in ["offsets", "key_ids", "counts"]]
+            for owner, name in owners:
+                values = getattr(owner, name)
+                if representation == "arrays":
+                    setattr(owner, name, array.array(values.format, values.tobytes()))
+                else:
+                    # Fault every page of the mapping in, as generating enough cards eventually would
+                    sum(values)
+        model.format_probabilities()
+
+    gc.collect()
+    return resident_memory() - before
+
+
+def main():
+    parser = argparse.ArgumentParser("Report the resident memory of each representation of the model.")
+    parser.add_argument("-tcl", "--text-chunk-length", nargs="+", type=int, default=[2, 3, 4])
+    parser.add_argument("--measure", nargs=4, metavar=("PATH", "CORPUS_HASH", "LENGTH", "REPRESENTATION"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        path, corpus_key, chunk_length, representation = args.measure
+        print(json.dumps(measure(path, corpus_key, int(chunk_length), representation)))
+        return
+
+    mtg_card_generator.configure_logging()
+    # Imported here so that the measuring interpreters don't pay for it
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+    print(f"{'tcl':>4} " + " ".join(f"{r + ' (MiB)':>14}" for r in REPRESENTATIONS))
+    for chunk_length in args.text_chunk_length:
+        # Trains and saves the model if it isn't saved already
+        initialize.initialize_aggregated_data(chunk_length)
+        corpus_key = model_store.corpus_hash(initialize.CARDS_CACHE_PATH)
+        path = model_store.model_path(corpus_key, chunk_length)
+
+        results = []
+        for representation in REPRESENTATIONS:
+            output = subprocess.run([sys.executable, "-m", __spec__.name, "--measure", path, corpus_key,
+                                     str(chunk_length), representation],
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.splitlines()[-1]) / 2 ** 20)
+        print(f"{chunk_length:>4} " + " ".join(f"{r:>14.1f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
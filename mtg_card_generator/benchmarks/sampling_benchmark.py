@@ -0,0 +1,81 @@
+"""
+Benchmark comparing random walk throughput with and without precomputed alias tables.
+
+Usage: python -m mtg_card_generator.benchmarks.sampling_benchmark [-n CARDS] [-tcl LENGTH]
+"""
+
+import argparse
+import random
+import time
+
+from collections import OrderedDict
+
+import mtg_card_generator
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.probability_calculation as probability_calculation
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+
+def select_random_walk(type_model, dictionaries):
+    """
+    Walks a card the way generate_text_chunk_list did before alias tables, calling select_random on
+    dictionaries of Fractions. The dictionaries are built on first use and cached, as they used to live
+    on the text chunks.
+    """
+    lines = []
+    for i in range(generate_card.select_random(dictionaries["lines"])):
+        current_chunk = generate_card.select_random(dictionaries["opening"])
+        current_line = [current_chunk]
+        while not type_model.full_stop[current_chunk]:
+            successors = dictionaries["successors"].get(current_chunk)
+            if successors is None:
+                successors = probability_calculation.format_dictionary(
+                    OrderedDict(type_model.successor_items(current_chunk)))
+                dictionaries["successors"][current_chunk] = successors
+            current_chunk = generate_card.select_random(successors)
+            current_line.append(current_chunk)
+        lines.append(current_line)
+    return lines
+
+
+def time_walks(walk, number: int):
+    """
+    Walks `number` cards and returns the number of chunks visited and the seconds taken.
+    """
+    steps = 0
+    start = time.perf_counter()
+    for i in range(number):
+        steps += sum(len(line) for line in walk())
+    return steps, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark walk steps per second before and after alias tables.")
+    parser.add_argument("-n", "--number", help="Number of cards to walk per card type.", type=int, default=2000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    parser.add_argument("-c", "--card-type", nargs="+", default=["Creature", "Instant", "Planeswalker"])
+    args = parser.parse_args()
+    mtg_card_generator.configure_logging()
+
+    model = initialize.initialize_aggregated_data(args.text_chunk_length)
+
+    for card_type in args.card_type:
+        type_model = model[card_type]
+        dictionaries = {
+            "lines": probability_calculation.format_dictionary(type_model.lines_in_text()),
+            "opening": probability_calculation.format_dictionary(
+                OrderedDict(zip(type_model.opening_chunks, type_model.opening_counts))),
+            "successors": {},
+        }
+        # Each twice so the second pass shows the cost once every reachable dictionary or table has been built
+        for label, walk in [("select_random (cold)", lambda: select_random_walk(type_model, dictionaries)),
+                            ("select_random (warm)", lambda: select_random_walk(type_model, dictionaries)),
+                            ("alias (cold)", type_model.sampler.walk),
+                            ("alias (warm)", type_model.sampler.walk)]:
+            random.seed(0)
+            steps, seconds = time_walks(walk, args.number)
+            print(f"{card_type:>12} {label:>20}: {steps / seconds:12.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
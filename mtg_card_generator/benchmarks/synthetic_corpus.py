@@ -0,0 +1,155 @@
+"""
+Generates a deterministic corpus of synthetic cards shaped like the cards of the magicthegathering.io API, so the
+benchmarks can run offline and at any scale. The same number of cards and seed always give the same cards.
+
+The rules text is assembled from templates of real rules text (keywords with reminder text, triggered and
+activated abilities, modal spells, loyalty abilities). The card's name is written out where "~" would be, as it
+is on real cards, so that training does the same work on it as on the real card data.
+
+Usage: python -m mtg_card_generator.benchmarks.synthetic_corpus NUMBER PATH [--seed SEED]
+"""
+
+import argparse
+import random
+
+from typing import Dict, Iterator, List
+
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+
+# Card types and how often they turn up
+CARD_TYPES = {"Creature": 45, "Instant": 12, "Sorcery": 12, "Enchantment": 10, "Artifact": 10, "Land": 6,
+              "Planeswalker": 5}
+COLORS = ["White", "Blue", "Black", "Red", "Green"]
+RARITIES = {"Common": 50, "Uncommon": 30, "Rare": 15, "Mythic": 5}
+SUBTYPES = ["Human", "Elf", "Goblin", "Zombie", "Wizard", "Soldier", "Warrior", "Spirit", "Dragon", "Beast",
+            "Vampire", "Merfolk", "Knight", "Cleric", "Rogue", "Angel", "Elemental", "Cat", "Bird", "Drake"]
+NAME_WORDS = ["Ancient", "Blazing", "Silent", "Vengeful", "Gilded", "Hollow", "Radiant", "Feral", "Grim",
+              "Tidal", "Storm", "Ember", "Thorn", "Shadow", "Iron", "Crystal", "Wild", "Sacred"]
+
+KEYWORDS = [
+    "Flying (This creature can't be blocked except by creatures with flying or reach.)",
+    "Trample", "Haste", "Vigilance", "Deathtouch", "Lifelink", "Reach", "First strike", "Menace", "Defender",
+    "Flash (You may cast this spell any time you could cast an instant.)",
+    "Hexproof (This creature can't be the target of spells or abilities your opponents control.)",
+]
+TRIGGERS = [
+    "When <name> enters the battlefield", "Whenever <name> attacks", "When <name> dies",
+    "At the beginning of your upkeep", "Whenever you cast an instant or sorcery spell",
+    "Whenever another creature you control dies", "At the beginning of your end step",
+]
+EFFECTS = [
+    "draw a card", "you gain <n> life", "target creature gets +<n>/+<n> until end of turn",
+    "<name> deals <n> damage to any target", "destroy target artifact or enchantment",
+    "create a <n>/<n> green Elf Warrior creature token", "put a +1/+1 counter on target creature you control",
+    "target player discards a card", "return target creature to its owner's hand", "scry <n>",
+    "exile target card from a graveyard", "each opponent loses <n> life", "tap target creature an opponent controls",
+    "search your library for a basic land card, put it onto the battlefield tapped, then shuffle",
+]
+SPELL_EFFECTS = [
+    "Counter target spell.", "Destroy target creature.", "Draw <n> cards.",
+    "<name> deals <n> damage to target creature or planeswalker.", "Target creature gets +<n>/+<n> until end of turn.",
+    "Return target creature card from your graveyard to your hand.", "Exile target nonland permanent.",
+    "Each player sacrifices a creature.", "Create two <n>/<n> white Soldier creature tokens.",
+]
+COSTS = ["{T}", "<generic>, {T}", "<generic><mana>", "Sacrifice <name>", "<mana>, Pay <n> life"]
+LAND_LINES = ["{T}: Add {C}.", "{T}: Add <mana>.", "<name> enters the battlefield tapped.",
+              "{T}, Pay 1 life: Add <mana> or <mana>."]
+
+
+def synthetic_cards(number: int, seed: int = 0) -> Iterator[Dict]:
+    """
+    Generates synthetic cards one at a time.
+
+    Parameters:
+        number (int): Number of cards to generate
+        seed (int): Seed for the cards. The same number and seed give the same cards.
+
+    Returns:
+        Iterator[Dict]: Cards with the fields of card_corpus.CORPUS_FIELDS
+    """
+    rng = random.Random(seed)
+    card_types, type_weights = list(CARD_TYPES), list(CARD_TYPES.values())
+    rarities, rarity_weights = list(RARITIES), list(RARITIES.values())
+    for i in range(number):
+        card_type = rng.choices(card_types, type_weights)[0]
+        name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {i}"
+        card = {"name": name, "types": [card_type], "rarity": rng.choices(rarities, rarity_weights)[0],
+                "multiverseid": i + 1}
+
+        if card_type == "Land":
+            card["cmc"] = 0.0
+            pips = [c[0] if c != "Blue" else "U" for c in rng.sample(COLORS, 2)]
+            lines = [_fill(rng.choice(LAND_LINES), rng, name, pips) for j in range(rng.randint(1, 2))]
+        else:
+            colors = rng.sample(COLORS, rng.choices([0, 1, 2], [10, 70, 20])[0])
+            pips = [c[0] if c != "Blue" else "U" for c in colors] or ["C"]
+            pip_intensity = rng.randint(1, 3) if colors else 0
+            cmc = pip_intensity + rng.randint(0 if pip_intensity else 1, 4)
+            card["cmc"] = float(cmc)
+            card["manaCost"] = "".join([f"{{{cmc - pip_intensity}}}"] if cmc > pip_intensity else []) + \
+                "".join(f"{{{pips[j % len(pips)]}}}" for j in range(pip_intensity))
+            if colors:
+                card["colors"] = colors
+            lines = _rules_text(card_type, rng, name, pips)
+
+            if card_type == "Creature":
+                card["subtypes"] = rng.sample(SUBTYPES, rng.choices([1, 2], [70, 30])[0])
+                card["power"] = str(max(0, cmc + rng.randint(-2, 1)))
+                card["toughness"] = str(max(1, cmc + rng.randint(-1, 2)))
+            elif card_type == "Planeswalker":
+                card["loyalty"] = str(rng.randint(2, 6))
+
+        card["text"] = "\n".join(lines)
+        yield card
+
+
+def _rules_text(card_type: str, rng: random.Random, name: str, pips: List[str]) -> List[str]:
+    if card_type == "Planeswalker":
+        return [_fill(f"{cost}: {_sentence(rng.choice(EFFECTS))}.", rng, name, pips)
+                for cost in ("+1", f"−{rng.randint(1, 3)}", f"−{rng.randint(5, 8)}")]
+    if card_type in ("Instant", "Sorcery"):
+        if rng.random() < 0.15:
+            modes = rng.sample(SPELL_EFFECTS, 3)
+            return ["Choose one —"] + [_fill(f"• {m}", rng, name, pips) for m in modes]
+        return [_fill(rng.choice(SPELL_EFFECTS), rng, name, pips) for j in range(rng.randint(1, 2))]
+
+    lines = []
+    if card_type == "Creature" and rng.random() < 0.6:
+        lines.append(", ".join(k.split(" (")[0] for k in rng.sample(KEYWORDS, rng.randint(1, 2))) if
+                     rng.random() < 0.3 else rng.choice(KEYWORDS))
+    for j in range(rng.choices([0, 1, 2], [20, 60, 20])[0] if lines else rng.randint(1, 2)):
+        if rng.random() < 0.6:
+            lines.append(_fill(f"{rng.choice(TRIGGERS)}, {rng.choice(EFFECTS)}.", rng, name, pips))
+        else:
+            lines.append(_fill(f"{rng.choice(COSTS)}: {_sentence(rng.choice(EFFECTS))}.", rng, name, pips))
+    return lines
+
+
+def _fill(template: str, rng: random.Random, name: str, pips: List[str]) -> str:
+    # Every placeholder gets its own draw
+    while "<n>" in template:
+        template = template.replace("<n>", str(rng.randint(1, 4)), 1)
+    while "<generic>" in template:
+        template = template.replace("<generic>", f"{{{rng.randint(1, 4)}}}", 1)
+    while "<mana>" in template:
+        template = template.replace("<mana>", f"{{{rng.choice(pips)}}}", 1)
+    return template.replace("<name>", name)
+
+
+def _sentence(effect: str) -> str:
+    return effect[0].upper() + effect[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser("Write a corpus of synthetic cards.")
+    parser.add_argument("number", help="Number of cards to generate.", type=int)
+    parser.add_argument("path", help="Corpus file to write (see card_corpus).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    written = card_corpus.write_corpus(args.path, synthetic_cards(args.number, args.seed))
+    print(f"Wrote {written} cards to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark of tokenizer throughput on the rules text in the card cache: NLTK's word_tokenize (if installed),
+the rules text tokenizer on every line, and read_tokens, which also reuses the tokens of lines seen before.
+Also times counting the whole cache, which tokenizing used to dominate.
+
+Usage: python -m mtg_card_generator.benchmarks.tokenizer_benchmark [-tcl LENGTH]
+"""
+
+import argparse
+import time
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+
+
+def time_lines(tokenize, lines) -> float:
+    """
+    Returns the lines tokenized per second.
+    """
+    start = time.perf_counter()
+    for line in lines:
+        tokenize(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark tokenizer throughput on the card cache.")
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to count with.", type=int, default=3)
+    args = parser.parse_args()
+
+    cards = list(card_corpus.read_corpus(initialize.CARDS_CACHE_PATH))
+    lines = [line.strip() for card_type, c, card_lines in aggregator.preprocess(cards) for line in card_lines]
+
+    tokenizers = [("tokenizer.word_tokenize", tokenizer.word_tokenize),
+                  ("tokenizer.read_tokens", lambda line: tokenizer.read_tokens([line]))]
+    try:
+        import nltk
+        tokenizers.insert(0, ("nltk.word_tokenize", nltk.tokenize.word_tokenize))
+    except ImportError:
+        print("nltk is not installed, skipping it")
+
+    print(f"{len(lines)} lines")
+    for name, tokenize in tokenizers:
+        print(f"{name:>24}: {time_lines(tokenize, lines):>10.0f} lines/s")
+
+    tokenizer._read_line.cache_clear()
+    start = time.perf_counter()
+    aggregator.count_data(cards, args.text_chunk_length)
+    print(f"{'count_data':>24}: {time.perf_counter() - start:>10.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Compares the tokens of every line of rules text in the card cache between tokenizer.read_tokens and
+nltk.tokenize.word_tokenize, which it replaced, and lists the lines where they differ.
+Needs nltk and its Punkt model (nltk.download("punkt")) to be installed.
+
+Usage: python -m mtg_card_generator.benchmarks.tokenizer_conformance [--show N]
+"""
+
+import argparse
+import sys
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser("Compare the rules text tokenizer against NLTK on the card cache.")
+    parser.add_argument("--show", help="Number of differing lines to print.", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        import nltk
+    except ImportError:
+        sys.exit("nltk is not installed, so there is nothing to compare against.")
+
+    cards = card_corpus.read_corpus(initialize.CARDS_CACHE_PATH)
+
+    lines = {line.strip() for card_type, c, card_lines in aggregator.preprocess(cards) for line in card_lines}
+    differences = []
+    for line in sorted(lines):
+        expected = [w.lower() for w in nltk.tokenize.word_tokenize(line)]
+        actual = tokenizer.read_tokens([line])[0]
+        if actual != expected:
+            differences.append((line, expected, actual))
+
+    for line, expected, actual in differences[:args.show]:
+        print(f"{line!r}\n    nltk:      {expected}\n    tokenizer: {actual}")
+    print(f"{len(differences)} of {len(lines)} distinct lines differ")
+    sys.exit(1 if differences else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Reports the memory of each generation worker (see parallel_generation) while several of them hold the saved model:
+    - private: the workers build the alias tables and log weights of the model in their own memory, as they did
+      before the model file carried them
+    - shared: the workers read the alias tables and log weights from the memory-mapped model file, so they share
+      those pages
+
+The workers load the model, generate cards of every type and then report from /proc/self/smaps_rollup while all
+of them are still running: RSS, PSS (shared pages counted once across the processes sharing them) and private
+memory. Needs Linux, and a model saved since the model file carried the alias tables (re-save it with
+make_mtg_card --force-retrain otherwise).
+
+Usage: python -m mtg_card_generator.benchmarks.worker_memory [-j 4] [-n 2000] [-tcl 3]
+"""
+
+import argparse
+import multiprocessing
+import random
+
+from typing import Dict
+
+import mtg_card_generator
+import mtg_card_generator.data_processing.card_data_aggregator.model_store as model_store
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.generate_card as generate_card
+
+MODES = ["private", "shared"]
+FIELDS = ("Rss", "Pss", "Private_Clean", "Private_Dirty")
+
+
+def memory_kib() -> Dict[str, int]:
+    """
+    Returns the fields of FIELDS from /proc/self/smaps_rollup, in KiB.
+    """
+    values = {}
+    with open("/proc/self/smaps_rollup") as F:
+        for line in F:
+            name, _, rest = line.partition(":")
+            if name in FIELDS:
+                values[name] = int(rest.split()[0])
+    return values
+
+
+def worker(path: str, corpus_key: str, chunk_length: int, mode: str, number: int, seed: int, barrier, results):
+    model = model_store.load_model(path, corpus_key, chunk_length)
+    if mode == "private":
+        for type_model in [model[card_type] for card_type in model]:
+            type_model.alias_probabilities = type_model.alias_indices = None
+            for table in type_model.satellites.values():
+                table.log_weights = None
+    model.format_probabilities()
+
+    rng = random.Random(seed)
+    for card_type in mtg_text_classes.CARD_TYPE_TO_CLASS:
+        for i in range(number):
+            generate_card.generate_card(model, card_type, rng)
+
+    # Measured once every worker has built what it needs, so that PSS splits the shared pages between all of them
+    barrier.wait()
+    results.put(memory_kib())
+    barrier.wait()
+
+
+def measure(path: str, corpus_key: str, chunk_length: int, mode: str, jobs: int, number: int) -> Dict[str, float]:
+    """
+    Runs `jobs` workers in the given mode.
+
+    Returns:
+        Dict[str, float]: The mean of each field of FIELDS over the workers, in MiB
+    """
+    barrier = multiprocessing.Barrier(jobs)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(path, corpus_key, chunk_length, mode, number, seed,
+                                                              barrier, results))
+                 for seed in range(jobs)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for process in processes]
+    for process in processes:
+        process.join()
+    return {name: sum(m[name] for m in measurements) / len(measurements) / 1024 for name in FIELDS}
+
+
+def main():
+    parser = argparse.ArgumentParser("Report the memory of generation workers with and without shared tables.")
+    parser.add_argument("-j", "--jobs", help="Number of worker processes.", type=int, default=4)
+    parser.add_argument("-n", "--number", help="Cards of each type every worker generates.", type=int, default=2000)
+    parser.add_argument("-tcl", "--text-chunk-length", help="Length of text chunk to use.", type=int, default=3)
+    args = parser.parse_args()
+
+    mtg_card_generator.configure_logging()
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+    # Trains and saves the model if it isn't saved already
+    initialize.initialize_aggregated_data(args.text_chunk_length)
+    corpus_key = model_store.corpus_hash(initialize.CARDS_CACHE_PATH)
+    path = model_store.model_path(corpus_key, args.text_chunk_length)
+
+    print(f"{args.jobs} workers, per worker (MiB):")
+    print(f"{'mode':>8} " + " ".join(f"{name:>14}" for name in FIELDS))
+    for mode in MODES:
+        result = measure(path, corpus_key, args.text_chunk_length, mode, args.jobs, args.number)
+        print(f"{mode:>8} " + " ".join(f"{result[name]:>14.1f}" for name in FIELDS))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,122 @@
-from collections import OrderedDict
+import collections
+import itertools
 import re
-from typing import Dict, List, Tuple
 
-import mtg_card_generator.generator.probability_calculation as probability_calculation
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
 import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
 import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+import mtg_card_generator.generator.novelty as novelty
+
+CARD_TYPE_TO_CLASS = mtg_text_classes.CARD_TYPE_TO_CLASS
 
-CARD_TYPE_TO_CLASS = {
-    "Creature": mtg_text_classes.CreatureTextChunk,
-    "Instant": mtg_text_classes.TextChunk,
-    "Sorcery": mtg_text_classes.TextChunk,
-    "Enchantment": mtg_text_classes.TextChunk,
-    "Planeswalker": mtg_text_classes.PlaneswalkerTextChunk,
-    "Artifact": mtg_text_classes.TextChunk,
-    "Land": mtg_text_classes.TextChunk
-}
+REMINDER_TEXT = re.compile(r"\([^)]+\)")
+BULLET = re.compile(" ?• ?")
+# Number of cards sent to a worker at a time when counting with several jobs
+PARTITION_SIZE = 2000
 
 
-def gather_data(cards: List[Dict], chunk_length: int = 3) -> Tuple[Dict, Dict, Dict]:
+def gather_data(cards: Iterable[Dict], chunk_length: int = 3, jobs: int = 1,
+                card_types: Optional[Sequence[str]] = None) -> markov_model.MarkovModel:
     """
-    Scrapes all data from an input list of cards into three dictionaries that
+    Scrapes all data from an input list of cards into a model that
     can be used to generate Magic: The Gathering cards.
 
+    This is count_data, then build_model, then formatting the model.
+
     Parameters:
-        cards (List[dict]): List of Magic: the Gathering cards from the API
+        cards (Iterable[dict]): Magic: the Gathering cards from the API, e.g. card_corpus.read_corpus
         chunk_length (int): Number of chunks to break the text into (see data_processing.word_processing.tokenizer)
                             In general, larger chunks will lead to more coherent but less original cards.
+        jobs (int): Number of processes to count the cards with (see count_data)
+        card_types (Optional[Sequence[str]]): Card types to build the model for, by default every card type
 
     Returns:
-        Tuple[Dict, Dict, Dict]: Three dictionaries in order; the text chunk dictionary (containing all known text
-                                 chunks), a dictionary containing all text chunks that have begun a line, and a
-                                 dictionary containing the number of lines in a card.
-                                 In each case, the dictionary maps the key to the proportion of times that key has been
-                                 observed on cards (i.e. number of lines -> num times that num lines has been seen)
-    """
-    text_chunk_dictionary = {
-        "Creature": OrderedDict(),
-        "Instant": OrderedDict(),
-        "Sorcery": OrderedDict(),
-        "Enchantment": OrderedDict(),
-        "Planeswalker": OrderedDict(),
-        "Artifact": OrderedDict(),
-        "Land": OrderedDict()
-    }
-
-    opening_text = {
-        "Creature": OrderedDict(),
-        "Instant": OrderedDict(),
-        "Sorcery": OrderedDict(),
-        "Enchantment": OrderedDict(),
-        "Planeswalker": OrderedDict(),
-        "Artifact": OrderedDict(),
-        "Land": OrderedDict()
-    }
-
-    lines_in_text = {
-        "Creature": OrderedDict(),
-        "Instant": OrderedDict(),
-        "Sorcery": OrderedDict(),
-        "Enchantment": OrderedDict(),
-        "Planeswalker": OrderedDict(),
-        "Artifact": OrderedDict(),
-        "Land": OrderedDict(),
-    }
+        markov_model.MarkovModel: The model, holding for each card type all known text chunks, the text chunks
+                                  that have begun a line and the number of lines in a card. In each case it counts
+                                  the number of times that key has been observed on cards
+                                  (i.e. number of lines -> num times that num lines has been seen)
+    """
+    return build_model(count_data(cards, chunk_length, jobs, card_types), chunk_length).format_probabilities()
+
+
+def count_data(cards: Iterable[Dict], chunk_length: int = 3, jobs: int = 1,
+               card_types: Optional[Sequence[str]] = None) -> Dict[str, markov_model.CardTypeCounts]:
+    """
+    Counts all data from the input cards, for each card type. The cards are consumed one at a time, so they can
+    be streamed from disk.
+
+    With more than one job, the cards are taken in consecutive partitions of PARTITION_SIZE that are counted by a
+    pool of processes, and the counts of each partition are merged in order (see CardTypeCounts.merge). The result
+    is identical to counting serially. Only a few partitions per job are read ahead of the merge.
+
+    Parameters:
+        cards (Iterable[dict]): Magic: the Gathering cards from the API
+        chunk_length (int): Number of chunks to break the text into (see data_processing.word_processing.tokenizer)
+        jobs (int): Number of processes to count the cards with
+        card_types (Optional[Sequence[str]]): Card types to count, by default every card type. Cards of other
+                                              types are skipped.
+
+    Returns:
+        Dict[str, markov_model.CardTypeCounts]: The counts of each card type
+    """
+    return count_orders(cards, [chunk_length], jobs, card_types)[chunk_length]
+
+
+def count_orders(cards: Iterable[Dict], chunk_lengths: Sequence[int], jobs: int = 1,
+                 card_types: Optional[Sequence[str]] = None) -> Dict[int, Dict[str, markov_model.CardTypeCounts]]:
+    """
+    Counts the data for several chunk lengths in a single pass over the cards, so that every card is only
+    cleaned up, tokenized and has its features extracted once. See count_data.
 
+    Parameters:
+        cards (Iterable[dict]): Magic: the Gathering cards from the API
+        chunk_lengths (Sequence[int]): Chunk lengths to count the data for
+        jobs (int): Number of processes to count the cards with
+        card_types (Optional[Sequence[str]]): Card types to count, see count_data
+
+    Returns:
+        Dict[int, Dict[str, markov_model.CardTypeCounts]]: The counts of each card type, for each chunk length
+    """
+    if jobs <= 1:
+        return count_partition(cards, chunk_lengths, card_types)
+    # Only imported when counting in parallel, as multiprocessing is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+
+    cards = iter(cards)
+    partitions = iter(lambda: list(itertools.islice(cards, PARTITION_SIZE)), [])
+    counts = count_partition([], chunk_lengths, card_types)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for partition in itertools.chain(partitions, [None]):
+            if partition is not None:
+                pending.append(executor.submit(count_partition, partition, chunk_lengths, card_types))
+            while pending and (partition is None or len(pending) > 2 * jobs):
+                for chunk_length, other in pending.popleft().result().items():
+                    for card_type, type_counts in other.items():
+                        counts[chunk_length][card_type].merge(type_counts)
+    return counts
+
+
+def card_key(card: Dict):
+    """
+    Identifies a card across downloads, by its multiverse id where it has one and otherwise by its name.
+    """
+    return card.get("multiverseid") or card["name"]
+
+
+def preprocess(cards: Iterable[Dict]) -> Iterator[Tuple[str, Dict, List[str]]]:
+    """
+    Cleans up the rules text of each card that can be trained on, one card at a time: the card's name is
+    replaced with "~", reminder text is removed and modal bullets are dropped.
+
+    Parameters:
+        cards (Iterable[dict]): Magic: the Gathering cards from the API
+
+    Returns:
+        Iterator[Tuple[str, dict, List[str]]]: The card type, card and lines of rules text of each card
+    """
     for c in cards:
         card_type = c["types"][0]
         if card_type not in CARD_TYPE_TO_CLASS:
@@ -73,51 +126,103 @@ def gather_data(cards: List[Dict], chunk_length: int = 3) -> Tuple[Dict, Dict, D
             # Support for flip cards not implemented yet
             continue
         lines = c.get("text", "").replace(c["name"], "~")
-        lines = re.sub("\([^)]+\)", "", lines)
+        lines = REMINDER_TEXT.sub("", lines)
         lines = lines.split("\n")
 
-        i = 1
         for i in range(len(lines)):
             if "•" in lines[i]:
-                lines[i] = re.sub(" ?• ?", "", lines[i])
+                lines[i] = BULLET.sub("", lines[i])
+
+        yield card_type, c, lines
+
 
-        lines_in_text[card_type][len(lines)] = lines_in_text[card_type].setdefault(len(lines), 0) + 1
+def count_partition(cards: Iterable[Dict], chunk_lengths: Sequence[int],
+                    card_types: Optional[Sequence[str]] = None) -> Dict[int, Dict[str, markov_model.CardTypeCounts]]:
+    """
+    Counts the data of a list of cards serially. See count_orders.
+    """
+    card_types = list(card_types or CARD_TYPE_TO_CLASS)
+    counts = {chunk_length: {card_type: markov_model.CardTypeCounts(card_type, CARD_TYPE_TO_CLASS[card_type])
+                             for card_type in card_types}
+              for chunk_length in chunk_lengths}
 
+    for card_type, c, lines in preprocess(cards):
+        if card_type not in card_types:
+            continue
+        features = CARD_TYPE_TO_CLASS[card_type].card_features(c)
         tokenized_lines = tokenizer.read_tokens(lines)
-        chunkified_lines = [tokenizer.chunkify(t, chunk_length) for t in tokenized_lines]
-
-        for chunkified in chunkified_lines:
-            previous_chunk: mtg_text_classes.TextChunk = None
-            for i, t in enumerate(chunkified):
-
-                is_start = i == 0
-                is_full_stop = i == len(chunkified) - 1
-                chunk_hash = mtg_text_classes.text_chunk_hash(t, is_full_stop)
-
-                if chunk_hash not in text_chunk_dictionary[card_type]:
-                    chunk_object = CARD_TYPE_TO_CLASS[card_type](t, is_full_stop)
-                    chunk_object.register_card(c)
-                    text_chunk_dictionary[card_type][chunk_hash] = chunk_object
-
-                else:
-                    chunk_object = text_chunk_dictionary[card_type][chunk_hash]
-                    try:
-                        chunk_object.register_card(c)
-                    except Exception as e:
-                        print(c)
-                        raise e
-
-                if not is_start:
-                    previous_chunk.register_successor(chunk_object)
-                else:
-                    opening_text[card_type][chunk_object] = opening_text[card_type].setdefault(chunk_object, 0) + 1
-
-                previous_chunk = chunk_object
-
-    for card_type in CARD_TYPE_TO_CLASS:
-        for text_chunk in text_chunk_dictionary[card_type].values():
-            text_chunk.format_probabilities()
-        probability_calculation.format_dictionary(opening_text[card_type])
-        probability_calculation.format_dictionary(lines_in_text[card_type])
-
-    return text_chunk_dictionary, opening_text, lines_in_text
+
+        for chunk_length in chunk_lengths:
+            type_counts = counts[chunk_length][card_type]
+            type_counts.register_line_count(len(lines))
+            chunkified_lines = [tokenizer.chunkify(t, chunk_length) for t in tokenized_lines]
+
+            for chunkified in chunkified_lines:
+                previous_chunk = None
+                for i, t in enumerate(chunkified):
+
+                    is_start = i == 0
+                    is_full_stop = i == len(chunkified) - 1
+                    chunk = type_counts.register_chunk((tuple(t), is_full_stop), features)
+
+                    if not is_start:
+                        type_counts.register_successor(previous_chunk, chunk)
+                    else:
+                        type_counts.register_opening(chunk)
+
+                    previous_chunk = chunk
+
+    return counts
+
+
+def build_novelty_index(cards: Iterable[Dict]) -> novelty.NoveltyIndex:
+    """
+    Indexes the rules text of the cards that can be trained on, tokenized as it is for counting, so generated text
+    can be checked against it (see novelty.NoveltyIndex).
+
+    Parameters:
+        cards (Iterable[dict]): Magic: the Gathering cards from the API
+
+    Returns:
+        novelty.NoveltyIndex: The index of their lines and texts
+    """
+    return novelty.NoveltyIndex.from_texts(tokenizer.read_tokens(lines) for card_type, c, lines in preprocess(cards))
+
+
+def build_model(counts: Dict[str, markov_model.CardTypeCounts], chunk_length: int) -> markov_model.MarkovModel:
+    """
+    Packs the counts from count_data into an (unformatted) model.
+
+    Parameters:
+        counts (Dict[str, markov_model.CardTypeCounts]): The counts of each card type
+        chunk_length (int): Chunk length the counts were gathered with
+
+    Returns:
+        markov_model.MarkovModel: The model
+    """
+    card_types = {card_type: type_counts.build(chunk_length, markov_model.Vocabulary())
+                  for card_type, type_counts in counts.items()}
+    return markov_model.MarkovModel(chunk_length, card_types)
+
+
+def update_model(model: markov_model.MarkovModel,
+                 counts: Dict[str, markov_model.CardTypeCounts]) -> markov_model.MarkovModel:
+    """
+    Adds the counts of newly seen cards to an existing model, without recounting the cards it was built from.
+    Existing chunks and tokens keep their indices; new ones are numbered after them. Only the card types the
+    model has are updated.
+
+    Parameters:
+        model (markov_model.MarkovModel): Model to add the counts to, which is left untouched
+        counts (Dict[str, markov_model.CardTypeCounts]): The counts of the new cards, see count_data
+
+    Returns:
+        markov_model.MarkovModel: A new (unformatted) model holding the counts of both
+    """
+    card_types = {}
+    for card_type in model:
+        type_model = model[card_type]
+        merged = markov_model.CardTypeCounts.from_model(type_model)
+        merged.merge(counts[card_type])
+        card_types[card_type] = merged.build(model.chunk_length, markov_model.Vocabulary(type_model.vocabulary.tokens))
+    return markov_model.MarkovModel(model.chunk_length, card_types)
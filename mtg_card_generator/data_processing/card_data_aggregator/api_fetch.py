@@ -1,20 +1,118 @@
-from typing import Dict, List
+import json
+import logging
+import os
+import shutil
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
 
 import requests
 
 WEBSITE_URL = "https://api.magicthegathering.io/v1/cards"
+# Maximum number of cards the API returns in a page
+PAGE_SIZE = 100
+
+this_logger = logging.getLogger()
 
 
-def get_cards(**get_arguments) -> List[Dict]:
+def get_cards(session: Optional[requests.Session] = None, url: str = WEBSITE_URL, **get_arguments) -> List[Dict]:
     """
     Makes a GET request to the Magic: the Gathering cards API. Returns a list of dictionary of cards.
     See the API website for information on the return format.
 
     Parameters:
+        session (requests.Session): Session to make the request with, so connections can be reused between
+                                    requests. A one-off request is made without one.
+        url (str): Address of the cards endpoint
         **get_arguments (Any): Any get arguments you want to pass.
 
     Returns:
         List[Dict]: List of dictionaries (which represent individual cards). This will be a maximum of 100 cards
                     due to API limitations.
     """
-    return requests.get(WEBSITE_URL, get_arguments).json()["cards"]
+    response = (session or requests).get(url, get_arguments)
+    response.raise_for_status()
+    return response.json()["cards"]
+
+
+def get_page(session: requests.Session, page: int, url: str = WEBSITE_URL, retries: int = 5,
+             backoff: float = 1.0, **get_arguments) -> List[Dict]:
+    """
+    Gets a single page of cards, retrying failed requests after waiting backoff, 2 * backoff, 4 * backoff, ...
+    seconds in turn. The last failure is raised once the retries run out.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return get_cards(session, url, page=page, **get_arguments)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            if attempt == retries:
+                raise
+            this_logger.warning(f"Fetching page {page} failed ({e!r}), retrying in {backoff * 2 ** attempt}s")
+            time.sleep(backoff * 2 ** attempt)
+
+
+def download_cards(checkpoint_path: str, url: str = WEBSITE_URL, workers: int = 8, retries: int = 5,
+                   backoff: float = 1.0, **get_arguments) -> List[Dict]:
+    """
+    Downloads every card from the API into a list. See fetch_cards.
+    """
+    return list(fetch_cards(checkpoint_path, url, workers, retries, backoff, **get_arguments))
+
+
+def fetch_cards(checkpoint_path: str, url: str = WEBSITE_URL, workers: int = 8, retries: int = 5,
+                backoff: float = 1.0, **get_arguments) -> Iterator[Dict]:
+    """
+    Downloads every card from the API, fetching up to `workers` pages at once over a shared session.
+    The cards are yielded as each round of pages completes, so they can be written out as they arrive.
+
+    The pages are requested in rounds of `workers` consecutive pages until one comes back with fewer than
+    PAGE_SIZE cards. Every completed page is written to the checkpoint folder as soon as it arrives, and pages
+    already there are read back instead of requested, so an interrupted download picks up where it left off.
+    The checkpoint folder is removed once the download completes, and discarded if it was left by a download
+    with different get arguments.
+
+    Parameters:
+        checkpoint_path (str): Folder to checkpoint the completed pages in
+        url (str): Address of the cards endpoint
+        workers (int): Maximum number of requests in flight at once
+        retries (int): Number of times to retry each page (see get_page)
+        backoff (float): Seconds to wait before the first retry of a page
+        **get_arguments (Any): Any get arguments to filter the cards by (e.g. set="DOM")
+
+    Returns:
+        Iterator[Dict]: Every card, in the order of the pages they were on
+    """
+    arguments_path = os.path.join(checkpoint_path, "arguments.json")
+    if os.path.exists(arguments_path):
+        with open(arguments_path) as F:
+            if json.load(F) != get_arguments:
+                shutil.rmtree(checkpoint_path)
+    os.makedirs(checkpoint_path, exist_ok=True)
+    with open(arguments_path, "w") as F:
+        json.dump(get_arguments, F)
+    session = requests.Session()
+
+    def fetch(page: int) -> List[Dict]:
+        page_path = os.path.join(checkpoint_path, f"page_{page:05d}.json")
+        if os.path.exists(page_path):
+            with open(page_path) as F:
+                return json.load(F)
+
+        this_logger.info(f"Calling API, page: {page}")
+        cards = get_page(session, page, url, retries, backoff, **get_arguments)
+        with open(page_path + ".tmp", "w") as F:
+            json.dump(cards, F)
+        os.replace(page_path + ".tmp", page_path)
+        return cards
+
+    page = 0
+    with session, ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            pages = list(executor.map(fetch, range(page, page + workers)))
+            for next_cards in pages:
+                yield from next_cards
+                if len(next_cards) < PAGE_SIZE:
+                    shutil.rmtree(checkpoint_path)
+                    return
+            page += workers
@@ -0,0 +1,84 @@
+"""
+Stores the card data as a corpus file of JSON lines, one card per line, holding only the fields that training
+uses (see CORPUS_FIELDS). Cards are written one at a time as they are downloaded and read back lazily, so the
+whole card list never has to be held in memory.
+"""
+
+import itertools
+import json
+import os
+import pickle
+
+from typing import Dict, Iterable, Iterator
+
+# Fields of a card from the API read by the aggregator, TextChunk.card_features and aggregator.card_key
+CORPUS_FIELDS = ("name", "text", "types", "subtypes", "cmc", "colors", "manaCost", "rarity",
+                 "power", "toughness", "loyalty", "multiverseid")
+
+
+def compact(card: Dict) -> Dict:
+    """
+    Drops every field of a card that isn't in CORPUS_FIELDS.
+    """
+    return {field: card[field] for field in CORPUS_FIELDS if field in card}
+
+
+def write_corpus(path: str, cards: Iterable[Dict]) -> int:
+    """
+    Writes cards to a corpus file as they come. The file is only put in place once every card is written,
+    so an interrupted write leaves any previous corpus untouched.
+
+    Parameters:
+        path (str): Where to write the corpus
+        cards (Iterable[Dict]): Cards from the API, or from read_corpus
+
+    Returns:
+        int: Number of cards written
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + ".tmp"
+    written = 0
+    with open(temporary_path, "w", encoding="utf-8") as F:
+        for card in cards:
+            F.write(json.dumps(compact(card), ensure_ascii=False, separators=(",", ":")))
+            F.write("\n")
+            written += 1
+    os.replace(temporary_path, path)
+    return written
+
+
+def read_corpus(path: str) -> Iterator[Dict]:
+    """
+    Reads the cards of a corpus file one at a time.
+
+    Parameters:
+        path (str): Path of a corpus written by write_corpus
+
+    Returns:
+        Iterator[Dict]: The cards, in the order they were written
+    """
+    with open(path, encoding="utf-8") as F:
+        for line in F:
+            yield json.loads(line)
+
+
+def append_to_corpus(path: str, cards: Iterable[Dict]) -> int:
+    """
+    Adds cards to the end of a corpus file, replacing it as write_corpus does.
+
+    Returns:
+        int: Number of cards in the corpus afterwards
+    """
+    return write_corpus(path, itertools.chain(read_corpus(path), cards))
+
+
+def convert_pickle(pickle_path: str, path: str) -> int:
+    """
+    Converts a card cache from before corpus files (a pickled list of cards from the API) into a corpus file.
+
+    Returns:
+        int: Number of cards converted
+    """
+    with open(pickle_path, "rb") as F:
+        cards = pickle.load(F)
+    return write_corpus(path, cards)
@@ -1,55 +1,222 @@
 import logging
 import os
-import pickle
 
-from typing import Tuple
+from typing import Optional, Sequence
 
 from mtg_card_generator import REPOSITORY_PATH
-import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch
-import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.metrics as metrics
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.model_store as model_store
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.novelty as novelty
 
 
-__CARDS_CACHE_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "cards_json.dat")
+CARDS_CACHE_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "cards.jsonl")
+# The pickled card list used as the cache before card_corpus, converted on first use
+LEGACY_CARDS_CACHE_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "cards_json.dat")
+# Where the pickled card list is moved to once converted, as the corpus drops the fields that aren't trained on
+LEGACY_CARDS_BACKUP_PATH = LEGACY_CARDS_CACHE_PATH + ".bak"
+# Pages of an unfinished download, see api_fetch.fetch_cards. api_fetch and aggregator are only imported when
+# cards are downloaded or counted, as loading a saved model needs neither them nor requests
+CARDS_CHECKPOINT_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "cards_pages")
+CARDS_UPDATE_CHECKPOINT_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "cards_update_pages")
+
+# Chunk lengths that are trained together whenever a model has to be trained, so switching between them later
+# only loads a saved model
+TRAINED_CHUNK_LENGTHS = (2, 3, 4, 5)
 
 this_logger = logging.getLogger()
 
 
-def initialize_aggregated_data(chunk_length=3, reset_json=False) -> Tuple[dict, dict, dict]:
+def initialize_aggregated_data(chunk_length=3, reset_json=False, jobs=1, chunk_lengths=TRAINED_CHUNK_LENGTHS,
+                               card_types: Optional[Sequence[str]] = None) -> markov_model.MarkovModel:
     """
     Loads the parameters for the Markov Model. Can also be used to reload the card data json.
+    The model of a card type is only trained if there is no saved shard of it for the current card cache and chunk
+    length. Every card type asked for that isn't saved is then trained in the same pass, along with the same card
+    types for every other chunk length in chunk_lengths that lacks any of them, and they are all saved (see
+    model_store) for future runs.
 
     Parameters:
         chunk_length (int): Order of Markov Model to use, i.e. number of words in a row to consider a node
         reset_json (bool): Whether to reload the card data or not.
+        jobs (int): Number of processes to train the model with, if it needs training (see aggregator.count_data)
+        chunk_lengths (Sequence[int]): Other orders to train alongside, if the model needs training
+        card_types (Optional[Sequence[str]]): Card types that will be used, by default every card type. Other card
+                                              types are neither trained nor loaded, until they are used if saved.
 
     Returns:
-        Tuple[dict, dict, dict]: See aggregator.gather_data
+        markov_model.MarkovModel: The formatted model, see aggregator.gather_data
     """
+    card_types = list(card_types or mtg_text_classes.CARD_TYPE_TO_CLASS)
+    if not reset_json:
+        convert_legacy_cache()
 
-    if reset_json or not os.path.exists(__CARDS_CACHE_PATH):
+    if reset_json or not os.path.exists(CARDS_CACHE_PATH):
         this_logger.warning("Either JSON reset has been requested or the cache file could not be found. "
-                            "A new cache file will be generated. This may take some time.")
-        cards = []
-        next_cards = api_fetch.get_cards(page = 0)
-        cards.extend(next_cards)
-        i = 1
-        while len(next_cards) == 100:
-            this_logger.info(f"Calling API, page: {i}")
-            next_cards = api_fetch.get_cards(page=i)
-            cards.extend(next_cards)
-            i += 1
-
-        this_logger.info("API calls complete. Caching...")
-
-        with open(__CARDS_CACHE_PATH, "wb+") as F:
-            pickle.dump(cards, F)
-
+                            "A new cache file will be generated. This may take some time. If it is interrupted, "
+                            "the download resumes from where it stopped next time.")
+        import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch
+        # Cards are written to the cache as each round of pages arrives
+        with metrics.stage("download"):
+            card_corpus.write_corpus(CARDS_CACHE_PATH, api_fetch.fetch_cards(CARDS_CHECKPOINT_PATH))
         this_logger.info("Caching succeeded.")
 
-    else:
-        this_logger.info("Loading cached files...")
-        with open(__CARDS_CACHE_PATH, "rb") as F:
-            cards = pickle.load(F)
+    this_logger.info("Loading trained model...")
+    with metrics.stage("load"):
+        corpus_key = model_store.corpus_hash(CARDS_CACHE_PATH)
+        path = model_store.model_path(corpus_key, chunk_length)
+        model = model_store.load_model(path, corpus_key, chunk_length, card_types)
+
+    missing = [card_type for card_type in card_types if model is None or card_type not in model.card_types]
+    if missing:
+        import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+        to_train = [n for n in sorted({chunk_length}.union(chunk_lengths))
+                    if n == chunk_length or
+                    not set(missing).issubset(model_store.saved_card_types(model_store.model_path(corpus_key, n)))]
+        this_logger.info(f"Training {', '.join(missing)} models with text chunk lengths {to_train}...")
+        cards = card_corpus.read_corpus(CARDS_CACHE_PATH)
+        with metrics.stage("train"):
+            all_counts = aggregator.count_orders(cards, to_train, jobs, missing)
+        for n, counts in all_counts.items():
+            with metrics.stage("build"):
+                trained = aggregator.build_model(counts, n)
+            with metrics.stage("save"):
+                model_store.save_model(model_store.model_path(corpus_key, n), trained, corpus_key)
+            this_logger.info(f"Saved trained model to {model_store.model_path(corpus_key, n)}")
+        load_novelty_index(corpus_key)
+        for removed in model_store.remove_stale_models(corpus_key):
+            this_logger.info(f"Removed outdated model {removed}")
+        with metrics.stage("load"):
+            model = model_store.load_model(path, corpus_key, chunk_length, card_types)
+
+    with metrics.stage("format_probabilities"):
+        return model.format_probabilities()
+
 
-    this_logger.info("Training model...")
-    return aggregator.gather_data(cards, chunk_length)
+def load_saved_model(chunk_length=3, with_novelty=False,
+                     corpus_key: Optional[str] = None) -> Optional[markov_model.MarkovModel]:
+    """
+    Loads the formatted model saved for the current card cache, without downloading or training anything.
+    Each card type is loaded the first time it is used.
+
+    Parameters:
+        chunk_length (int): Order of Markov Model to load
+        with_novelty (bool): Whether to load the novelty index into the model too (see load_novelty_index)
+        corpus_key (Optional[str]): Hash of the card cache, if already known (see model_store.corpus_hash), e.g.
+                                    the corpus_key of a model the caller has loaded. Hashing the cache means
+                                    reading all of it, which each worker of a parallel run would do otherwise.
+
+    Returns:
+        Optional[markov_model.MarkovModel]: The model, or None if none is saved for the cache and chunk length
+    """
+    corpus_key = corpus_key or model_store.corpus_hash(CARDS_CACHE_PATH)
+    model = model_store.load_model(model_store.model_path(corpus_key, chunk_length), corpus_key, chunk_length)
+    if model is None:
+        return None
+    if with_novelty:
+        model.novelty = load_novelty_index(corpus_key)
+    return model.format_probabilities()
+
+
+def load_novelty_index(corpus_key: Optional[str] = None) -> novelty.NoveltyIndex:
+    """
+    Loads the novelty index of the card cache (see novelty), building and saving it first if it isn't saved yet.
+    It is built along with the models whenever they are trained, so it only has to be built here for models
+    trained before there was an index.
+
+    Parameters:
+        corpus_key (Optional[str]): Hash of the card cache, if already known (see model_store.corpus_hash)
+
+    Returns:
+        novelty.NoveltyIndex: The index of the lines and texts of the cards in the cache
+    """
+    corpus_key = corpus_key or model_store.corpus_hash(CARDS_CACHE_PATH)
+    path = model_store.novelty_path(corpus_key)
+    with metrics.stage("load_novelty_index"):
+        index = model_store.load_novelty_index(path, corpus_key)
+    if index is None:
+        import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+        this_logger.info("Building the novelty index...")
+        with metrics.stage("build_novelty_index"):
+            index = aggregator.build_novelty_index(card_corpus.read_corpus(CARDS_CACHE_PATH))
+            model_store.save_novelty_index(path, index, corpus_key)
+        this_logger.info(f"Saved the novelty index to {path}")
+    return index
+
+
+def update_aggregated_data(chunk_length=3, jobs=1, card_types: Optional[Sequence[str]] = None,
+                           **get_arguments) -> markov_model.MarkovModel:
+    """
+    Adds cards that aren't in the card cache yet (see aggregator.card_key) to the cache, and adds their counts to
+    every model shard saved for the cache (see aggregator.update_model), rather than retraining from scratch.
+    Falls back to initialize_aggregated_data if there is nothing to update.
+
+    Parameters:
+        chunk_length (int): Order of Markov Model to return
+        jobs (int): Number of processes to count the new cards with (see aggregator.count_data)
+        card_types (Optional[Sequence[str]]): Card types that will be used, see initialize_aggregated_data
+        **get_arguments (Any): Any get arguments to filter the downloaded cards by, e.g. set="DOM" to only
+                               download a newly released set
+
+    Returns:
+        markov_model.MarkovModel: The formatted model, see aggregator.gather_data
+    """
+    convert_legacy_cache()
+    if not os.path.exists(CARDS_CACHE_PATH):
+        return initialize_aggregated_data(chunk_length, jobs=jobs, card_types=card_types)
+
+    import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+    import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch
+    this_logger.info("Downloading cards to check for new ones...")
+    known = {aggregator.card_key(c) for c in card_corpus.read_corpus(CARDS_CACHE_PATH)}
+    new_cards = []
+    with metrics.stage("download"):
+        for c in api_fetch.fetch_cards(CARDS_UPDATE_CHECKPOINT_PATH, **get_arguments):
+            if aggregator.card_key(c) not in known:
+                known.add(aggregator.card_key(c))
+                new_cards.append(card_corpus.compact(c))
+
+    if not new_cards:
+        this_logger.info("No new cards found.")
+        return initialize_aggregated_data(chunk_length, jobs=jobs, card_types=card_types)
+    this_logger.info(f"Found {len(new_cards)} new cards. Caching...")
+
+    old_key = model_store.corpus_hash(CARDS_CACHE_PATH)
+    old_models = {n: model_store.load_model(model_store.model_path(old_key, n), old_key, n)
+                  for n in model_store.saved_chunk_lengths(old_key)}
+
+    card_corpus.append_to_corpus(CARDS_CACHE_PATH, new_cards)
+    new_key = model_store.corpus_hash(CARDS_CACHE_PATH)
+
+    old_models = {n: model for n, model in old_models.items() if model is not None}
+    with metrics.stage("train"):
+        new_counts = aggregator.count_orders(new_cards, list(old_models), jobs)
+    for n, model in old_models.items():
+        this_logger.info(f"Updating model with text chunk length {n}...")
+        path = model_store.model_path(new_key, n)
+        model_store.save_model(path, aggregator.update_model(model, new_counts[n]), new_key)
+        model_store.remove_model(model_store.model_path(old_key, n))
+        this_logger.info(f"Saved updated model to {path}")
+    # The index is rebuilt for the new cache when it is next needed
+    for removed in model_store.remove_stale_models(new_key):
+        this_logger.info(f"Removed outdated model {removed}")
+
+    return initialize_aggregated_data(chunk_length, jobs=jobs, card_types=card_types)
+
+
+def convert_legacy_cache():
+    """
+    Converts the pickled card cache of earlier versions into a corpus file (see card_corpus), if there is one and
+    the corpus file doesn't exist yet. Models are matched to the corpus file, so they are retrained afterwards.
+    The corpus only keeps the fields that are trained on, so the pickle is kept, renamed to
+    LEGACY_CARDS_BACKUP_PATH, rather than deleted.
+    """
+    if os.path.exists(CARDS_CACHE_PATH) or not os.path.exists(LEGACY_CARDS_CACHE_PATH):
+        return
+    this_logger.info("Converting the old cache file...")
+    card_corpus.convert_pickle(LEGACY_CARDS_CACHE_PATH, CARDS_CACHE_PATH)
+    os.replace(LEGACY_CARDS_CACHE_PATH, LEGACY_CARDS_BACKUP_PATH)
+    this_logger.info(f"Kept the old cache file, with every field of the downloaded cards, at "
+                     f"{LEGACY_CARDS_BACKUP_PATH}")
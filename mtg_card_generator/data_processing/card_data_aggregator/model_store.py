@@ -0,0 +1,394 @@
+"""
+Persists the trained Markov Model to disk so it only needs to be trained once per corpus.
+
+The model is written as a directory holding one shard per card type. Each shard is a flat binary file: a short
+JSON header holding the string tables of its CardTypeModel (token vocabulary and satellite keys) followed by the
+aligned arrays of the CardTypeModel (see markov_model), including the alias tables, log weights and chain
+analysis that sampling and inference read. Chunks refer to each other by index rather than by reference, so
+there is no object graph to recurse through.
+
+On later runs a shard is memory-mapped the first time its card type is used, and the model's arrays are views
+straight onto the mapping, so loading costs little more than opening the file and decoding the header, and a run
+only pays for the card types it uses. Every process that loads the same shard reads the same pages, so
+generation workers (see parallel_generation) share one copy of the model. Shards can be trained and saved for
+some card types before the others (see initialize_aggregated_data). Shards saved before the alias tables and
+analysis were stored still load, and work them out as they need them.
+
+The novelty index of a corpus (see novelty) is saved the same way, in a file of its own next to the models.
+"""
+
+import array
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mtg_card_generator import REPOSITORY_PATH
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.novelty as novelty
+
+FORMAT_VERSION = 3
+# Novelty indexes haven't changed since models were split into shards
+NOVELTY_FORMAT_VERSION = 2
+MAGIC = b"MTGMODEL"
+MODELS_PATH = os.path.join(REPOSITORY_PATH, "mtg_card_generator", "data", "models")
+
+# Every section starts on a multiple of this many bytes so it can be cast in place
+_ALIGNMENT = 8
+_HEADER_LENGTH_FORMAT = "<Q"
+# The names of every model and novelty index that has been saved, in this format or an older one
+_SAVED_FILE_PATTERN = re.compile(r"model_[0-9a-f]{16}_tcl\d+_v\d+(\.bin)?|novelty_[0-9a-f]{16}_v\d+\.bin")
+
+this_logger = logging.getLogger()
+
+
+def corpus_hash(corpus_path: str) -> str:
+    """
+    Hashes the card cache so that a trained model can be matched to the corpus it was trained on.
+
+    Parameters:
+        corpus_path (str): Path to the card cache file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(corpus_path, "rb") as F:
+        for block in iter(lambda: F.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_path(corpus_key: str, chunk_length: int) -> str:
+    """
+    Returns the path of the directory that the model for a given corpus and chunk length is stored in.
+    """
+    return os.path.join(MODELS_PATH, f"model_{corpus_key[:16]}_tcl{chunk_length}_v{FORMAT_VERSION}")
+
+
+def shard_path(path: str, card_type: str) -> str:
+    """
+    Returns the path of the shard of a card type within the model directory at path.
+    """
+    return os.path.join(path, f"{card_type}.bin")
+
+
+def saved_chunk_lengths(corpus_key: str) -> List[int]:
+    """
+    Returns the chunk lengths that a model has been saved for with the given corpus, for at least one card type.
+    """
+    if not os.path.isdir(MODELS_PATH):
+        return []
+    pattern = re.compile(rf"model_{corpus_key[:16]}_tcl(\d+)_v{FORMAT_VERSION}")
+    return sorted(int(match.group(1)) for match in map(pattern.fullmatch, os.listdir(MODELS_PATH))
+                  if match and saved_card_types(os.path.join(MODELS_PATH, match.group(0))))
+
+
+def saved_card_types(path: str) -> List[str]:
+    """
+    Returns the card types that the model directory at path has a shard for.
+    """
+    return [card_type for card_type in mtg_text_classes.CARD_TYPE_TO_CLASS
+            if os.path.exists(shard_path(path, card_type))]
+
+
+def save_model(path: str, model: markov_model.MarkovModel, corpus_key: str):
+    """
+    Writes a shard for every card type of a model to disk, loading any the model hasn't loaded yet. Shards of
+    other card types already in the directory are kept.
+
+    Parameters:
+        path (str): The directory to write the model to
+        model (markov_model.MarkovModel): Model from aggregator.build_model or load_model
+        corpus_key (str): Hash of the corpus the model was trained on (see corpus_hash)
+    """
+    for card_type in model:
+        save_shard(shard_path(path, card_type), model[card_type], corpus_key)
+
+
+def save_shard(path: str, type_model: markov_model.CardTypeModel, corpus_key: str):
+    """
+    Writes the model of one card type to disk.
+
+    Parameters:
+        path (str): Where to write the shard
+        type_model (markov_model.CardTypeModel): The model of the card type
+        corpus_key (str): Hash of the corpus the model was trained on (see corpus_hash)
+    """
+    satellite_keys = {}
+    sections = OrderedDict()
+    for name, values in type_model.arrays().items():
+        sections[name] = values
+    for name, values in type_model.sampling_arrays().items():
+        sections[name] = values
+    for name, values in type_model.analysis_arrays().items():
+        sections[name] = values
+
+    for attribute, table in type_model.satellites.items():
+        sections[f"{attribute}/offsets"] = table.offsets
+        sections[f"{attribute}/key_ids"] = table.key_ids
+        sections[f"{attribute}/counts"] = table.counts
+        sections[f"{attribute}/log_weights"] = table.weights()
+        satellite_keys[attribute] = table.keys
+
+    header = {
+        "version": FORMAT_VERSION,
+        "corpus_hash": corpus_key,
+        "chunk_length": type_model.chunk_length,
+        "card_type": type_model.card_type,
+        "vocabulary": type_model.vocabulary.tokens,
+        "satellite_keys": satellite_keys,
+    }
+    _write_sections(path, header, sections)
+
+
+def load_model(path: str, corpus_key: str, chunk_length: int,
+               card_types: Sequence[str] = ()) -> Optional[markov_model.MarkovModel]:
+    """
+    Loads a model written by save_model. The shards of the given card types are loaded straight away, and those
+    of every other saved card type the first time the model is asked for them (see MarkovModel.__getitem__).
+    The arrays of each card type are views onto its memory-mapped shard.
+
+    Parameters:
+        path (str): The directory the model was written to
+        corpus_key (str): Hash of the corpus the model must have been trained on
+        chunk_length (int): Chunk length the model must have been trained with
+        card_types (Sequence[str]): Card types to load straight away. Those without a usable shard are left out
+                                    of the model, so that the caller can tell they need training.
+
+    Returns:
+        Optional[markov_model.MarkovModel]: The unformatted model, or None if there is no model at that path.
+    """
+    saved = saved_card_types(path)
+    if not saved:
+        return None
+
+    loaded = {}
+    for card_type in card_types:
+        if card_type in saved:
+            type_model = load_shard(shard_path(path, card_type), corpus_key, chunk_length, card_type)
+            if type_model is not None:
+                loaded[card_type] = type_model
+    loaders = {card_type: functools.partial(_load_saved_shard, shard_path(path, card_type), corpus_key, chunk_length,
+                                            card_type)
+               for card_type in saved if card_type not in card_types}
+    return markov_model.MarkovModel(chunk_length, loaded, loaders, corpus_key)
+
+
+def load_shard(path: str, corpus_key: str, chunk_length: int,
+               card_type: str) -> Optional[markov_model.CardTypeModel]:
+    """
+    Loads the model of one card type written by save_shard, as views onto the memory-mapped file.
+
+    Parameters:
+        path (str): Where the shard was written
+        corpus_key (str): Hash of the corpus the model must have been trained on
+        chunk_length (int): Chunk length the model must have been trained with
+        card_type (str): Card type the shard must hold
+
+    Returns:
+        Optional[markov_model.CardTypeModel]: The unformatted model, or None if there is no usable shard at path.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        header, sections = _read_sections(path)
+    except ValueError as e:
+        this_logger.warning(f"Ignoring unreadable model file {path}: {e}")
+        return None
+
+    if (header["version"], header["corpus_hash"], header["chunk_length"], header["card_type"]) != \
+            (FORMAT_VERSION, corpus_key, chunk_length, card_type):
+        this_logger.warning(f"Ignoring model file {path} as it was trained for a different corpus, chunk length or "
+                            f"card type.")
+        return None
+
+    chunk_class = mtg_text_classes.CARD_TYPE_TO_CLASS[card_type]
+    satellites = {}
+    for attribute in chunk_class.SATELLITE_ATTRIBUTES:
+        satellites[attribute] = markov_model.SparseTable(
+            [_freeze(key) for key in header["satellite_keys"][attribute]],
+            sections[f"{attribute}/offsets"],
+            sections[f"{attribute}/key_ids"],
+            sections[f"{attribute}/counts"],
+            attribute in chunk_class.NESTED_SATELLITE_ATTRIBUTES,
+            sections.get(f"{attribute}/log_weights")
+        )
+
+    arrays = {name: sections[name] for name in markov_model.CardTypeModel.ARRAY_NAMES}
+    # Files saved without the alias tables or analysis leave them to be worked out as they are needed
+    arrays.update((name, sections[name])
+                  for name in markov_model.CardTypeModel.SAMPLING_ARRAY_NAMES +
+                  markov_model.CardTypeModel.ANALYSIS_ARRAY_NAMES if name in sections)
+    return markov_model.CardTypeModel(card_type, chunk_class, chunk_length,
+                                      markov_model.Vocabulary(header["vocabulary"]), satellites, **arrays)
+
+
+def _load_saved_shard(path: str, corpus_key: str, chunk_length: int, card_type: str) -> markov_model.CardTypeModel:
+    type_model = load_shard(path, corpus_key, chunk_length, card_type)
+    if type_model is None:
+        raise ValueError(f"The saved {card_type} model at {path} can't be used. Generating {card_type} cards "
+                         f"with make_mtg_card retrains it.")
+    return type_model
+
+
+def remove_model(path: str):
+    """
+    Deletes the model directory at path, with every shard in it.
+    """
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_stale_models(corpus_key: str) -> List[str]:
+    """
+    Deletes the saved models and novelty indexes of every other corpus, and those saved in an older format, so
+    that retraining after the card data changes doesn't leave the old models behind.
+
+    Parameters:
+        corpus_key (str): Hash of the corpus whose current models and novelty index are kept (see corpus_hash)
+
+    Returns:
+        List[str]: The paths that were deleted
+    """
+    if not os.path.isdir(MODELS_PATH):
+        return []
+    current = re.compile(rf"model_{corpus_key[:16]}_tcl\d+_v{FORMAT_VERSION}|"
+                         rf"{re.escape(os.path.basename(novelty_path(corpus_key)))}")
+    removed = []
+    for name in os.listdir(MODELS_PATH):
+        if _SAVED_FILE_PATTERN.fullmatch(name) and not current.fullmatch(name):
+            path = os.path.join(MODELS_PATH, name)
+            if os.path.isdir(path):
+                remove_model(path)
+            else:
+                os.remove(path)
+            removed.append(path)
+    return sorted(removed)
+
+
+def novelty_path(corpus_key: str) -> str:
+    """
+    Returns the path that the novelty index for a given corpus is stored at.
+    """
+    return os.path.join(MODELS_PATH, f"novelty_{corpus_key[:16]}_v{NOVELTY_FORMAT_VERSION}.bin")
+
+
+def save_novelty_index(path: str, index: novelty.NoveltyIndex, corpus_key: str):
+    """
+    Writes a novelty index to disk.
+
+    Parameters:
+        path (str): Where to write the index
+        index (novelty.NoveltyIndex): Index from aggregator.build_novelty_index
+        corpus_key (str): Hash of the corpus the index was built from (see corpus_hash)
+    """
+    header = {"version": NOVELTY_FORMAT_VERSION, "corpus_hash": corpus_key}
+    _write_sections(path, header, OrderedDict([("lines", index.lines), ("texts", index.texts)]))
+
+
+def load_novelty_index(path: str, corpus_key: str) -> Optional[novelty.NoveltyIndex]:
+    """
+    Loads a novelty index written by save_novelty_index, as views onto the memory-mapped file.
+
+    Parameters:
+        path (str): Where the index was written
+        corpus_key (str): Hash of the corpus the index must have been built from
+
+    Returns:
+        Optional[novelty.NoveltyIndex]: The index, or None if there is no usable index at that path.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        header, sections = _read_sections(path)
+    except ValueError as e:
+        this_logger.warning(f"Ignoring unreadable novelty index {path}: {e}")
+        return None
+
+    if (header["version"], header["corpus_hash"]) != (NOVELTY_FORMAT_VERSION, corpus_key):
+        this_logger.warning(f"Ignoring novelty index {path} as it was built for a different corpus.")
+        return None
+    return novelty.NoveltyIndex(sections["lines"], sections["texts"])
+
+
+def _freeze(key: Any) -> Any:
+    """
+    JSON turns tuples into lists, this turns them back so that they can be used as dictionary keys.
+    """
+    if isinstance(key, list):
+        return tuple(_freeze(k) for k in key)
+    return key
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGNMENT) * _ALIGNMENT
+
+
+def _write_sections(path: str, header: Dict, sections: Dict[str, Any]):
+    """
+    Sections may be arrays or memoryviews (e.g. when re-saving a loaded model).
+    """
+    layout = OrderedDict()
+    offset = 0
+    for name, values in sections.items():
+        typecode = values.typecode if isinstance(values, array.array) else values.format
+        layout[name] = [offset, typecode, len(values)]
+        offset += _aligned(len(values) * values.itemsize)
+
+    header = dict(header, byteorder=sys.byteorder, sections=layout)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + struct.calcsize(_HEADER_LENGTH_FORMAT) + len(header_bytes))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so that an interrupted save can never leave a truncated model behind
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as F:
+        F.write(MAGIC)
+        F.write(struct.pack(_HEADER_LENGTH_FORMAT, len(header_bytes)))
+        F.write(header_bytes)
+        F.write(b"\0" * (data_start - F.tell()))
+        for values in sections.values():
+            data = values.tobytes()
+            F.write(data)
+            F.write(b"\0" * (_aligned(len(data)) - len(data)))
+    os.replace(temporary_path, path)
+
+
+def _read_sections(path: str) -> Tuple[Dict, Dict[str, memoryview]]:
+    with open(path, "rb") as F:
+        if os.fstat(F.fileno()).st_size == 0:
+            raise ValueError("file is empty")
+        mapped = mmap.mmap(F.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a model file")
+    length_start = len(MAGIC)
+    header_start = length_start + struct.calcsize(_HEADER_LENGTH_FORMAT)
+    header_length, = struct.unpack_from(_HEADER_LENGTH_FORMAT, mapped, length_start)
+    header = json.loads(mapped[header_start:header_start + header_length].decode("utf-8"))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError("model was written on a machine with a different byte order")
+    data_start = _aligned(header_start + header_length)
+
+    # The memoryviews keep the mapping alive for as long as any section is in use
+    buffer = memoryview(mapped)
+    sections = {}
+    for name, (offset, typecode, length) in header["sections"].items():
+        start = data_start + offset
+        end = start + length * array.array(typecode).itemsize
+        if end > len(buffer):
+            raise ValueError("file is truncated")
+        sections[name] = buffer[start:end].cast(typecode)
+    return header, sections
@@ -0,0 +1,511 @@
+"""
+Compact, array-backed representation of the Markov Model.
+
+Each card type's model interns its tokens into a Vocabulary of its own, so that it can be saved and loaded
+without the others (see model_store). It then holds
+    - its chunks as fixed-width rows of token ids (padded with -1 for chunks cut short by the end of a line),
+    - its successor edges in compressed sparse row (CSR) arrays: the successors of chunk i are
+      successor_targets[successor_offsets[i]:successor_offsets[i + 1]], with their counts alongside,
+    - the opening text and number of lines as parallel arrays of keys and counts,
+    - one SparseTable per satellite attribute, shared by every chunk of the card type.
+
+All of the arrays hold raw counts, so they can be written to disk (see model_store) and read back from
+a memory-mapped file without any conversion. Chunks are handed out as TextChunk views onto the arrays.
+
+Alongside the counts, a model can carry the tables that sampling derives from them: the alias table of every
+chunk's successors and the log weight of every satellite entry, and the analysis of how walks from each chunk
+end (see chain_analysis). A model loaded from disk reads them from the
+file, so processes sharing a model file share those pages too rather than each building its own copy.
+"""
+
+import array
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.chain_analysis as chain_analysis
+import mtg_card_generator.generator.probability_calculation as probability_calculation
+import mtg_card_generator.generator.render_text as render_text
+import mtg_card_generator.generator.sampling as sampling
+
+# The tokens of a chunk and whether it ends a line
+ChunkKey = Tuple[Tuple[str, ...], bool]
+
+
+class Vocabulary:
+    """
+    Maps tokens to integer ids and back.
+    """
+    def __init__(self, tokens: List[str] = None):
+        self.tokens: List[str] = list(tokens or [])
+        self.ids: Dict[str, int] = {token: i for i, token in enumerate(self.tokens)}
+
+    def intern(self, token: str) -> int:
+        token_id = self.ids.get(token)
+        if token_id is None:
+            token_id = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return token_id
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+class SparseTable:
+    """
+    Satellite counts of one attribute for every chunk of a card type, as CSR arrays.
+    The entries of chunk i are key_ids[offsets[i]:offsets[i + 1]] with their counts alongside,
+    and each key id indexes into keys. Keys of nested attributes are (cmc, key) pairs.
+    log_weights, if given, holds the log weight of each entry alongside counts (see weights).
+    """
+    def __init__(self, keys: List[Any], offsets, key_ids, counts, nested: bool = False, log_weights=None):
+        self.keys = keys
+        self.offsets = offsets
+        self.key_ids = key_ids
+        self.counts = counts
+        self.nested = nested
+        self.log_weights = log_weights
+        # Count of each key over every chunk, for each outer key totals has been asked for
+        self._totals: Dict[Any, Dict[Any, int]] = {}
+        # (key, log weight) pairs of each chunk (and outer key, for nested attributes) weighted_row has been asked for
+        self._weighted_rows: Dict[Tuple[int, Any], Tuple[Tuple[Any, float], ...]] = {}
+        # The same, summed over the run after each chunk, for each chunk weighted_run has been asked for
+        self._weighted_runs: Dict[Tuple[int, Any], Tuple[Tuple[Any, float], ...]] = {}
+
+    def weighted_row(self, index: int, outer: Any = None) -> Tuple[Tuple[Any, float], ...]:
+        """
+        Returns the keys of a chunk with their smoothed log weights (see probability_calculation.log_weights).
+        For nested attributes, only the keys under `outer` are returned, without the outer key.
+        Rows are computed on first use and cached, so chunks that recur across cards cost a lookup.
+        """
+        row = self._weighted_rows.get((index, outer))
+        if row is None:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            keys = [self.keys[k] for k in self.key_ids[start:end]]
+            if self.log_weights is not None:
+                weights = self.log_weights[start:end]
+            else:
+                weights = probability_calculation.log_weights(self.counts[start:end])
+            row = zip(keys, weights)
+            if self.nested:
+                row = ((key[1], weight) for key, weight in row if key[0] == outer)
+            row = self._weighted_rows[index, outer] = tuple(row)
+        return row
+
+    def weighted_run(self, run: Tuple[int, ...], start: int, outer: Any = None) -> Tuple[Tuple[Any, float], ...]:
+        """
+        Returns the keys of the chunks run[start:], the run after the chunk run[start - 1] (see
+        chain_analysis.single_successor_runs), with their log weights summed over the run, as weighted_row returns
+        those of a single chunk. Runs are summed on first use and cached, so a run costs one row however long it is.
+        """
+        row = self._weighted_runs.get((run[start - 1], outer))
+        if row is None:
+            sums: Dict[Any, float] = OrderedDict()
+            for index in run[start:]:
+                for key, weight in self.weighted_row(index, outer):
+                    sums[key] = sums.get(key, 0.0) + weight
+            row = self._weighted_runs[run[start - 1], outer] = tuple(sums.items())
+        return row
+
+    def weights(self):
+        """
+        Returns the smoothed log weight of every entry (see probability_calculation.log_weights), alongside counts.
+        """
+        if self.log_weights is not None:
+            return self.log_weights
+        return probability_calculation.log_weights(self.counts)
+
+    def totals(self, outer: Any = None) -> Dict[Any, int]:
+        """
+        Returns the count of each key summed over every chunk, i.e. over the card type as a whole. For nested
+        attributes, only the keys under `outer` are returned, without the outer key.
+        """
+        totals = self._totals.get(outer)
+        if totals is None:
+            totals = OrderedDict()
+            for key_id, count in zip(self.key_ids, self.counts):
+                key = self.keys[key_id]
+                if self.nested:
+                    if key[0] != outer:
+                        continue
+                    key = key[1]
+                totals[key] = totals.get(key, 0) + count
+            self._totals[outer] = totals
+        return totals
+
+    def probabilities(self, keys: List[Any], smoothing: float = probability_calculation.SMOOTHING) -> array.array:
+        """
+        Returns, for every chunk, the smoothed probability that a card with the chunk on it has one of the given
+        keys: the sum of (n + smoothing) / (N + smoothing * V) over the keys, with n the count of the key on the
+        chunk, N the chunk's total count and V the number of keys in the table. Only for attributes that aren't
+        nested.
+        """
+        wanted = {self.keys.index(key) for key in keys}
+        probabilities = array.array("d", bytes(8 * (len(self.offsets) - 1)))
+        for index in range(len(probabilities)):
+            start, end = self.offsets[index], self.offsets[index + 1]
+            matching = sum(count for key_id, count in zip(self.key_ids[start:end], self.counts[start:end])
+                           if key_id in wanted)
+            total = sum(self.counts[start:end])
+            probabilities[index] = (matching + smoothing * len(wanted)) / (total + smoothing * len(self.keys))
+        return probabilities
+
+    def items(self, index: int) -> Iterator[Tuple[Any, int]]:
+        for entry in range(self.offsets[index], self.offsets[index + 1]):
+            yield self.keys[self.key_ids[entry]], self.counts[entry]
+
+    def dictionary(self, index: int) -> Dict[Any, Any]:
+        """
+        Returns the raw counts of a chunk as a dictionary, nesting (cmc, key) pairs as the TextChunk did.
+        """
+        dictionary = OrderedDict()
+        for key, count in self.items(index):
+            if self.nested:
+                dictionary.setdefault(key[0], OrderedDict())[key[1]] = count
+            else:
+                dictionary[key] = count
+        return dictionary
+
+
+class CardTypeModel:
+    """
+    The chunk graph and satellite data for a single card type. See the module docstring for the layout.
+    """
+    # Arrays that are stored as-is by model_store, alongside the offsets, key_ids and counts of each SparseTable
+    ARRAY_NAMES = ("chunk_tokens", "full_stop", "cards_registered",
+                   "successor_offsets", "successor_targets", "successor_counts",
+                   "opening_chunks", "opening_counts", "line_numbers", "line_counts")
+    # Arrays derived from the counts for sampling, which a model may or may not carry (see sampling_arrays)
+    SAMPLING_ARRAY_NAMES = ("alias_probabilities", "alias_indices")
+    # Arrays from chain_analysis, which a model may or may not carry (see analysis_arrays)
+    ANALYSIS_ARRAY_NAMES = ("steps_to_full_stop", "expected_steps")
+
+    def __init__(self, card_type: str, chunk_class: Type[mtg_text_classes.TextChunk], chunk_length: int,
+                 vocabulary: Vocabulary, satellites: Dict[str, SparseTable], **arrays):
+        self.card_type = card_type
+        self.chunk_class = chunk_class
+        self.chunk_length = chunk_length
+        self.vocabulary = vocabulary
+        self.satellites = satellites
+
+        self.chunk_tokens = arrays["chunk_tokens"]
+        self.full_stop = arrays["full_stop"]
+        self.cards_registered = arrays["cards_registered"]
+        self.successor_offsets = arrays["successor_offsets"]
+        self.successor_targets = arrays["successor_targets"]
+        self.successor_counts = arrays["successor_counts"]
+        self.opening_chunks = arrays["opening_chunks"]
+        self.opening_counts = arrays["opening_counts"]
+        self.line_numbers = arrays["line_numbers"]
+        self.line_counts = arrays["line_counts"]
+        self.alias_probabilities = arrays.get("alias_probabilities")
+        self.alias_indices = arrays.get("alias_indices")
+        self.steps_to_full_stop = arrays.get("steps_to_full_stop")
+        self.expected_steps = arrays.get("expected_steps")
+
+        # Built by format_probabilities
+        self.sampler: Optional[sampling.ChainSampler] = None
+        # Samplers restricted to cards with given satellite keys, built by conditioned_sampler
+        self.conditioned_samplers: Dict[Tuple, sampling.ChainSampler] = {}
+        # Rendered text of each chunk, filled in by fragment the first time the chunk is rendered
+        self.fragments: List[Optional[str]] = [None] * len(self)
+
+    def __len__(self):
+        return len(self.full_stop)
+
+    def arrays(self) -> Dict[str, Any]:
+        return OrderedDict((name, getattr(self, name)) for name in self.ARRAY_NAMES)
+
+    def sampling_arrays(self) -> Dict[str, Any]:
+        """
+        Returns the alias tables of every chunk's successors (see sampling.successor_alias_arrays), building them
+        if the model doesn't carry them.
+        """
+        if self.alias_probabilities is None:
+            self.alias_probabilities, self.alias_indices = sampling.successor_alias_arrays(
+                self.successor_offsets, self.successor_counts)
+        return OrderedDict((name, getattr(self, name)) for name in self.SAMPLING_ARRAY_NAMES)
+
+    def chunk(self, index: int) -> mtg_text_classes.TextChunk:
+        return self.chunk_class(self, index)
+
+    def tokens(self, index: int) -> List[str]:
+        row = self.chunk_tokens[index * self.chunk_length:(index + 1) * self.chunk_length]
+        return [self.vocabulary.tokens[t] for t in row if t >= 0]
+
+    def analysis_arrays(self) -> Dict[str, Any]:
+        """
+        Returns the fewest and expected steps from every chunk to a full stop (see chain_analysis), working them
+        out if the model doesn't carry them.
+        """
+        if self.steps_to_full_stop is None:
+            self.steps_to_full_stop = chain_analysis.steps_to_full_stop(self.full_stop, self.successor_offsets,
+                                                                        self.successor_targets)
+        if self.expected_steps is None:
+            self.expected_steps = chain_analysis.expected_steps(self.full_stop, self.successor_offsets,
+                                                                self.successor_targets, self.successor_counts,
+                                                                self.steps_to_full_stop)
+        return OrderedDict((name, getattr(self, name)) for name in self.ANALYSIS_ARRAY_NAMES)
+
+    def conditioned_sampler(self, conditions: Dict[str, List[Any]]) -> sampling.ChainSampler:
+        """
+        Returns a sampler that walks the text of cards that have, for each attribute in conditions, one of the
+        keys listed for it. Every chunk is weighted by the probability of the keys given the chunk (see
+        SparseTable.probabilities), multiplied over the attributes as inference does, so no walk is wasted.
+        The sampler is built the first time the conditions are asked for and kept.
+
+        Parameters:
+            conditions (Dict[str, List[Any]]): Satellite attribute (e.g. "colors") -> keys the card may have
+
+        Returns:
+            sampling.ChainSampler: The sampler
+        """
+        key = tuple(sorted((attribute, tuple(keys)) for attribute, keys in conditions.items()))
+        sampler = self.conditioned_samplers.get(key)
+        if sampler is None:
+            weights = None
+            for attribute, keys in conditions.items():
+                probabilities = self.satellites[attribute].probabilities(keys)
+                weights = probabilities if weights is None else \
+                    array.array("d", (w * p for w, p in zip(weights, probabilities)))
+            sampler = self.conditioned_samplers[key] = sampling.ChainSampler(self, weights)
+            if self.sampler is not None and self.sampler.run_ends is not None:
+                sampler.compact(self.sampler)
+        return sampler
+
+    def line_tokens(self, line: List[int]) -> List[str]:
+        """
+        Returns the tokens of a walked line, given the indices of its chunks.
+        """
+        return [token for index in line for token in self.tokens(index)]
+
+    def fragment(self, index: int) -> str:
+        """
+        Returns the text of a chunk as render_text.render_line renders it, with a space before every word but
+        punctuation.
+        """
+        fragment = self.fragments[index]
+        if fragment is None:
+            fragment = self.fragments[index] = render_text.render_words(self.tokens(index))
+        return fragment
+
+    def successor_items(self, index: int) -> Iterator[Tuple[int, int]]:
+        for edge in range(self.successor_offsets[index], self.successor_offsets[index + 1]):
+            yield self.successor_targets[edge], self.successor_counts[edge]
+
+    def opening_text(self) -> Dict[mtg_text_classes.TextChunk, int]:
+        return OrderedDict((self.chunk(i), count) for i, count in zip(self.opening_chunks, self.opening_counts))
+
+    def lines_in_text(self) -> Dict[int, int]:
+        return OrderedDict(zip(self.line_numbers, self.line_counts))
+
+    def format_probabilities(self, compact: bool = True):
+        """
+        Builds the tables used to sample from the model. The counts themselves are left untouched.
+
+        Parameters:
+            compact (bool): Whether walks take each run of chunks with a single successor in one step (see
+                            sampling.ChainSampler.compact), which walks the same lines in fewer steps, and
+                            inference adds up the log weights of each run once (see SparseTable.weighted_run).
+                            The sums can round differently in the last bits from adding chunk by chunk.
+        """
+        self.sampler = sampling.ChainSampler(self)
+        if compact:
+            self.sampler.compact()
+
+
+class MarkovModel:
+    """
+    The whole model: one CardTypeModel per card type, sharing a chunk length.
+
+    A model loaded from disk may hold only some of its card types, along with a function to load each of the
+    others (see model_store.load_model), which is called the first time that card type is asked for.
+    """
+    def __init__(self, chunk_length: int, card_types: Dict[str, CardTypeModel],
+                 loaders: Optional[Dict[str, Callable[[], CardTypeModel]]] = None, corpus_key: Optional[str] = None):
+        self.chunk_length = chunk_length
+        # Hash of the card cache the model was loaded for (see model_store.corpus_hash), if it was loaded from disk
+        self.corpus_key = corpus_key
+        # The card types loaded so far
+        self.card_types = card_types
+        # Loads each card type that hasn't been loaded yet
+        self.loaders = dict(loaders or {})
+        # How card types loaded after format_probabilities are formatted, or None before it is called
+        self.compact: Optional[bool] = None
+        # The index of the text of real cards, which is only loaded to generate novel cards (see
+        # generate_card.novel_walks)
+        self.novelty = None
+
+    def __getitem__(self, card_type: str) -> CardTypeModel:
+        type_model = self.card_types.get(card_type)
+        if type_model is None:
+            if card_type not in self.loaders:
+                raise KeyError(f"The model has no {card_type} cards.")
+            type_model = self.loaders.pop(card_type)()
+            if self.compact is not None:
+                type_model.format_probabilities(self.compact)
+            self.card_types[card_type] = type_model
+        return type_model
+
+    def __contains__(self, card_type: str) -> bool:
+        return card_type in self.card_types or card_type in self.loaders
+
+    def __iter__(self):
+        """
+        Iterates over every card type of the model, whether it has been loaded yet or not.
+        """
+        return iter([card_type for card_type in mtg_text_classes.CARD_TYPE_TO_CLASS if card_type in self])
+
+    def format_probabilities(self, compact: bool = True) -> 'MarkovModel':
+        self.compact = compact
+        for type_model in self.card_types.values():
+            type_model.format_probabilities(compact)
+        return self
+
+
+class CardTypeCounts:
+    """
+    Mutable counts for a single card type, gathered while training and turned into a CardTypeModel by build.
+    Chunks are keyed by their tokens and whether they end a line, and numbered in the order they are first seen.
+    """
+    def __init__(self, card_type: str, chunk_class: Type[mtg_text_classes.TextChunk]):
+        self.card_type = card_type
+        self.chunk_class = chunk_class
+
+        self.chunk_indices: Dict[ChunkKey, int] = {}
+        self.cards_registered: List[int] = []
+        self.successors: Dict[Tuple[int, int], int] = {}
+        self.opening_text: Dict[int, int] = {}
+        self.lines_in_text: Dict[int, int] = {}
+        self.satellites: Dict[str, Dict[Tuple[int, Any], int]] = {a: {} for a in chunk_class.SATELLITE_ATTRIBUTES}
+
+    @classmethod
+    def from_model(cls, type_model: CardTypeModel) -> 'CardTypeCounts':
+        """
+        Unpacks the raw counts of a built model, so that more cards can be counted into it.
+        Chunks keep their indices.
+        """
+        counts = cls(type_model.card_type, type_model.chunk_class)
+        for index in range(len(type_model)):
+            counts.chunk_indices[tuple(type_model.tokens(index)), bool(type_model.full_stop[index])] = index
+            for target, count in type_model.successor_items(index):
+                counts.successors[index, target] = count
+        counts.cards_registered = list(type_model.cards_registered)
+        counts.opening_text = dict(zip(type_model.opening_chunks, type_model.opening_counts))
+        counts.lines_in_text = dict(zip(type_model.line_numbers, type_model.line_counts))
+
+        for attribute, table in type_model.satellites.items():
+            satellite = counts.satellites[attribute]
+            for index in range(len(type_model)):
+                for key, count in table.items(index):
+                    satellite[index, key] = count
+        return counts
+
+    def register_chunk(self, key: ChunkKey, features: List[Tuple[str, Any]]) -> int:
+        """
+        Counts one occurrence of a chunk on a card with the given satellite data (see TextChunk.card_features).
+
+        Returns:
+            int: Index of the chunk
+        """
+        index = self.chunk_indices.get(key)
+        if index is None:
+            index = self.chunk_indices[key] = len(self.cards_registered)
+            self.cards_registered.append(0)
+        self.cards_registered[index] += 1
+
+        for attribute, value in features:
+            satellite = self.satellites[attribute]
+            satellite[index, value] = satellite.get((index, value), 0) + 1
+        return index
+
+    def register_successor(self, previous: int, index: int):
+        self.successors[previous, index] = self.successors.get((previous, index), 0) + 1
+
+    def register_opening(self, index: int):
+        self.opening_text[index] = self.opening_text.get(index, 0) + 1
+
+    def register_line_count(self, num_lines: int):
+        self.lines_in_text[num_lines] = self.lines_in_text.get(num_lines, 0) + 1
+
+    def merge(self, other: 'CardTypeCounts'):
+        """
+        Adds the counts of another CardTypeCounts into this one. Chunks new to this one are numbered in the
+        order the other first saw them, so merging the counts of consecutive partitions of a card list in order
+        gives exactly the counts of the whole list.
+        """
+        remap = [self.register_chunk(key, []) for key in other.chunk_indices]
+        for index, registered in enumerate(other.cards_registered):
+            # register_chunk counted one occurrence already
+            self.cards_registered[remap[index]] += registered - 1
+
+        for (previous, index), count in other.successors.items():
+            key = remap[previous], remap[index]
+            self.successors[key] = self.successors.get(key, 0) + count
+        for index, count in other.opening_text.items():
+            self.opening_text[remap[index]] = self.opening_text.get(remap[index], 0) + count
+        for num_lines, count in other.lines_in_text.items():
+            self.lines_in_text[num_lines] = self.lines_in_text.get(num_lines, 0) + count
+        for attribute, counts in other.satellites.items():
+            satellite = self.satellites[attribute]
+            for (index, value), count in counts.items():
+                key = remap[index], value
+                satellite[key] = satellite.get(key, 0) + count
+
+    def build(self, chunk_length: int, vocabulary: Vocabulary) -> CardTypeModel:
+        """
+        Packs the counts into the arrays of a CardTypeModel, interning tokens into the vocabulary.
+        """
+        num_chunks = len(self.cards_registered)
+        chunk_tokens = array.array("i", [-1]) * (num_chunks * chunk_length)
+        full_stop = array.array("B", bytes(num_chunks))
+        for (tokens, is_full_stop), index in self.chunk_indices.items():
+            for j, token in enumerate(tokens):
+                chunk_tokens[index * chunk_length + j] = vocabulary.intern(token)
+            full_stop[index] = is_full_stop
+
+        successor_offsets, successor_targets, successor_counts = _csr(num_chunks, self.successors, lambda t: t)
+
+        satellites = {}
+        for attribute, counts in self.satellites.items():
+            key_index: Dict[Any, int] = OrderedDict()
+            offsets, key_ids, key_counts = _csr(num_chunks, counts, lambda k: key_index.setdefault(k, len(key_index)))
+            satellites[attribute] = SparseTable(list(key_index), offsets, key_ids, key_counts,
+                                                attribute in self.chunk_class.NESTED_SATELLITE_ATTRIBUTES)
+
+        return CardTypeModel(
+            self.card_type, self.chunk_class, chunk_length, vocabulary, satellites,
+            chunk_tokens=chunk_tokens,
+            full_stop=full_stop,
+            cards_registered=array.array("i", self.cards_registered),
+            successor_offsets=successor_offsets,
+            successor_targets=successor_targets,
+            successor_counts=successor_counts,
+            opening_chunks=array.array("i", self.opening_text.keys()),
+            opening_counts=array.array("i", self.opening_text.values()),
+            line_numbers=array.array("i", self.lines_in_text.keys()),
+            line_counts=array.array("i", self.lines_in_text.values()),
+        )
+
+
+def _csr(num_rows: int, entries: Dict[Tuple[int, Any], int], column_to_index) -> Tuple[array.array, ...]:
+    """
+    Packs a dictionary of (row, column) -> count into CSR arrays of offsets, column indices and counts.
+    Entries of the same row keep the order they were inserted into the dictionary in.
+    """
+    offsets = array.array("i", bytes(4 * (num_rows + 1)))
+    for row, column in entries:
+        offsets[row + 1] += 1
+    for row in range(num_rows):
+        offsets[row + 1] += offsets[row]
+
+    cursor = offsets[:-1]
+    indices = array.array("i", bytes(4 * len(entries)))
+    counts = array.array("i", bytes(4 * len(entries)))
+    for (row, column), count in entries.items():
+        position = cursor[row]
+        indices[position] = column_to_index(column)
+        counts[position] = count
+        cursor[row] += 1
+    return offsets, indices, counts
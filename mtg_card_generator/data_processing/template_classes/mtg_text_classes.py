@@ -1,5 +1,6 @@
 from collections import OrderedDict
-from typing import Dict, List, Tuple, Union
+from fractions import Fraction
+from typing import Any, Dict, List, Tuple, Union
 
 from mtg_card_generator.generator.probability_calculation import format_dictionary
 
@@ -47,139 +48,144 @@ MTGCard = Dict[str, Union[float, str]]
 
 class TextChunk:
     """
-    Stores information about a text chunk from an MTG card.
-    Also holds satellite information about cards that have this chunk.
-    """
-    def __init__(self, text_chunk: List[str], is_full_stop: int = 0):
-        self.text_chunk = text_chunk
-        self.is_full_stop = is_full_stop
-
-        # Other satellite data used for card generation
-        self.cmcs: Dict[int, int] = OrderedDict()
-        self.colors: Dict[str, int] = OrderedDict()
-        self.pip_intensity: Dict[int, Dict[int, int]] = {}
-        self.rarities: Dict[str, int] = {}
-
-        # Need to count total number seen
-        self.total_cards_registered = 0
+    Read-only view of a text chunk from an MTG card, i.e. one node of a CardTypeModel (see markov_model).
+    Also gives access to satellite information about cards that have this chunk.
 
-        # Information about text that may succeed this
-        self.successors: Dict[TextChunk, int] = OrderedDict()
+    The chunk itself is just an index into the model's arrays. Its successors and satellite data are
+    returned as dictionaries of proportions, built from the raw counts on every access.
 
-        # To check whether or not the numbers have been formatted.
-        self.formatted = False
+    The class methods describe which satellite information is gathered for a card type while training.
+    """
+    # Satellite dictionaries kept on every chunk, and the subset of those that are keyed by cmc first
+    SATELLITE_ATTRIBUTES = ("cmcs", "colors", "pip_intensity", "rarities")
+    NESTED_SATELLITE_ATTRIBUTES = ("pip_intensity",)
+
+    __slots__ = ("model", "index")
+
+    def __init__(self, model, index: int):
+        self.model = model
+        self.index = index
+
+    @property
+    def text_chunk(self) -> List[str]:
+        return self.model.tokens(self.index)
+
+    @property
+    def is_full_stop(self) -> bool:
+        return bool(self.model.full_stop[self.index])
+
+    @property
+    def total_cards_registered(self) -> int:
+        return self.model.cards_registered[self.index]
+
+    @property
+    def successors(self) -> Dict['TextChunk', Fraction]:
+        successors = OrderedDict((self.model.chunk(target), count)
+                                 for target, count in self.model.successor_items(self.index))
+        return format_dictionary(successors)
+
+    def __getattr__(self, name: str) -> Dict:
+        # Satellite dictionaries, e.g. chunk.cmcs
+        if name not in type(self).SATELLITE_ATTRIBUTES:
+            raise AttributeError(name)
+        dictionary = self.model.satellites[name].dictionary(self.index)
+        if name in type(self).NESTED_SATELLITE_ATTRIBUTES:
+            for inner in dictionary.values():
+                format_dictionary(inner)
+            return dictionary
+        return format_dictionary(dictionary)
 
     def __str__(self):
         return str(self.text_chunk)
 
     def __hash__(self):
-        return text_chunk_hash([self.__str__()], self.is_full_stop)
+        return hash((id(self.model), self.index))
+
+    def __eq__(self, other):
+        return isinstance(other, TextChunk) and self.model is other.model and self.index == other.index
 
     def __repr__(self):
         return self.__str__()
 
-    def _lock_if_formatted(func, _=""):
-        def inner(self, *args, **kwargs):
-            if self.formatted:
-                raise ValueError("This text chunk is locked! You cannot modify it.")
-            func(self, *args, **kwargs)
-        return inner
+    @classmethod
+    def card_features(cls, card: MTGCard) -> List[Tuple[str, Any]]:
+        """
+        Lists the satellite data a card contributes to every chunk on it.
 
-    @_lock_if_formatted
-    def register_card(self, card: MTGCard):
-        self.total_cards_registered += 1
+        Parameters:
+            card (MTGCard): Card from the API
 
-        self.cmcs[card["cmc"]] = self.cmcs.setdefault(card["cmc"], 0) + 1
+        Returns:
+            List[Tuple[str, Any]]: (attribute, key) pairs, where the key of a nested attribute is a (cmc, key) pair
+        """
+        features = [("cmcs", card["cmc"])]
 
         if "colors" in card:
             colors_key = " ".join(card["colors"])
         else:
             colors_key = "Colorless"
-        self.colors[colors_key] = self.colors.setdefault(colors_key, 0) + 1
+        features.append(("colors", colors_key))
 
         if "manaCost" in card:
             pip_intensity_key = sum(1 if c in "WUBRGC" else 0 for c in card["manaCost"])
-            self.pip_intensity[card["cmc"]][pip_intensity_key] = self.pip_intensity.setdefault(card["cmc"], OrderedDict())\
-                                                                 .setdefault(pip_intensity_key, 0) + 1
+            features.append(("pip_intensity", (card["cmc"], pip_intensity_key)))
 
         if "rarity" in card:
-            self.rarities[card["rarity"]] = self.rarities.get(card["rarity"], 0) + 1
+            features.append(("rarities", card["rarity"]))
 
-    @_lock_if_formatted
-    def register_successor(self, chunk: 'TextChunk'):
-        self.successors[chunk] = self.successors.setdefault(chunk, 0) + 1
-
-    @_lock_if_formatted
-    def format_probabilities(self):
-        format_dictionary(self.cmcs)
-        format_dictionary(self.colors)
-        for cmc in self.pip_intensity:
-            format_dictionary(self.pip_intensity[cmc])
-        format_dictionary(self.rarities)
-        format_dictionary(self.successors)
-
-        self.formatted = True
+        return features
 
 
 class CreatureTextChunk(TextChunk):
     """
-    Stores some specific information relevant to creatures
+    Gives access to some specific information relevant to creatures
     """
-    def __init__(self, text_chunk: List[str], is_full_stop: int = 0):
-        super().__init__(text_chunk, is_full_stop)
+    SATELLITE_ATTRIBUTES = TextChunk.SATELLITE_ATTRIBUTES + ("subtypes", "num_subtypes", "power_toughness")
+    NESTED_SATELLITE_ATTRIBUTES = TextChunk.NESTED_SATELLITE_ATTRIBUTES + ("power_toughness",)
 
-        self.subtypes: Dict[str, int] = {}
-        self.num_subtypes: Dict[int, int] = {}
-        self.power_toughness: Dict[int, Dict[Tuple[str, str], int]] = {}
+    __slots__ = ()
 
-    @TextChunk._lock_if_formatted
-    def register_card(self, card: MTGCard):
-        super().register_card(card)
+    @classmethod
+    def card_features(cls, card: MTGCard) -> List[Tuple[str, Any]]:
+        features = super().card_features(card)
 
         if "subtypes" in card:
             for st in card["subtypes"]:
-                self.subtypes[st] = self.subtypes.setdefault(st, 0) + 1
+                features.append(("subtypes", st))
 
-            self.num_subtypes[len(card["subtypes"])] = self.num_subtypes.setdefault(len(card["subtypes"]), 0) + 1
+            features.append(("num_subtypes", len(card["subtypes"])))
 
         if "power" in card and "toughness" in card and "cmc" in card:
-            self.power_toughness[card["cmc"]][(card["power"], card["toughness"])] = self.power_toughness.setdefault(card["cmc"], {})\
-                                                                                       .get((card["power"], card["toughness"]), 0) + 1
-
-    @TextChunk._lock_if_formatted
-    def format_probabilities(self):
-        format_dictionary(self.subtypes)
-        format_dictionary(self.num_subtypes)
-        for cmc in self.power_toughness:
-            format_dictionary(self.power_toughness[cmc])
+            features.append(("power_toughness", (card["cmc"], (card["power"], card["toughness"]))))
 
-        super().format_probabilities()
+        return features
 
 
 class PlaneswalkerTextChunk(TextChunk):
     """
-    Stores extra Planeswalker-specific information:
+    Gives access to extra Planeswalker-specific information:
         loyalty_counters (Dict[int, int]): Maps number of starting loyalty counters to observed instances
     """
+    SATELLITE_ATTRIBUTES = TextChunk.SATELLITE_ATTRIBUTES + ("loyalty_counters",)
 
-    def __init__(self, text_chunk: List[str], is_full_stop: int = 0):
-        super().__init__(text_chunk, is_full_stop)
+    __slots__ = ()
 
-        self.loyalty_counters: Dict[int, int] = {}
-
-    @TextChunk._lock_if_formatted
-    def register_card(self, card: MTGCard):
-        super().register_card(card)
+    @classmethod
+    def card_features(cls, card: MTGCard) -> List[Tuple[str, Any]]:
+        features = super().card_features(card)
 
         if "loyalty" in card:
-            self.loyalty_counters[card["loyalty"]] = self.loyalty_counters.get(card["loyalty"], 0) + 1
-
-    @TextChunk._lock_if_formatted
-    def format_probabilities(self):
-        format_dictionary(self.loyalty_counters)
+            features.append(("loyalty_counters", card["loyalty"]))
 
-        super().format_probabilities()
+        return features
 
 
-def text_chunk_hash(chunk: List[str], is_full_stop: bool):
-    return hash("".join(chunk)) + is_full_stop
+CARD_TYPE_TO_CLASS = {
+    "Creature": CreatureTextChunk,
+    "Instant": TextChunk,
+    "Sorcery": TextChunk,
+    "Enchantment": TextChunk,
+    "Planeswalker": PlaneswalkerTextChunk,
+    "Artifact": TextChunk,
+    "Land": TextChunk
+}
@@ -1,6 +1,79 @@
-import nltk
+"""
+Tokenizes the rules text of cards.
 
-from typing import List
+word_tokenize gives the same tokens as nltk.tokenize.word_tokenize (Punkt sentence splitting followed by the
+Treebank word tokenizer) on card text, using a handful of precompiled regular expressions instead of the Punkt
+model. Braces, brackets and colons come off as their own tokens ("{T}:" is "{", "T", "}", ":"), counters and
+loyalty costs stay whole ("+1/+1", "+2", "−3"), "~" is a token of its own and "n't" and "'s" are split off
+the word before them.
+
+Punkt decides some sentence breaks with statistics it learned from English prose. Those are approximated here:
+a period after a word in ABBREVIATIONS doesn't end a sentence, and neither does a period after a number or single
+letter when the next word is lowercase. benchmarks/tokenizer_conformance.py compares the two on the card cache.
+"""
+
+import functools
+import re
+
+from typing import Iterator, List, Tuple
+
+# Abbreviations from Punkt's English model that can turn up in rules text
+ABBREVIATIONS = frozenset(["e.g", "i.e", "etc", "vs", "mr", "mrs", "ms", "dr", "st", "jr", "sr", "mt", "no",
+                           "approx", "inc", "co", "ft", "lt", "gen", "col", "capt", "sgt", "prof", "rev"])
+
+# Punkt: a possible sentence end, followed by either punctuation or whitespace and another token
+_SENTENCE_END = re.compile(r"(?P<word>\S*)[.?!](?=(?P<after>[)\";}\]*:@'({\[!?]|\s+(?P<next>\S+)))")
+_NON_WORD = re.compile(r"[)\";}\]*:@'({\[!?]")
+_NUMBER = re.compile(r"-?[.,]?\d[\d,.-]*\.?")
+_INITIAL = re.compile(r"[^\W\d]\.")
+_BOUNDARY_REALIGNMENT = re.compile(r"[\"')\]}]+?(?:\s+|(?=--)|$)", re.MULTILINE)
+
+# Lines of plain words (e.g. "Flying", "~ gets +1/+1 until end of turn.") that none of the rules below would
+# touch except to split off the final period
+_PLAIN_LINE = re.compile(r"(?:[\w+/~−—]|-(?!-)| )*\.?")
+
+# Treebank: (characters, rules), where the rules are skipped unless one of the characters is in the text
+_STARTING_QUOTES = (frozenset("\"'`«“‘„"), [
+    (re.compile(r"([«“‘„]|[`]+)"), r" \1 "),
+    (re.compile(r"^\""), r"``"),
+    (re.compile(r"(``)"), r" \1 "),
+    (re.compile(r"([ (\[{<])(\"|'{2})"), r"\1 `` "),
+    (re.compile(r"(?i)(')(?!re|ve|ll|m|t|s|d|n)(\w)\b"), r"\1 \2"),
+])
+# (characters, regexp, substitution), where a rule is skipped unless one of its characters is in the text
+_PUNCTUATION = [
+    (frozenset("."), re.compile(r"([^.])(\.)([\])}>\"']*)\s*$"), r"\1 \2 \3 "),
+    (frozenset(":,"), re.compile(r"([:,])([^\d])"), r" \1 \2"),
+    (frozenset(":,"), re.compile(r"([:,])$"), r" \1 "),
+    (frozenset("."), re.compile(r"\.{2,}"), r" \g<0> "),
+    (frozenset(";@#$%&"), re.compile(r"[;@#$%&]"), r" \g<0> "),
+    (frozenset("."), re.compile(r"([^.])(\.)([\])}>\"']*)\s*$"), r"\1 \2\3 "),
+    (frozenset("?!"), re.compile(r"[?!]"), r" \g<0> "),
+    (frozenset("'"), re.compile(r"([^'])' "), r"\1 ' "),
+    (frozenset("*"), re.compile(r"[*]"), r" \g<0> "),
+    (frozenset("[](){}<>"), re.compile(r"[\]\[(){}<>]"), r" \g<0> "),
+    (frozenset("-"), re.compile(r"--"), r" -- "),
+]
+_ENDING_QUOTES = (frozenset("\"'»”’"), [
+    (re.compile(r"([»”’])"), r" \1 "),
+    (re.compile(r"''"), " '' "),
+    (re.compile(r'"'), " '' "),
+    (re.compile(r"([^' ])('[sS]|'[mM]|'[dD]|') "), r"\1 \2 "),
+    (re.compile(r"([^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T) "), r"\1 \2 "),
+])
+# (guard, rules), where the rules only run if the guard is found in the text
+_CONTRACTIONS = (re.compile(r"(?i)\b(?:can|d|gim|gon|got|lem|more|wan)(?:not|'ye|me|na|ta|'n)\b| 't(?:is|was)\b"), [
+    (re.compile(r"(?i)\b(can)(not)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(d)('ye)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(gim)(me)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(gon)(na)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(got)(ta)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(lem)(me)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(more)('n)\b"), r" \1 \2 "),
+    (re.compile(r"(?i)\b(wan)(na)(?=\s)"), r" \1 \2 "),
+    (re.compile(r"(?i) ('t)(is)\b"), r" \1 \2 "),
+    (re.compile(r"(?i) ('t)(was)\b"), r" \1 \2 "),
+])
 
 
 def read_tokens(text: List[str]) -> List[List[str]]:
@@ -13,11 +86,103 @@ def read_tokens(text: List[str]) -> List[List[str]]:
     Returns:
         tokenized_text (List[List[str]]): List of lists of tokens (each inner list represents a line
     """
-    lines = []
-    for line in text:
-        lines.append(nltk.tokenize.word_tokenize(line.strip()))
+    return [list(_read_line(line.strip())) for line in text]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _read_line(line: str) -> Tuple[str, ...]:
+    # Keyword lines such as "Flying" recur on thousands of cards, so they are only tokenized once
+    return tuple(w.lower() for w in word_tokenize(line))
+
+
+def word_tokenize(text: str) -> List[str]:
+    """
+    Splits text into sentences and then words, as nltk.tokenize.word_tokenize does (see the module docstring).
+
+    Parameters:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: The tokens, in their original case
+    """
+    if _PLAIN_LINE.fullmatch(text) and not _CONTRACTIONS[0].search(text):
+        if text.endswith("."):
+            return text[:-1].split() + ["."]
+        return text.split()
+    return [token for sentence in sentences(text) for token in treebank_tokenize(sentence)]
+
+
+def sentences(text: str) -> Iterator[str]:
+    """
+    Splits text into sentences where Punkt would, moving closing quotes and brackets after a sentence end onto
+    the sentence they close.
+    """
+    breaks = []
+    last_break = 0
+    for match in _SENTENCE_END.finditer(text):
+        if _is_sentence_break(match):
+            breaks.append((last_break, match.end()))
+            last_break = match.start("next") if match.group("next") else match.end()
+    breaks.append((last_break, len(text.rstrip())))
+
+    realign = 0
+    for i, (start, end) in enumerate(breaks):
+        start += realign
+        realign = 0
+        if i + 1 < len(breaks):
+            following = _BOUNDARY_REALIGNMENT.match(text[slice(*breaks[i + 1])])
+            if following:
+                end = breaks[i + 1][0] + len(following.group(0).rstrip())
+                realign = len(following.group(0))
+        if start < end:
+            yield text[start:end]
+
+
+def _is_sentence_break(match) -> bool:
+    if match.group(0)[-1] in "?!":
+        return True
+    # The last token Punkt would see before the period
+    token = _NON_WORD.split(match.group("word"))[-1].lstrip("-,&#`") + "."
+    if token == ".":
+        return True
+    if token.endswith(".."):
+        return False
+
+    word = token[:-1].lower()
+    if word in ABBREVIATIONS or word.split("-")[-1] in ABBREVIATIONS:
+        return False
+    if _NUMBER.fullmatch(token) or _INITIAL.fullmatch(token):
+        # Unless the next token looks like it starts a sentence
+        following = match.group("next") or match.group("after")
+        return not (following[0] in ";:,.!?" or following[0].islower())
+    return True
+
+
+def treebank_tokenize(text: str) -> List[str]:
+    """
+    Splits a sentence into words with the rules of NLTK's Treebank word tokenizer.
+    """
+    # The rules only ever add spaces and quotes, so the characters present up front decide which rules can apply
+    present = set(text)
+    characters, rules = _STARTING_QUOTES
+    if not present.isdisjoint(characters):
+        for regexp, substitution in rules:
+            text = regexp.sub(substitution, text)
+    for characters, regexp, substitution in _PUNCTUATION:
+        if not present.isdisjoint(characters):
+            text = regexp.sub(substitution, text)
+
+    text = " " + text + " "
+    characters, rules = _ENDING_QUOTES
+    if not present.isdisjoint(characters):
+        for regexp, substitution in rules:
+            text = regexp.sub(substitution, text)
+    guard, rules = _CONTRACTIONS
+    if guard.search(text):
+        for regexp, substitution in rules:
+            text = regexp.sub(substitution, text)
 
-    return [[w.lower() for w in words] for words in lines]
+    return text.split()
 
 
 def chunkify(text: List[str], n: int) -> List[List[str]]:
@@ -1,48 +1,18 @@
-import os
-import pickle
-
-import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch
+import mtg_card_generator
 import mtg_card_generator.generator.generate_card as generate_text
-import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
 import mtg_card_generator.generator.render_text as render_text
 
 if __name__ == "__main__":
+    mtg_card_generator.configure_logging()
 
     chunk_length = 3
-    reset = True
     reset_json = False
 
-    if os.path.exists("test_data.dat") and not reset:
-        with open("test_data.dat", "rb") as F:
-            opening_text, lines_in_text = pickle.load(F)
-    else:
-        if reset_json:
-            cards = []
-            next_cards = api_fetch.get_cards(page = 0)
-            cards.extend(next_cards)
-            i = 1
-            while len(next_cards) == 100:
-                print(i)
-                next_cards = api_fetch.get_cards(page=i)
-                cards.extend(next_cards)
-                i += 1
-
-            with open("text_json.dat", "wb+") as F:
-                pickle.dump(cards, F)
-
-        else:
-            with open("text_json.dat", "rb") as F:
-                cards = pickle.load(F)
-
-        tcd, opening_text, lines_in_text = aggregator.gather_data(cards, chunk_length)
-        try:
-            with open("text_data.dat", "wb+") as F:
-                pickle.dump((opening_text, lines_in_text), F)
-        except RecursionError:
-            pass
+    model = initialize.initialize_aggregated_data(chunk_length, reset_json)
 
     for x in range(50):
-        generated_lines = generate_text.generate_text_chunk_list(opening_text, lines_in_text, card_type="Creature")
+        generated_lines = generate_text.generate_text_chunk_list(model, card_type="Creature")
         cmc = generate_text.determine_cmc(generated_lines)
         colors = generate_text.determine_color(generated_lines)
         power_toughness = generate_text.determine_power_toughness(cmc, generated_lines)
@@ -59,7 +29,7 @@ if __name__ == "__main__":
 
     for card_type in ["Instant", "Sorcery", "Enchantment"]:
         for x in range(50):
-            generated_lines = generate_text.generate_text_chunk_list(opening_text, lines_in_text, card_type=card_type)
+            generated_lines = generate_text.generate_text_chunk_list(model, card_type=card_type)
             cmc = generate_text.determine_cmc(generated_lines)
             colors = generate_text.determine_color(generated_lines)
             rarity = generate_text.determine_rarity(generated_lines)
@@ -71,7 +41,7 @@ if __name__ == "__main__":
             print(rendered_lines, end="\n----------------------------------------------------\n")
 
     for x in range(50):
-        generated_lines = generate_text.generate_text_chunk_list(opening_text, lines_in_text, card_type="Planeswalker")
+        generated_lines = generate_text.generate_text_chunk_list(model, card_type="Planeswalker")
         cmc = generate_text.determine_cmc(generated_lines)
         colors = generate_text.determine_color(generated_lines)
         loyalty = generate_text.determine_loyalty(generated_lines)
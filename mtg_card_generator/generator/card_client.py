@@ -0,0 +1,132 @@
+"""
+Client for a card server (see card_server), kept apart from the server so that asking a running server for cards
+doesn't import the model or the training code.
+
+An address is "host:port", or the path of a Unix socket.
+
+make_mtg_card tries the default address before every run that could use a server, so connecting is given only
+CONNECT_TIMEOUT, and a server has PROBE_TIMEOUT to answer /stats (see server_stats) before it is asked for cards.
+A port that drops packets, or a server that accepts connections but never answers, costs a run about a second at
+most rather than the whole timeout of a request for cards.
+"""
+
+import json
+import os
+
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Most cards a single request can ask for
+MAX_CARDS = 1000
+# Seconds to wait for a connection to a server
+CONNECT_TIMEOUT = 0.2
+# Seconds a server has to answer /stats, see server_stats
+PROBE_TIMEOUT = 1.0
+
+
+def is_unix_address(address: str) -> bool:
+    return os.sep in address
+
+
+def connect(address: str, timeout: float, connect_timeout: float = CONNECT_TIMEOUT):
+    """
+    Opens an HTTP connection to a server, over a Unix socket if the address is a path.
+
+    Parameters:
+        address (str): Address the server listens on (see the module docstring)
+        timeout (float): Seconds to wait for each read from the server once connected
+        connect_timeout (float): Seconds to wait for the connection
+
+    Returns:
+        http.client.HTTPConnection: The connection
+    """
+    # Only imported once there is a server to ask, as http.client is slow to import
+    import http.client
+    import socket
+
+    if not is_unix_address(address):
+        host, port = address.rsplit(":", 1)
+        connection = http.client.HTTPConnection(host, int(port), timeout=connect_timeout)
+    else:
+        connection = http.client.HTTPConnection("localhost", timeout=connect_timeout)
+        connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.sock.settimeout(connect_timeout)
+    try:
+        if connection.sock is None:
+            connection.connect()
+        else:
+            connection.sock.connect(address)
+    except OSError:
+        connection.close()
+        raise
+    connection.sock.settimeout(timeout)
+    return connection
+
+
+def get(address: str, path: str, timeout: float) -> Optional[Tuple[int, Any]]:
+    """
+    Sends a GET request to a server and reads its JSON answer.
+
+    Returns:
+        Optional[Tuple[int, Any]]: The status and the decoded body, or None if nothing answered with JSON
+    """
+    import http.client
+
+    try:
+        connection = connect(address, timeout)
+    except OSError:
+        return None
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    except (OSError, http.client.HTTPException, ValueError):
+        # ValueError includes json.JSONDecodeError, from anything but a card server answering
+        return None
+    finally:
+        connection.close()
+
+
+def server_stats(address: str, timeout: float = PROBE_TIMEOUT) -> Optional[Dict]:
+    """
+    Asks a server for its stats (see card_server), giving it only a short time to answer, to find out whether a
+    card server is running there before asking it for cards.
+
+    Returns:
+        Optional[Dict]: The stats, or None if no card server answered there in time
+    """
+    answer = get(address, "/stats", timeout)
+    if answer is None or answer[0] != 200 or not isinstance(answer[1], dict):
+        return None
+    return answer[1]
+
+
+def request_cards(address: str, card_type: str = "Creature", number: int = 1, seed: Optional[int] = None,
+                  chunk_length: Optional[int] = None, timeout: float = 30.0) -> Optional[List[Dict]]:
+    """
+    Asks a running server for cards.
+
+    Parameters:
+        address (str): Address the server listens on (see the module docstring)
+        card_type (str): Card type to generate
+        number (int): Number of cards to generate
+        seed (Optional[int]): Seed of the run, which gives the same cards as generating them locally with it
+        chunk_length (Optional[int]): Text chunk length the server's model must have
+        timeout (float): Seconds to wait for each read from the server, once connected
+
+    Returns:
+        Optional[List[MTGCard]]: The cards, or None if no card server with that chunk length answered there, e.g.
+                                 if another service listens on the address or the server couldn't make the cards
+    """
+    query = {"type": card_type, "n": number}
+    if seed is not None:
+        query["seed"] = seed
+    if chunk_length is not None:
+        query["tcl"] = chunk_length
+
+    answer = get(address, "/cards?" + urlencode(query), timeout)
+    # 409 is a server with another chunk length, and anything but 200 is treated as no server at all
+    if answer is None or answer[0] != 200:
+        return None
+    return answer[1]
@@ -0,0 +1,165 @@
+"""
+Long-running HTTP server that keeps a model loaded and generates cards on request.
+
+The server listens on a "host:port" address, or on a Unix socket if the address is a path. Endpoints:
+    GET /cards?type=Creature&n=1&seed=7&tcl=3
+        JSON list of n cards of the given type, generated in blocks as generate_card.generate_blocks generates them,
+        so that a seed gives the same cards as make_mtg_card --seed. The seed is optional and must be an integer.
+        If tcl is given and differs from the server's chunk length, the server answers 409.
+    GET /stats
+        JSON with the server's chunk length, number of requests served and latency percentiles in milliseconds.
+
+Requests are handled on a thread each. card_client asks a running server for cards.
+"""
+
+import collections
+import itertools
+import json
+import logging
+import os
+import secrets
+import signal
+import socketserver
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.card_client as card_client
+import mtg_card_generator.generator.generate_card as generate_card
+
+# Number of most recent request latencies the percentiles are taken over
+LATENCY_WINDOW = 10000
+PERCENTILES = (50, 90, 99)
+
+this_logger = logging.getLogger()
+
+
+class CardRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/cards":
+            try:
+                status, body = self.server.cards(query)
+            except Exception as e:
+                this_logger.exception(f"Failed to generate cards for {self.path}")
+                status, body = 500, {"error": str(e)}
+        elif url.path == "/stats":
+            status, body = 200, self.server.stats()
+        else:
+            status, body = 404, {"error": f"unknown path {url.path}"}
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if url.path == "/cards":
+            self.server.record_latency(time.perf_counter() - start)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        this_logger.debug(f"{self.address_string()} - {format % args}")
+
+
+class CardServerMixin:
+    """
+    Holds the model and the request latencies for the HTTP and Unix socket servers.
+    """
+    daemon_threads = True
+
+    def setup_model(self, model: markov_model.MarkovModel):
+        self.model = model
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.requests_served = 0
+
+    def cards(self, query: Dict[str, str]):
+        card_type = query.get("type", "Creature")
+        if card_type not in mtg_text_classes.CARD_TYPE_TO_CLASS:
+            return 400, {"error": f"unknown card type {card_type}"}
+        try:
+            number = int(query.get("n", 1))
+            chunk_length = int(query.get("tcl", self.model.chunk_length))
+            seed = int(query["seed"]) if "seed" in query else secrets.randbits(64)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        if not 0 < number <= card_client.MAX_CARDS:
+            return 400, {"error": f"n must be between 1 and {card_client.MAX_CARDS}"}
+        if chunk_length != self.model.chunk_length:
+            return 409, {"error": f"the server's text chunk length is {self.model.chunk_length}"}
+
+        blocks = generate_card.generate_blocks(self.model, card_type, number, seed)
+        return 200, list(itertools.chain.from_iterable(blocks))
+
+    def record_latency(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests_served += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests_served = self.requests_served
+        stats = {"text_chunk_length": self.model.chunk_length, "requests": requests_served}
+        if latencies:
+            for p in PERCENTILES:
+                index = min(len(latencies) - 1, int(len(latencies) * p / 100))
+                stats[f"p{p}_ms"] = round(latencies[index] * 1000, 3)
+        return stats
+
+
+class CardHTTPServer(CardServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class CardUnixServer(CardServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+def make_server(address: str, model: markov_model.MarkovModel):
+    """
+    Creates a server for the model on an address (see the module docstring), without starting it.
+    """
+    if card_client.is_unix_address(address):
+        if os.path.exists(address):
+            os.remove(address)
+        server = CardUnixServer(address, CardRequestHandler)
+    else:
+        host, port = address.rsplit(":", 1)
+        server = CardHTTPServer((host, int(port)), CardRequestHandler)
+    server.setup_model(model)
+    return server
+
+
+def serve(address: str, model: markov_model.MarkovModel):
+    """
+    Serves cards from the model until interrupted or terminated, then logs the latency percentiles.
+    """
+    server = make_server(address, model)
+    signal.signal(signal.SIGTERM, _interrupt)
+    this_logger.info(f"Serving cards on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if card_client.is_unix_address(address) and os.path.exists(address):
+            os.remove(address)
+        this_logger.info(f"Served {json.dumps(server.stats())}")
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
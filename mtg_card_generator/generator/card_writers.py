@@ -0,0 +1,94 @@
+"""
+Writes generated cards (see generate_card.generate_card) to a stream as text, JSON Lines or CSV.
+
+Each call to write formats its whole batch of cards into one string and writes it at once, and files are opened
+with a large buffer, so writing millions of cards costs a few large writes rather than a print per field.
+"""
+
+import csv
+import io
+import json
+import sys
+
+from typing import Dict, Iterable, List, Optional, TextIO
+
+# Columns of the CSV output. Power and toughness get a column each, and lists are joined with spaces.
+CSV_FIELDS = ("type", "subtypes", "manacost", "cmc", "colors", "rarity", "power", "toughness", "loyalty",
+              "rendered_lines")
+# Buffer size of output files, in bytes
+BUFFER_SIZE = 1 << 20
+
+
+def format_text(card: Dict) -> str:
+    """
+    Formats a card the way make_mtg_card has always printed it.
+    """
+    lines = [card["manacost"],
+             f"{card['type']} {'-' if card.get('subtypes') else ''} {card.get('subtypes', '')}",
+             card["rendered_lines"],
+             card["rarity"]]
+    if card["type"] == "Creature":
+        lines.append(f"{card['power_toughness'][0]}/{card['power_toughness'][1]}")
+    elif card["type"] == "Planeswalker":
+        lines.append(str(card["loyalty"]))
+    lines.append("----------------------------------------------------\n")
+    return "\n".join(lines)
+
+
+def csv_row(card: Dict) -> List:
+    """
+    Lists the values of a card in the order of CSV_FIELDS, leaving out fields the card doesn't have.
+    """
+    power_toughness = card.get("power_toughness") or ("", "")
+    values = dict(card, power=power_toughness[0], toughness=power_toughness[1])
+    return [" ".join(values[f]) if isinstance(values.get(f), list) else values.get(f, "") for f in CSV_FIELDS]
+
+
+class TextWriter:
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, cards: Iterable[Dict]):
+        self.stream.write("".join(format_text(card) for card in cards))
+
+
+class JSONLinesWriter:
+    """
+    Writes each card as it is generated, as one JSON object per line.
+    """
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, cards: Iterable[Dict]):
+        self.stream.write("".join(json.dumps(card, ensure_ascii=False) + "\n" for card in cards))
+
+
+class CSVWriter:
+    """
+    Writes the cards as CSV with a header row of CSV_FIELDS.
+    """
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.stream.write(self._format([CSV_FIELDS]))
+
+    def write(self, cards: Iterable[Dict]):
+        self.stream.write(self._format(csv_row(card) for card in cards))
+
+    @staticmethod
+    def _format(rows) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+
+WRITERS = {"text": TextWriter, "jsonl": JSONLinesWriter, "csv": CSVWriter}
+
+
+def open_output(path: Optional[str] = None) -> TextIO:
+    """
+    Opens a file to write cards to with a large buffer, or returns stdout if there is no path or it is "-".
+    """
+    if path is None or path == "-":
+        return sys.stdout
+    # CSV rows end in \r\n already, so newlines aren't translated
+    return open(path, "w", encoding="utf-8", newline="", buffering=BUFFER_SIZE)
@@ -0,0 +1,169 @@
+"""
+Analyses how walks of a CardTypeModel end, treating full stop chunks as the absorbing states of the chain.
+
+    steps_to_full_stop          fewest steps from each chunk to a full stop, or -1 if no full stop can be reached
+    expected_steps              expected steps from each chunk to a full stop, walking as ChainSampler does
+    single_successor_run_ends   the chunk ending the run that must follow each chunk with a single successor
+    single_successor_runs       the chunks of each such run, as a slice of a tuple shared along the run
+
+Every line seen in training ends in a full stop chunk, and every chunk was seen on such a line, so every chunk of
+a trained or updated model reaches a full stop and no walk can go on forever (line_length_report prints how many
+chunks can't, which is none). steps_to_full_stop lets a walk be steered to a full stop once a line gets long (see
+ChainSampler.walk_line). single_successor_run_ends and single_successor_runs let a walk take a whole run of chunks
+that each have only one successor without drawing any of them (see ChainSampler.compact), and let inference add up
+the satellite weights of the run once (see SparseTable.weighted_run).
+"""
+
+import array
+import collections
+
+from typing import List, Optional, Sequence, Tuple
+
+# Expected steps are iterated until no chunk's value changes by more than this many steps
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+
+def steps_to_full_stop(full_stop: Sequence[int], offsets: Sequence[int], targets: Sequence[int]) -> array.array:
+    """
+    Finds the fewest steps from each chunk to a full stop, by a breadth-first search back along the successor
+    edges from every full stop at once.
+
+    Returns:
+        array.array: Ints holding the steps of each chunk, or -1 for chunks that can't reach a full stop
+    """
+    num_chunks = len(full_stop)
+    predecessors = [[] for i in range(num_chunks)]
+    for chunk in range(num_chunks):
+        for edge in range(offsets[chunk], offsets[chunk + 1]):
+            predecessors[targets[edge]].append(chunk)
+
+    steps = array.array("i", [-1]) * num_chunks
+    queue = collections.deque(chunk for chunk in range(num_chunks) if full_stop[chunk])
+    for chunk in queue:
+        steps[chunk] = 0
+    while queue:
+        chunk = queue.popleft()
+        for predecessor in predecessors[chunk]:
+            if steps[predecessor] < 0:
+                steps[predecessor] = steps[chunk] + 1
+                queue.append(predecessor)
+    return steps
+
+
+def expected_steps(full_stop: Sequence[int], offsets: Sequence[int], targets: Sequence[int], counts: Sequence[int],
+                   steps: Sequence[int]) -> array.array:
+    """
+    Solves E[c] = 1 + sum over the successors t of c of p(c, t) * E[t], with E = 0 at full stops, by Gauss-Seidel
+    iteration over the chunks in order of their fewest steps to a full stop. Edges to chunks that can't reach a
+    full stop are left out, as no walk through them ends.
+
+    Parameters:
+        steps (Sequence[int]): See steps_to_full_stop
+
+    Returns:
+        array.array: Doubles holding the expected steps of each chunk, or infinity for chunks that can't reach a
+                     full stop
+    """
+    num_chunks = len(full_stop)
+    expected = array.array("d", bytes(8 * num_chunks))
+    order = sorted((chunk for chunk in range(num_chunks) if steps[chunk] > 0), key=steps.__getitem__)
+    rows = []
+    for chunk in order:
+        edges = [(targets[e], counts[e]) for e in range(offsets[chunk], offsets[chunk + 1]) if steps[targets[e]] >= 0]
+        total = float(sum(count for target, count in edges))
+        rows.append((chunk, [(target, count / total) for target, count in edges]))
+
+    for iteration in range(MAX_ITERATIONS):
+        change = 0.0
+        for chunk, edges in rows:
+            value = 1.0 + sum(p * expected[target] for target, p in edges)
+            change = max(change, abs(value - expected[chunk]))
+            expected[chunk] = value
+        if change <= TOLERANCE:
+            break
+
+    for chunk in range(num_chunks):
+        if steps[chunk] < 0:
+            expected[chunk] = float("inf")
+    return expected
+
+
+def single_successor_run_ends(full_stop: Sequence[int], offsets: Sequence[int], targets: Sequence[int]) -> array.array:
+    """
+    Finds, for each chunk that isn't a full stop and has a single successor, the chunk that ends the run of chunks a
+    walk must take after it: its successor, then that chunk's successor for as long as each has only one, up to and
+    including the first chunk that is a full stop or has several successors. This is the run of chunks the chunk and
+    its successors would be merged into as one macro-chunk. The run itself is found again by following the single
+    successors to its end, so each chunk costs one int however long its run is.
+
+    Returns:
+        array.array: Ints holding the chunk that ends the run after each chunk, or -1 for chunks with several
+                     successors, full stops, and chunks on a loop of single successors that never ends
+    """
+    num_chunks = len(full_stop)
+    ends = array.array("i", [-1]) * num_chunks
+    # Chunks whose run is known, or known to never end
+    settled = bytearray(num_chunks)
+
+    def forced(chunk: int) -> bool:
+        return not full_stop[chunk] and offsets[chunk + 1] - offsets[chunk] == 1
+
+    for chunk in range(num_chunks):
+        if settled[chunk] or not forced(chunk):
+            continue
+        # Follows the successors until a chunk that ends the run or whose run is already settled
+        path, on_path = [], set()
+        current = chunk
+        while forced(current) and not settled[current] and current not in on_path:
+            path.append(current)
+            on_path.add(current)
+            current = targets[offsets[current]]
+        if current in on_path or (forced(current) and ends[current] < 0):
+            # The path runs into a loop, so none of its runs end
+            end = -1
+        else:
+            end = ends[current] if forced(current) else current
+        for previous in path:
+            ends[previous] = end
+            settled[previous] = 1
+    return ends
+
+
+def single_successor_runs(offsets: Sequence[int], targets: Sequence[int],
+                          ends: Sequence[int]) -> Tuple[List[Optional[Tuple[int, ...]]], array.array]:
+    """
+    Lays out the run after each chunk that has one (see single_successor_run_ends) so that a walk can append it to a
+    line in one step. Every chunk of a run has the rest of the same run as its own run, so the chunks along a run
+    share one tuple, holding the first chunk and every chunk after it, and each chunk's run is the slice of the tuple
+    after the chunk. Runs that join a run laid out earlier copy its rest, so the tuples hold each chunk in a run
+    about once rather than once per chunk before it.
+
+    Parameters:
+        ends (Sequence[int]): See single_successor_run_ends
+
+    Returns:
+        Tuple[List[Optional[Tuple[int, ...]]], array.array]: The tuple holding the run of each chunk, or None for
+            chunks that don't start a run, and the ints holding where in the tuple each chunk's run starts
+    """
+    num_chunks = len(ends)
+    runs: List[Optional[Tuple[int, ...]]] = [None] * num_chunks
+    starts = array.array("i", bytes(4 * num_chunks))
+    for chunk in range(num_chunks):
+        end = ends[chunk]
+        if end < 0 or runs[chunk] is not None:
+            continue
+        path = [chunk]
+        current = targets[offsets[chunk]]
+        while current != end and runs[current] is None:
+            path.append(current)
+            current = targets[offsets[current]]
+        if current == end:
+            run = tuple(path) + (end,)
+        else:
+            # The rest of the run, from current on, is laid out already
+            run = tuple(path) + runs[current][starts[current] - 1:]
+        for i, previous in enumerate(path):
+            runs[previous] = run
+            starts[previous] = i + 1
+    return runs, starts
@@ -1,15 +1,25 @@
+import functools
+import hashlib
+import logging
 import random
 import re
 
 from collections import OrderedDict
-from fractions import Fraction
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 
-import mtg_card_generator.generator.probability_calculation as probability_calculation
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
 import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.inference as inference
 import mtg_card_generator.generator.render_text as render_text
 
 
+CONTAINS_X = re.compile("[+\/ ]x[-\/ .,]")
+
+# Number of cards generated from each seed derived by derive_seed (see generate_blocks)
+BLOCK_SIZE = 1000
+# Cards walked for each card asked for before novel_walks gives up on finding new ones
+MAX_WALKS_PER_CARD = 100
+
 COLORS_TO_PIP = {
     'Black': 'B',
     'Blue': 'U',
@@ -19,6 +29,8 @@ COLORS_TO_PIP = {
     'White': 'W'
 }
 
+this_logger = logging.getLogger()
+
 
 def select_random(dictionary: OrderedDict) -> Any:
     """
@@ -34,173 +46,362 @@ def select_random(dictionary: OrderedDict) -> Any:
     return random.choices(list(dictionary.keys()), weights=list(dictionary.values()))[0]
 
 
-def generate_card(opening_text: Dict[mtg_text_classes.TextChunk, int],
-                  lines_in_text: Dict[int, int],
-                  card_type: str = "Creature") -> mtg_text_classes.MTGCard:
+def generate_card(model: markov_model.MarkovModel, card_type: str = "Creature", rng=random) -> mtg_text_classes.MTGCard:
     """
     Generates a random Magic: the Gathering card
     Parameters:
-        opening_text (Dict[mtg_text_classes.TextChunk]): Mapping a text chunk that has been observed
-                                                      to begin a line to the number of times it has lead that line
-                                                      (or some other equivalent weighting)
-        lines_in_text (Dict[int, int]): Mapping the number of lines in an observed card to the number of times
-                                     we've seen cards with that number of lines.
+        model (markov_model.MarkovModel): Formatted model to generate the card from (see aggregator.gather_data)
         card_type (str): Card type to generate
+        rng (random.Random): Source of randomness, defaults to the global random module
 
     Returns:
         MTGCard: A dictionary with a set of fields for the card
     """
-    generated_lines = generate_text_chunk_list(opening_text, lines_in_text, card_type=card_type)
+    generated_lines = generate_text_chunk_list(model, card_type=card_type, rng=rng)
+    return generate_card_parameters(generated_lines, card_type, rng)
+
+
+def generate_cards(model: markov_model.MarkovModel, card_type: str = "Creature", n: int = 1, seed: Any = None,
+                   novel_only: Optional[str] = None, conditions: Optional[Dict[str, Any]] = None,
+                   max_line_chunks: Optional[int] = None) -> List[mtg_text_classes.MTGCard]:
+    """
+    Generates a batch of random Magic: the Gathering cards. The text of every card is walked at once
+    (see sampling.ChainSampler.walk_batch), after which the parameters of each card are determined in turn, from
+    log posteriors computed once for each distinct line and card of the batch (see inference.BatchPosterior).
+
+    Parameters:
+        model (markov_model.MarkovModel): Formatted model to generate the cards from (see aggregator.gather_data)
+        card_type (str): Card type to generate
+        n (int): Number of cards to generate
+        seed (Any): Seed for the batch's random number generator. The same seed gives the same cards.
+                    Seeds from the system if not given.
+        novel_only (Optional[str]): If given, only keep cards whose text is new at this level (see novel_walks)
+        conditions (Optional[Dict[str, Any]]): If given, generate cards with these attributes (see
+                                               conditioned_keys) by walking a conditioned sampler
+                                               (see CardTypeModel.conditioned_sampler)
+        max_line_chunks (Optional[int]): Chunks after which each line is steered to a full stop (see
+                                         sampling.ChainSampler.walk_line)
+
+    Returns:
+        List[MTGCard]: The cards, with the same fields as generate_card
+    """
+    rng = random.Random(seed)
+    type_model = model[card_type]
+    sampler = type_model.conditioned_sampler(conditioned_keys(type_model, conditions)) if conditions else \
+        type_model.sampler
+    walks = sampler.walk_batch(n, rng, max_line_chunks)
+    if novel_only is not None:
+        walks = novel_walks(model, card_type, walks, novel_only, rng, sampler, max_line_chunks)
+    batch = inference.BatchPosterior()
+    return [generate_card_parameters([[type_model.chunk(i) for i in line] for line in lines], card_type, rng,
+                                     conditions,
+                                     functools.partial(batch.log_posterior, tuple(tuple(line) for line in lines)))
+            for lines in walks]
+
+
+def colored_pips(colors: List[str]) -> int:
+    """
+    Counts the pips a mana cost needs to have a pip of each of the colors, i.e. none for a colorless card.
+
+    Parameters:
+        colors (List[str]): Color names, e.g. ["Blue", "Red"], or ["Colorless"]
+
+    Returns:
+        int: The number of colors other than Colorless
+    """
+    return sum(1 for color in colors if color != "Colorless")
+
+
+def conditioned_keys(type_model: markov_model.CardTypeModel, conditions: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """
+    Lists the satellite keys of a card type that meet each condition. Colors are matched as a set, as the keys
+    list them in the order of the card they were seen on. A cmc too low for a pip of each of the colors can't be
+    met either.
+
+    Parameters:
+        type_model (markov_model.CardTypeModel): Model of the card type
+        conditions (Dict[str, Any]): Any of "colors" (a list of color names, or ["Colorless"]), "cmcs" (an int)
+                                     and "rarities" (e.g. "Common")
+
+    Returns:
+        Dict[str, List[Any]]: The keys of each attribute that meet its condition
+    """
+    keys = {}
+    for attribute, value in conditions.items():
+        if attribute == "colors":
+            keys[attribute] = [k for k in type_model.satellites[attribute].keys if set(k.split()) == set(value)]
+        else:
+            keys[attribute] = [k for k in type_model.satellites[attribute].keys if k == value]
+        if not keys[attribute]:
+            raise ValueError(f"No {type_model.card_type} cards with {attribute} {value} were seen while training.")
+    if "colors" in conditions and "cmcs" in conditions and conditions["cmcs"] < colored_pips(conditions["colors"]):
+        raise ValueError(f"A mana cost of cmc {conditions['cmcs']} can't have a pip of each of the colors "
+                         f"{' '.join(conditions['colors'])}.")
+    return keys
+
+
+def novel_walks(model: markov_model.MarkovModel, card_type: str, walks: List[List[List[int]]], level: str,
+                rng=random, sampler=None, max_line_chunks: Optional[int] = None) -> List[List[List[int]]]:
+    """
+    Drops the walked cards whose text copies real cards (see novelty.NoveltyIndex.is_novel) and walks more in
+    their place, until there are as many as were walked or MAX_WALKS_PER_CARD cards have been walked for each.
+    The text is checked before anything else about the card is determined, so a rejected card costs only its walk.
+
+    Parameters:
+        model (markov_model.MarkovModel): Formatted model with its novelty index loaded (see
+                                          initialize_aggregated_data.load_novelty_index)
+        card_type (str): Card type walked
+        walks (List[List[List[int]]]): The walked cards, see sampling.ChainSampler.walk_batch
+        level (str): How strictly to reject copies, see novelty.NOVELTY_LEVELS
+        rng (random.Random): Source of randomness for walking more cards
+        sampler (Optional[sampling.ChainSampler]): Sampler to walk more cards with, by default the card type's
+        max_line_chunks (Optional[int]): See sampling.ChainSampler.walk_line
+
+    Returns:
+        List[List[List[int]]]: The walks of the cards with new text
+    """
+    type_model = model[card_type]
+    sampler = sampler or type_model.sampler
+    wanted = len(walks)
+    novel = []
+    walked = 0
+    while walks:
+        walked += len(walks)
+        novel += [lines for lines in walks
+                  if model.novelty.is_novel([type_model.line_tokens(line) for line in lines], level)]
+        if len(novel) == wanted:
+            break
+        if walked >= MAX_WALKS_PER_CARD * wanted:
+            this_logger.warning(f"Only found {len(novel)} of {wanted} {card_type} cards with new text after "
+                                f"walking {walked}.")
+            break
+        walks = sampler.walk_batch(wanted - len(novel), rng, max_line_chunks)
+    return novel
+
+
+def derive_seed(seed: int, *keys: Any) -> int:
+    """
+    Derives an independent 64 bit seed from a run's seed and some keys (e.g. a card type and block number).
+    The same seed and keys always give the same seed, in any process.
+    """
+    return int.from_bytes(hashlib.blake2b(repr((seed,) + keys).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def generate_block(model: markov_model.MarkovModel, card_type: str, n: int, seed: int, block: int,
+                   novel_only: Optional[str] = None, conditions: Optional[Dict[str, Any]] = None,
+                   max_line_chunks: Optional[int] = None) -> List[mtg_text_classes.MTGCard]:
+    """
+    Generates the n cards of one block of a seeded run, see generate_blocks.
+    """
+    return generate_cards(model, card_type, n, derive_seed(seed, card_type, block), novel_only, conditions,
+                          max_line_chunks)
+
+
+def generate_blocks(model: markov_model.MarkovModel, card_type: str = "Creature", n: int = 1, seed: int = 0,
+                    novel_only: Optional[str] = None, conditions: Optional[Dict[str, Any]] = None,
+                    max_line_chunks: Optional[int] = None) -> Iterator[List[mtg_text_classes.MTGCard]]:
+    """
+    Generates n cards in blocks of BLOCK_SIZE, each from its own seed derived from the run's seed, the card type
+    and the block's number. As no block depends on another, the blocks can be generated in any order or in
+    separate processes (see parallel_generation) and still give exactly the same cards for the same seed.
+
+    Parameters:
+        model (markov_model.MarkovModel): Formatted model to generate the cards from (see aggregator.gather_data)
+        card_type (str): Card type to generate
+        n (int): Number of cards to generate
+        seed (int): Seed of the run
+        novel_only (Optional[str]): If given, only keep cards whose text is new at this level (see novel_walks)
+        conditions (Optional[Dict[str, Any]]): If given, only generate cards with these attributes (see
+                                               generate_cards)
+        max_line_chunks (Optional[int]): See generate_cards
+
+    Returns:
+        Iterator[List[MTGCard]]: The cards of each block in turn
+    """
+    for block, start in enumerate(range(0, n, BLOCK_SIZE)):
+        yield generate_block(model, card_type, min(BLOCK_SIZE, n - start), seed, block, novel_only, conditions,
+                             max_line_chunks)
 
-    cmc = determine_cmc(generated_lines)
-    colors = determine_color(generated_lines)
-    pip_intensity = determine_pip_intensity(cmc, generated_lines)
+
+def generate_card_parameters(generated_lines: List[List[mtg_text_classes.TextChunk]], card_type: str,
+                             rng=random, conditions: Optional[Dict[str, Any]] = None,
+                             posterior: Optional[Callable] = None) -> mtg_text_classes.MTGCard:
+    """
+    Helper function to determine everything about a card other than its text, and put it all in a dictionary.
+    Attributes given in conditions (see conditioned_keys) are taken as they are rather than determined.
+    posterior, if given, replaces inference.log_posterior (see determine_random_card_variable).
+    """
+    conditions = conditions or {}
+    # The cmc, colors and pip intensity are drawn so that the mana cost has a pip of each color
+    minimum_cmc = colored_pips(conditions["colors"]) if "colors" in conditions else 0
+    cmc = conditions["cmcs"] if "cmcs" in conditions else determine_cmc(generated_lines, rng, posterior, minimum_cmc)
+    colors = [COLORS_TO_PIP[c] for c in conditions["colors"]] if "colors" in conditions else \
+        determine_color(generated_lines, rng, posterior, cmc)
+    pip_intensity = determine_pip_intensity(cmc, generated_lines, rng, posterior,
+                                            0 if colors == [COLORS_TO_PIP["Colorless"]] else len(colors))
     rendered_lines = render_text.render_text(generated_lines)
-    contains_x = bool(re.match("[+\/ ]x[-\/ .,]", rendered_lines))
+    contains_x = bool(CONTAINS_X.match(rendered_lines))
 
     generated_card = {
         'cmc': cmc,
         'colors': colors,
-        'manacost': determine_mana_cost(pip_intensity, cmc, colors, contains_x),
+        'manacost': determine_mana_cost(pip_intensity, cmc, colors, contains_x, rng),
         'type': card_type,
         'rendered_lines': rendered_lines,
-        'rarity': determine_rarity(generated_lines),
+        'rarity': conditions["rarities"] if "rarities" in conditions else determine_rarity(generated_lines, rng,
+                                                                                           posterior),
     }
 
     if card_type == "Creature":
-        generate_creature_parameters(generated_lines, card_generated_so_far=generated_card)
+        generate_creature_parameters(generated_lines, card_generated_so_far=generated_card, rng=rng,
+                                     posterior=posterior)
     elif card_type == "Planeswalker":
-        generate_planeswalker_parameters(generated_lines, card_generated_so_far=generated_card)
+        generate_planeswalker_parameters(generated_lines, card_generated_so_far=generated_card, rng=rng,
+                                         posterior=posterior)
 
     return generated_card
 
 
 def generate_creature_parameters(generated_lines: List[List[mtg_text_classes.TextChunk]],
-                                 card_generated_so_far: mtg_text_classes.MTGCard):
+                                 card_generated_so_far: mtg_text_classes.MTGCard,
+                                 rng=random, posterior: Optional[Callable] = None):
     """
     Helper function to generate extra parameters that are required for creature cards
     """
     new_parameters = {
-        'power_toughness': determine_power_toughness(card_generated_so_far['cmc'], generated_lines),
-        'subtypes': determine_subtype(generated_lines)
+        'power_toughness': determine_power_toughness(card_generated_so_far['cmc'], generated_lines, rng, posterior),
+        'subtypes': determine_subtype(generated_lines, rng, posterior)
     }
     card_generated_so_far.update(new_parameters)
 
 
 def generate_planeswalker_parameters(generated_lines: List[List[mtg_text_classes.TextChunk]],
-                                     card_generated_so_far: mtg_text_classes.MTGCard):
+                                     card_generated_so_far: mtg_text_classes.MTGCard,
+                                     rng=random, posterior: Optional[Callable] = None):
     """
     Helper function reo generate extra parameters that are required for Planeswalker cards
     """
     new_parameters = {
-        'loyalty': determine_loyalty(generated_lines)
+        'loyalty': determine_loyalty(generated_lines, rng, posterior)
     }
     card_generated_so_far.update(new_parameters)
 
 
-def generate_text_chunk_list(opening_text: Dict[mtg_text_classes.TextChunk, int],
-                             lines_in_text: Dict[int, int],
-                             card_type: str = "Creature") -> List[List[mtg_text_classes.TextChunk]]:
+def generate_text_chunk_list(model: markov_model.MarkovModel,
+                             card_type: str = "Creature",
+                             rng=random,
+                             max_line_chunks: Optional[int] = None) -> List[List[mtg_text_classes.TextChunk]]:
     """
     Takes in a set of generated parameters and, for a given card type, generates
     a random list of lists of text chunks representing a card of that type.
     Each list within the list of lists corresponds to line on that card.
 
     Parameters:
-         opening_text (Dict[mtg_text_classes.TextChunk]): Mapping a text chunk that has been observed
-                                                          to begin a line to the number of times it has lead that line
-                                                          (or some other equivalent weighting)
-         lines_in_text (Dict[int, int]): Mapping the number of lines in an observed card to the number of times
-                                         we've seen cards with that number of lines.
+         model (markov_model.MarkovModel): Formatted model to walk. The number of lines, the chunks that open each
+                                           line and the chunks that follow each chunk are drawn from the alias
+                                           tables of its ChainSamplers (see sampling).
          card_type (str): Card type to generate
+         rng (random.Random): Source of randomness, defaults to the global random module
+         max_line_chunks (Optional[int]): Chunks after which each line is steered to a full stop (see
+                                          sampling.ChainSampler.walk_line)
 
     Returns:
         List[List[mtg_text_classes.TextChunk]]: List of lines, each represented as a list of TextChunks
     """
-    num_lines = select_random(lines_in_text[card_type])
-    lines = []
-    for i in range(num_lines):
-        current_chunk = select_random(opening_text[card_type])
-        current_line = [current_chunk]
-
-        # Every card will eventually lead to a full stop
-        # This will eventually terminate
-        while not current_chunk.is_full_stop:
-            current_chunk = select_random(current_chunk.successors)
-            current_line.append(current_chunk)
-
-        lines.append(current_line)
-
-    return lines
+    type_model = model[card_type]
+    return [[type_model.chunk(i) for i in line] for line in type_model.sampler.walk(rng, max_line_chunks)]
 
 
 def determine_random_card_variable(lines: List[List[mtg_text_classes.TextChunk]],
-                                   var_names: List[str]) -> Union[int, str]:
+                                   var_names: List[str],
+                                   rng=random, prior: bool = False,
+                                   posterior: Optional[Callable] = None,
+                                   accept: Optional[Callable[[Any], bool]] = None) -> Union[int, str]:
     """
     Given a set of lines on a card(i.e. list of lists of text chunks), this function chooses a random variable that is
     to be the attribute of the card. The random selection is weighted according to the number of times we have
     seen these particular attributes appear on cards in the past.
 
     Assumes that each TextChunk is independent of the others and that the overall probability of a trait being
-    associated with the group is all the probabilities multiplied together.
+    associated with the group is all the (smoothed) probabilities multiplied together. The product is taken
+    as a sum in log space, see inference.
 
     Parameters:
         lines (List[List[TextChunk]): Generated rules text for the card
         var_names (List[str]): The variables needed to input to the dictionary to get the chances
+        rng (random.Random): Source of randomness, defaults to the global random module
+        prior (bool): Whether to draw from the values of the card type as a whole (see inference.log_prior) if no
+                      chunk on the card has seen any, e.g. at a cmc set by a condition
+        posterior (Optional[Callable]): Takes the lines and var_names and returns the log posterior, by default
+                                        inference.log_posterior. generate_cards passes one that shares the work
+                                        between the cards of a batch (see inference.BatchPosterior).
+        accept (Optional[Callable[[Any], bool]]): If given, only draw from the values it accepts
 
     Returns:
-        Union[int, str]: The trait in question that we want to determine
+        Union[int, str]: The trait in question that we want to determine, or None if there were no values to
+                         draw from
     """
-    probability_dict = {}
-    fallback_total = 1
-    for l in lines:
-        for text_chunk in l:
-            dictionary_to_use = vars(text_chunk)[var_names[0]]
-            for i in range(1, len(var_names)):
-                dictionary_to_use = dictionary_to_use.get(var_names[i], {})
-
-            probability_dict = probability_calculation.multiply_probability(
-                probability_dict,
-                dictionary_to_use,
-                Fraction(1, fallback_total),
-                Fraction(1, text_chunk.total_cards_registered)
-            )
-            fallback_total *= text_chunk.total_cards_registered
-
-    return select_random(probability_dict)
-
-def determine_cmc(lines: List[List[mtg_text_classes.TextChunk]]):
-    return int(determine_random_card_variable(lines, ["cmcs"]))
-
-
-def determine_color(lines: List[List[mtg_text_classes.TextChunk]]):
-    colors = determine_random_card_variable(lines, ["colors"])
-    return [COLORS_TO_PIP[c] for c in colors.split()]
+    scores = (posterior or inference.log_posterior)(lines, var_names)
+    if accept is not None and not all(map(accept, scores)):
+        scores = {key: score for key, score in scores.items() if accept(key)}
+    if prior and not scores:
+        scores = inference.log_prior(lines, var_names)
+        if accept is not None:
+            scores = {key: score for key, score in scores.items() if accept(key)}
+    return inference.sample(scores, rng)
+
+
+def determine_cmc(lines: List[List[mtg_text_classes.TextChunk]], rng=random, posterior: Optional[Callable] = None,
+                  minimum: int = 0):
+    if minimum == 0:
+        return int(determine_random_card_variable(lines, ["cmcs"], rng, posterior=posterior))
+    cmc = determine_random_card_variable(lines, ["cmcs"], rng, True, posterior, lambda key: key >= minimum)
+    return minimum if cmc is None else int(cmc)
+
+
+def determine_color(lines: List[List[mtg_text_classes.TextChunk]], rng=random, posterior: Optional[Callable] = None,
+                    cmc: Optional[int] = None):
+    """
+    Draws the colors of the card, only those with no more colors than a mana cost of the given cmc has room for.
+    """
+    # The same as colored_pips(key.split()) <= cmc, for the keys of the colors, at a fraction of the cost
+    colors = determine_random_card_variable(lines, ["colors"], rng, True, posterior,
+                                            None if cmc is None else
+                                            lambda key: key == "Colorless" or key.count(" ") < cmc)
+    return [COLORS_TO_PIP[c] for c in (colors or "Colorless").split()]
 
 
-def determine_pip_intensity(cmc: int, lines: List[List[mtg_text_classes.TextChunk]]):
+def determine_pip_intensity(cmc: int, lines: List[List[mtg_text_classes.TextChunk]], rng=random,
+                            posterior: Optional[Callable] = None, minimum: int = 0):
+    """
+    Draws the number of colored pips of the card, at least minimum, e.g. one for each of its colors.
+    """
     if cmc == 0:
         return 0
-    return determine_random_card_variable(lines, ["pip_intensity", cmc])
+    pip_intensity = determine_random_card_variable(lines, ["pip_intensity", cmc], rng, True, posterior,
+                                                   (lambda key: key >= minimum) if minimum else None)
+    return minimum if pip_intensity is None else pip_intensity
 
 
-def determine_power_toughness(cmc: int, lines: List[List[mtg_text_classes.TextChunk]]):
-    return determine_random_card_variable(lines, ["power_toughness", cmc])
+def determine_power_toughness(cmc: int, lines: List[List[mtg_text_classes.TextChunk]], rng=random,
+                              posterior: Optional[Callable] = None):
+    return determine_random_card_variable(lines, ["power_toughness", cmc], rng, prior=True, posterior=posterior)
 
 
-def determine_rarity(lines: List[List[mtg_text_classes.TextChunk]]):
-    return determine_random_card_variable(lines, ["rarities"])
+def determine_rarity(lines: List[List[mtg_text_classes.TextChunk]], rng=random, posterior: Optional[Callable] = None):
+    return determine_random_card_variable(lines, ["rarities"], rng, posterior=posterior)
 
 
-def determine_subtype(lines: List[List[mtg_text_classes.TextChunk]]):
-    return determine_random_card_variable(lines, ["subtypes"])
+def determine_subtype(lines: List[List[mtg_text_classes.TextChunk]], rng=random, posterior: Optional[Callable] = None):
+    return determine_random_card_variable(lines, ["subtypes"], rng, posterior=posterior)
 
 
-def determine_loyalty(lines: List[List[mtg_text_classes.TextChunk]]):
-    return determine_random_card_variable(lines, ["loyalty_counters"])
+def determine_loyalty(lines: List[List[mtg_text_classes.TextChunk]], rng=random, posterior: Optional[Callable] = None):
+    return determine_random_card_variable(lines, ["loyalty_counters"], rng, posterior=posterior)
 
 
-def determine_mana_cost(pip_intensity: int, cmc: int, colors: List[str], contains_x: bool = False) -> str:
+def determine_mana_cost(pip_intensity: int, cmc: int, colors: List[str], contains_x: bool = False,
+                        rng=random) -> str:
     """
     Determines the mana cost of the card. This can be uniquely determined from its
     pip_intensity (the number of non-generic mana symbols in its cost), its converted
@@ -213,7 +414,7 @@ def determine_mana_cost(pip_intensity: int, cmc: int, colors: List[str], contain
         cost += colors
         pip_intensity -= len(colors)
     while pip_intensity > 0:
-        cost.append(random.choice(colors))
+        cost.append(rng.choice(colors))
         pip_intensity -= 1
     mana_cost = "".join(cost)
     mana_cost = "".join(sorted(list(mana_cost)))
@@ -0,0 +1,149 @@
+"""
+Infers the attributes of a generated card (cmc, colors, rarity, ...) from the text chunks on it.
+
+Every entry of a satellite SparseTable has a smoothed log weight (see probability_calculation.log_weights).
+Treating the chunks as independent, the log posterior of a value is the sum of its log weights over every
+chunk on the card, so a card costs one float addition per stored value rather than a product of ever-growing
+Fractions. The log weights of the run of chunks after a chunk with a single successor are added up once (see
+SparseTable.weighted_run), so a run costs one row rather than one per chunk on it.
+
+Cards generated in a batch share most of their lines, and often their whole text. BatchPosterior sums the log
+weights of each distinct line once per batch, and those of each distinct card once, so that a card costs one
+addition per value and line, or a lookup if its text was seen earlier in the batch.
+"""
+
+import bisect
+import itertools
+import math
+import random
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+
+
+def log_posterior(lines: List[List[mtg_text_classes.TextChunk]], var_names: List[Any]) -> Dict[Any, float]:
+    """
+    Sums the log weights of an attribute over every text chunk on a card.
+
+    Parameters:
+        lines (List[List[TextChunk]]): Generated rules text for the card
+        var_names (List[Any]): The attribute, followed by the keys of any nested dictionaries
+                               (e.g. ["pip_intensity", cmc])
+
+    Returns:
+        Dict[Any, float]: Maps each value seen on any of the chunks to its unnormalized log probability
+    """
+    scores: Dict[Any, float] = {}
+    outer = var_names[1] if len(var_names) > 1 else None
+    for line in lines:
+        if not line:
+            continue
+        type_model = line[0].model
+        table = type_model.satellites[var_names[0]]
+        # The runs of the card type's sampler, if it is compacted. Every walk of the model follows them.
+        sampler = type_model.sampler
+        runs = sampler.runs if sampler is not None else None
+        if runs is None:
+            for text_chunk in line:
+                for key, weight in table.weighted_row(text_chunk.index, outer):
+                    scores[key] = scores.get(key, 0.0) + weight
+            continue
+        i = 0
+        while i < len(line):
+            index = line[i].index
+            for key, weight in table.weighted_row(index, outer):
+                scores[key] = scores.get(key, 0.0) + weight
+            run = runs[index]
+            if run is None:
+                i += 1
+                continue
+            start = sampler.run_starts[index]
+            for key, weight in table.weighted_run(run, start, outer):
+                scores[key] = scores.get(key, 0.0) + weight
+            i += len(run) - start + 1
+
+    return scores
+
+
+class BatchPosterior:
+    """
+    Log posteriors (see log_posterior) of the cards of a batch, computed once for each distinct line and card of
+    the batch. Cards are identified by the chunk indices of their lines, as walked (see
+    sampling.ChainSampler.walk_batch).
+    """
+    def __init__(self):
+        # (chunk indices of a line, attribute) -> log posterior of the line
+        self.lines: Dict[Tuple[Tuple[int, ...], Tuple[Any, ...]], Dict[Any, float]] = {}
+        # (chunk indices of every line of a card, attribute) -> log posterior of the card
+        self.cards: Dict[Tuple[Tuple[Tuple[int, ...], ...], Tuple[Any, ...]], Dict[Any, float]] = {}
+
+    def log_posterior(self, card: Sequence[Tuple[int, ...]], lines: List[List[mtg_text_classes.TextChunk]],
+                      var_names: List[Any]) -> Dict[Any, float]:
+        """
+        Parameters:
+            card (Sequence[Tuple[int, ...]]): Chunk indices of each line of the card
+            lines (List[List[TextChunk]]): The same lines as TextChunks
+            var_names (List[Any]): See log_posterior
+
+        Returns:
+            Dict[Any, float]: See log_posterior. The dictionary is shared with every card of the same text, so it
+                              mustn't be changed.
+        """
+        attribute = tuple(var_names)
+        scores = self.cards.get((card, attribute))
+        if scores is None:
+            scores = None
+            for line_key, line in zip(card, lines):
+                line_scores = self.lines.get((line_key, attribute))
+                if line_scores is None:
+                    line_scores = self.lines[line_key, attribute] = log_posterior([line], var_names)
+                if scores is None:
+                    scores = dict(line_scores)
+                    continue
+                get = scores.get
+                for key, weight in line_scores.items():
+                    scores[key] = get(key, 0.0) + weight
+            scores = scores or {}
+            self.cards[card, attribute] = scores
+        return scores
+
+
+def log_prior(lines: List[List[mtg_text_classes.TextChunk]], var_names: List[Any]) -> Dict[Any, float]:
+    """
+    Takes the log of the count of each value of an attribute over the card type as a whole (see
+    SparseTable.totals), for cards on which no chunk has seen any value of it.
+
+    Parameters:
+        lines (List[List[TextChunk]]): Generated rules text for the card, to find the card type's model by
+        var_names (List[Any]): See log_posterior
+
+    Returns:
+        Dict[Any, float]: Maps each value seen on the card type to its unnormalized log probability
+    """
+    chunks = [text_chunk for line in lines for text_chunk in line]
+    if not chunks:
+        return {}
+    totals = chunks[0].model.satellites[var_names[0]].totals(var_names[1] if len(var_names) > 1 else None)
+    return {key: math.log(count) for key, count in totals.items() if count > 0}
+
+
+def sample(scores: Dict[Any, float], rng=random) -> Any:
+    """
+    Draws a key from a dictionary of unnormalized log probabilities.
+
+    Parameters:
+        scores (Dict[Any, float]): See log_posterior
+        rng (random.Random): Source of randomness, defaults to the global random module
+
+    Returns:
+        Any: The drawn key, or None if there were no keys to draw from
+    """
+    if not scores:
+        return None
+    # Shift by the maximum so the largest weight is exactly 1 and nothing overflows
+    top = max(scores.values())
+    cumulative = list(itertools.accumulate([math.exp(s - top) for s in scores.values()]))
+    # Draws as rng.choices(keys, weights) does, so the same rng gives the same key, without its checks and copies
+    index = bisect.bisect(cumulative, rng.random() * cumulative[-1], 0, len(cumulative) - 1)
+    return next(itertools.islice(scores, index, None))
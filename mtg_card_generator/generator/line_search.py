@@ -0,0 +1,168 @@
+"""
+Finds the most probable lines and cards of a card type, rather than walking random ones.
+
+The probability of a line is that of its opening chunk among the opening text, times the probability of each
+chunk after it following the one before, as ChainSampler draws them. The search adds up the logs of these
+probabilities, so a line costs one addition per chunk.
+
+top_lines runs a beam search from the opening text. Every round, each partial line in the beam is extended by
+every successor of its last chunk. Lines that reach a full stop are kept as results, and only the beam_width most
+probable partial lines carry on. Extending a line can only make it less probable, so partial lines that are
+already less probable than the k-th best result are dropped, and the search ends when the beam is empty. A round
+costs at most beam_width times the successors of a chunk, however large the corpus, and there are at most
+max_line_chunks rounds. With a beam wide enough to hold every partial line, the search is exact.
+"""
+
+import heapq
+import math
+import random
+
+from typing import Any, Dict, List, Tuple
+
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.generate_card as generate_card
+
+DEFAULT_BEAM_WIDTH = 100
+# Longest line searched for by default, in chunks
+DEFAULT_MAX_LINE_CHUNKS = 32
+
+# The log probability of a line and the indices of its chunks
+ScoredLine = Tuple[float, List[int]]
+
+
+def top_lines(type_model: markov_model.CardTypeModel, k: int = 10, beam_width: int = DEFAULT_BEAM_WIDTH,
+              max_line_chunks: int = DEFAULT_MAX_LINE_CHUNKS, min_line_chunks: int = 1) -> List[ScoredLine]:
+    """
+    Searches for the k most probable lines of a card type.
+
+    Parameters:
+        type_model (markov_model.CardTypeModel): Model of the card type
+        k (int): Number of lines to find
+        beam_width (int): Number of partial lines carried from one round of the search to the next
+        max_line_chunks (int): Most chunks a line may have. Partial lines that can't reach a full stop within it
+                               (see chain_analysis.steps_to_full_stop) are dropped.
+        min_line_chunks (int): Fewest chunks a line may have
+
+    Returns:
+        List[ScoredLine]: Up to k lines with their log probabilities, most probable first
+    """
+    if k < 1:
+        return []
+    steps = type_model.analysis_arrays()["steps_to_full_stop"]
+    offsets, targets, counts = type_model.successor_offsets, type_model.successor_targets, type_model.successor_counts
+    full_stop = type_model.full_stop
+
+    def can_finish(chunk: int, line_chunks: int) -> bool:
+        return line_chunks + steps[chunk] <= max_line_chunks
+
+    openings = list(zip(type_model.opening_chunks, type_model.opening_counts))
+    log_total = math.log(sum(count for chunk, count in openings)) if openings else 0.0
+    candidates = [(math.log(count) - log_total, [chunk]) for chunk, count in openings if can_finish(chunk, 1)]
+    # Min-heap of the best lines found so far, so the k-th best is at the top
+    results: List[ScoredLine] = []
+    # Log of the total count of the successors of each chunk, as they are needed
+    log_totals: Dict[int, float] = {}
+
+    while candidates:
+        beam = []
+        for log_probability, line in candidates:
+            if full_stop[line[-1]]:
+                if len(line) >= min_line_chunks:
+                    _keep(results, k, (log_probability, line))
+            elif len(results) < k or log_probability > results[0][0]:
+                beam.append((log_probability, line))
+
+        candidates = []
+        for log_probability, line in heapq.nlargest(beam_width, beam, key=lambda item: item[0]):
+            if len(results) == k and log_probability <= results[0][0]:
+                continue
+            chunk = line[-1]
+            edges = range(offsets[chunk], offsets[chunk + 1])
+            chunk_log_total = log_totals.get(chunk)
+            if chunk_log_total is None:
+                chunk_log_total = math.log(sum(counts[e] for e in edges))
+                log_totals[chunk] = chunk_log_total
+            for e in edges:
+                if can_finish(targets[e], len(line) + 1):
+                    candidates.append((log_probability + math.log(counts[e]) - chunk_log_total, line + [targets[e]]))
+
+    return sorted(results, reverse=True)
+
+
+def _keep(results: List[ScoredLine], k: int, scored_line: ScoredLine):
+    if len(results) < k:
+        heapq.heappush(results, scored_line)
+    elif scored_line > results[0]:
+        heapq.heapreplace(results, scored_line)
+
+
+def top_texts(type_model: markov_model.CardTypeModel, lines: List[ScoredLine],
+              k: int = 10) -> List[Tuple[float, List[List[int]]]]:
+    """
+    Finds the k most probable rules texts that can be made of the given lines. The probability of a text is that
+    of its number of lines times that of each of its lines, as they are walked independently. Given the k most
+    probable lines (see top_lines), these are the k most probable texts whose lines were searched for.
+
+    Parameters:
+        type_model (markov_model.CardTypeModel): Model of the card type
+        lines (List[ScoredLine]): Lines to make the texts of, most probable first
+        k (int): Number of texts to find
+
+    Returns:
+        List[Tuple[float, List[List[int]]]]: Up to k texts, as the log probability and lines of each, most
+                                             probable first
+    """
+    total = sum(type_model.line_counts)
+    # Texts are expanded from the most probable, a line index at a time, so each is reached after those above it
+    queue = []
+    for number, count in zip(type_model.line_numbers, type_model.line_counts):
+        if number == 0 or lines:
+            indices = (0,) * number
+            queue.append((-(math.log(count / total) + sum(lines[i][0] for i in indices)), indices))
+    heapq.heapify(queue)
+    seen = {indices for score, indices in queue}
+
+    texts = []
+    while queue and len(texts) < k:
+        score, indices = heapq.heappop(queue)
+        texts.append((-score, [lines[i][1] for i in indices]))
+        for position in range(len(indices)):
+            if indices[position] + 1 < len(lines):
+                following = indices[:position] + (indices[position] + 1,) + indices[position + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(queue, (score - lines[following[position]][0] + lines[indices[position]][0],
+                                           following))
+    return texts
+
+
+def top_cards(model: markov_model.MarkovModel, card_type: str = "Creature", k: int = 10,
+              beam_width: int = DEFAULT_BEAM_WIDTH, max_line_chunks: int = DEFAULT_MAX_LINE_CHUNKS,
+              seed: Any = None) -> List[mtg_text_classes.MTGCard]:
+    """
+    Makes cards of the k most probable rules texts of a card type (see top_lines and top_texts). Everything about
+    the cards other than their text is determined as it is for generated cards.
+
+    Parameters:
+        model (markov_model.MarkovModel): Formatted model to search (see aggregator.gather_data)
+        card_type (str): Card type to search
+        k (int): Number of cards to make
+        beam_width (int): See top_lines
+        max_line_chunks (int): See top_lines
+        seed (Any): Seed for determining the rest of the cards. Seeds from the system if not given.
+
+    Returns:
+        List[MTGCard]: The cards, most probable text first, with the same fields as generate_card.generate_card
+                       and the log probability of their text in "log_probability"
+    """
+    type_model = model[card_type]
+    rng = random.Random(seed)
+    lines = top_lines(type_model, k, beam_width, max_line_chunks)
+    cards = []
+    for log_probability, text in top_texts(type_model, lines, k):
+        card = generate_card.generate_card_parameters([[type_model.chunk(i) for i in line] for line in text],
+                                                      card_type, rng)
+        card["log_probability"] = log_probability
+        cards.append(card)
+    return cards
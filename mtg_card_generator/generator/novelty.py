@@ -0,0 +1,142 @@
+"""
+Tells generated text apart from the text of real cards, and generated cards apart from each other.
+
+The index holds a 64 bit hash of the tokens of every line of rules text on a real card, and of the whole rules
+text of every real card, in two sorted arrays. It is built when the model is trained (see
+aggregator.build_novelty_index), saved next to the models (see model_store.save_novelty_index) and memory-mapped
+when loaded, so checking a generated card costs a hash and a binary search per line rather than any string
+comparisons. Lines are compared by their tokens, as the model produces them, so spacing and punctuation that
+rendering puts back can't hide a copy.
+"""
+
+import array
+import bisect
+import hashlib
+import logging
+
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence
+
+# How strictly --novel-only rejects copies:
+#     text   rejects cards whose whole rules text is the rules text of a real card
+#     lines  also rejects cards made only of lines of real cards, i.e. with no new line at all
+NOVELTY_LEVELS = ("text", "lines")
+
+# Separate the tokens of a line, and the lines of a text, before hashing
+_TOKEN_SEPARATOR = "\x1f"
+_LINE_SEPARATOR = "\x1e"
+
+this_logger = logging.getLogger()
+
+
+def line_hash(tokens: Sequence[str]) -> int:
+    """
+    Hashes the tokens of a line to a signed 64 bit integer.
+    """
+    return _hash(_TOKEN_SEPARATOR.join(tokens))
+
+
+def text_hash(lines: Iterable[Sequence[str]]) -> int:
+    """
+    Hashes the tokens of every line of a text, in order, to a signed 64 bit integer.
+    """
+    return _hash(_LINE_SEPARATOR.join(_TOKEN_SEPARATOR.join(tokens) for tokens in lines))
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class NoveltyIndex:
+    """
+    Sorted hashes of the lines and texts of real cards. Either may be an array or a memoryview onto a saved index.
+    """
+    def __init__(self, lines, texts):
+        self.lines = lines
+        self.texts = texts
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[List[List[str]]]) -> 'NoveltyIndex':
+        """
+        Builds the index from the tokens of each line of each real card's rules text. Empty lines are left out.
+        """
+        lines, whole_texts = set(), set()
+        for text in texts:
+            text = [tokens for tokens in text if tokens]
+            if text:
+                lines.update(line_hash(tokens) for tokens in text)
+                whole_texts.add(text_hash(text))
+        return cls(array.array("q", sorted(lines)), array.array("q", sorted(whole_texts)))
+
+    def copies_line(self, tokens: Sequence[str]) -> bool:
+        return _contains(self.lines, line_hash(tokens))
+
+    def copies_text(self, lines: Sequence[Sequence[str]]) -> bool:
+        return _contains(self.texts, text_hash(lines))
+
+    def is_novel(self, lines: Sequence[Sequence[str]], level: str = "text") -> bool:
+        """
+        Checks generated text against the index.
+
+        Parameters:
+            lines (Sequence[Sequence[str]]): The tokens of each line of the text
+            level (str): How strictly to reject copies, see NOVELTY_LEVELS
+
+        Returns:
+            bool: Whether the text counts as new at that level
+        """
+        if self.copies_text(lines):
+            return False
+        return level != "lines" or not all(self.copies_line(tokens) for tokens in lines)
+
+
+def _contains(hashes, value: int) -> bool:
+    i = bisect.bisect_left(hashes, value)
+    return i < len(hashes) and hashes[i] == value
+
+
+def card_hash(card: Dict) -> int:
+    """
+    Hashes the card type and rendered text of a generated card, which --unique keeps from repeating.
+    """
+    return _hash(f"{card['type']}{_LINE_SEPARATOR}{card['rendered_lines']}")
+
+
+def unique_cards(blocks: Iterable[List[Dict]], replace: Callable[[str, int, int], List[Dict]],
+                 max_attempts: int = 100) -> Iterator[List[Dict]]:
+    """
+    Drops every card whose type and text were already given earlier in the run, and fills each block back up
+    with replacements.
+
+    Parameters:
+        blocks (Iterable[List[Dict]]): Blocks of generated cards, see generate_card.generate_blocks
+        replace (Callable[[str, int, int], List[Dict]]): Generates replacements given a card type, a number of
+                                                         cards and the number of replacement batches drawn before,
+                                                         e.g. from a seed derived from that number
+        max_attempts (int): Replacement batches drawn for a block before giving up on filling it
+
+    Returns:
+        Iterator[List[Dict]]: The blocks without repeats. A block is short if it couldn't be filled.
+    """
+    seen = set()
+    attempt = 0
+    for cards in blocks:
+        unique = _new_cards(cards, seen)
+        for i in range(max_attempts):
+            if not cards or len(unique) == len(cards):
+                break
+            unique += _new_cards(replace(cards[0]["type"], len(cards) - len(unique), attempt), seen)
+            attempt += 1
+        if len(unique) < len(cards):
+            this_logger.warning(f"Only found {len(unique)} of {len(cards)} {cards[0]['type']} cards that weren't "
+                                f"already generated.")
+        yield unique
+
+
+def _new_cards(cards: List[Dict], seen: set) -> List[Dict]:
+    new = []
+    for card in cards:
+        key = card_hash(card)
+        if key not in seen:
+            seen.add(key)
+            new.append(card)
+    return new
@@ -0,0 +1,86 @@
+"""
+Generates the blocks of a seeded run (see generate_card.generate_blocks) on a pool of processes.
+
+Each worker loads the model once, from its saved file, and then generates whole blocks. Blocks are handed out in
+order and their cards come back in order, so the output is the same as generating the blocks serially, whatever
+the number of workers.
+
+If the parent process is recording metrics, each worker records its own stages and counters too, and sends them
+back with every block to be added to the parent's.
+"""
+
+import collections
+import itertools
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.metrics as metrics
+
+# The model of a worker process, loaded by _load_model
+_MODEL = None
+
+
+def _load_model(load_model: Callable[[], markov_model.MarkovModel], record: bool):
+    global _MODEL
+    # A forked worker inherits the parent's recorder, which must not be counted twice
+    metrics.disable()
+    if record:
+        metrics.enable()
+    _MODEL = load_model()
+
+
+def _generate_block(card_type: str, n: int, seed: int, block: int, novel_only: Optional[str],
+                    conditions: Optional[Dict[str, Any]],
+                    max_line_chunks: Optional[int]) -> Tuple[List[mtg_text_classes.MTGCard],
+                                                             Optional[metrics.Recorder]]:
+    cards = generate_card.generate_block(_MODEL, card_type, n, seed, block, novel_only, conditions,
+                                         max_line_chunks)
+    recorder = metrics.collect()
+    if recorder is not None:
+        recorder.count("worker_peak_memory_kib", metrics.peak_memory_kib() or 0)
+    return cards, recorder
+
+
+def generate_parallel(load_model: Callable[[], markov_model.MarkovModel], requests: Sequence[Tuple[str, int]],
+                      seed: int, jobs: int, novel_only: Optional[str] = None,
+                      conditions: Optional[Dict[str, Any]] = None,
+                      max_line_chunks: Optional[int] = None) -> Iterator[List[mtg_text_classes.MTGCard]]:
+    """
+    Generates the cards of several card types in blocks on a pool of processes.
+
+    Parameters:
+        load_model (Callable[[], MarkovModel]): Picklable function that loads the formatted model in a worker,
+                                                e.g. functools.partial(initialize.load_saved_model, 3)
+        requests (Sequence[Tuple[str, int]]): Card types and the number of cards of each to generate
+        seed (int): Seed of the run
+        jobs (int): Number of worker processes
+        novel_only (Optional[str]): If given, only keep cards whose text is new at this level (see
+                                    generate_card.novel_walks). load_model must then load the novelty index too.
+        conditions (Optional[Dict[str, Any]]): If given, only generate cards with these attributes (see
+                                               generate_card.generate_cards)
+        max_line_chunks (Optional[int]): See generate_card.generate_cards
+
+    Returns:
+        Iterator[List[MTGCard]]: The cards of each block, in the order generate_card.generate_blocks gives them
+                                 for each card type in turn
+    """
+    blocks = ((card_type, min(generate_card.BLOCK_SIZE, n - start), seed, block, novel_only, conditions,
+               max_line_chunks)
+              for card_type, n in requests
+              for block, start in enumerate(range(0, n, generate_card.BLOCK_SIZE)))
+
+    record = metrics.RECORDER is not None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_load_model, initargs=(load_model, record)) as executor:
+        # Only a few blocks per worker are generated ahead of the one being written
+        pending = collections.deque(executor.submit(_generate_block, *b) for b in itertools.islice(blocks, 2 * jobs))
+        while pending:
+            cards, recorder = pending.popleft().result()
+            if recorder is not None and metrics.RECORDER is not None:
+                metrics.RECORDER.merge(recorder)
+            for b in itertools.islice(blocks, 1):
+                pending.append(executor.submit(_generate_block, *b))
+            yield cards
@@ -1,5 +1,11 @@
+import array
+import math
+
 from fractions import Fraction
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
+
+# Pseudo-count added to every attribute value of every text chunk (additive smoothing)
+SMOOTHING = 1.0
 
 
 def format_dictionary(dictionary: Dict[Any, int]) -> Dict[Any, int]:
@@ -20,6 +26,28 @@ def format_dictionary(dictionary: Dict[Any, int]) -> Dict[Any, int]:
     return dictionary
 
 
+def log_weights(counts: Iterable[int], smoothing: float = SMOOTHING) -> array.array:
+    """
+    Takes raw counts and returns the log of each value's additively smoothed probability,
+    relative to the smoothed probability of a value that was never counted.
+
+    With n the count of a value, N the total count and V the number of values, the smoothed probability is
+    (n + smoothing) / (N + smoothing * V). Dividing by the probability of an unseen value,
+    smoothing / (N + smoothing * V), leaves log(1 + n / smoothing), which is zero for unseen values and so never
+    needs to be stored for them.
+    Summing these over several independent distributions gives log probabilities up to a constant that is the same
+    for every value, which is all that is needed to sample from them.
+
+    Parameters:
+        counts (Iterable[int]): The raw counts
+        smoothing (float): The pseudo-count added to every value
+
+    Returns:
+        array.array: Array of doubles holding the log weight of each count
+    """
+    return array.array("d", (math.log1p(v / smoothing) for v in counts))
+
+
 def multiply_probability(d1: Dict[Any, int], d2: Dict[Any, int], fallback_d1=1, fallback_d2=1):
     """
     Multiplies the keys of two dictionaries. If a key isn't present in one of them, the fallback value
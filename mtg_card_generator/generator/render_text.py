@@ -3,30 +3,54 @@ from typing import List
 import mtg_card_generator.data_processing.template_classes.mtg_text_classes as mtg_text_classes
 
 PUNCTUATION = list(".,?!;:'`\"") + ["n't", "'s"]
+_PUNCTUATION = frozenset(PUNCTUATION)
+
+
+def render_words(words: List[str], rendered_line: str = "") -> str:
+    """
+    Adds words to the end of a rendered line.
+
+    Parameters:
+        words (List[str]): The words to add
+        rendered_line (str): The line rendered so far
+
+    Returns:
+        str: The line with the words added
+    """
+    for word in words:
+        # No need to put a space before punctuation.
+        if word in _PUNCTUATION:
+            rendered_line += word
+        elif word == "~" and rendered_line[-2:] == "~ ":
+            pass
+        else:
+            rendered_line += " " + word
+
+    return rendered_line
 
 
 def render_line(chunk_list: List[mtg_text_classes.TextChunk]) -> str:
     """
     Takes in a list of text chunks and returns a string representing the text chunks joined together.
 
+    The text of each chunk is rendered once and kept by its model (see CardTypeModel.fragment), so a line is
+    rendered by joining the text of its chunks.
+
     Parameters:
         chunk_list (List[mtg_text_classes.TextChunk]): A list of text chunks to be turned into a rendered line.
 
     Returns:
         str: The line rendered as a string
     """
-    rendered_line = ""
+    fragments = []
     for chunk in chunk_list:
-        for word in chunk.text_chunk:
-            # No need to put a space before punctuation.
-            if word in PUNCTUATION:
-                rendered_line += word
-            elif word == "~" and rendered_line[-2:] == "~ ":
-                pass
-            else:
-                rendered_line += " " + word
+        if fragments and fragments[-1][-2:] == "~ ":
+            # The chunk's text depends on the line before it, so its words are added one by one
+            fragments = [render_words(chunk.text_chunk, "".join(fragments))]
+        else:
+            fragments.append(chunk.model.fragment(chunk.index))
 
-    return rendered_line
+    return "".join(fragments)
 
 
 def render_text(chunk_list_list: List[List[mtg_text_classes.TextChunk]]):
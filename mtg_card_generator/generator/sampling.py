@@ -0,0 +1,316 @@
+import array
+import random
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mtg_card_generator.generator.chain_analysis as chain_analysis
+
+
+def alias_table(weights: Sequence[float]) -> Tuple[List[float], List[int]]:
+    """
+    Builds an alias table (Vose's alias method) for a list of weights.
+
+    Each of the n slots holds the probability of keeping the slot's own index and an alias index to take
+    otherwise. A draw picks a slot uniformly and then either keeps it or takes its alias.
+
+    Parameters:
+        weights (Sequence[float]): Non-negative weights, not all zero
+
+    Returns:
+        Tuple[List[float], List[int]]: The keep probability and alias of every slot
+    """
+    size = len(weights)
+    total = float(sum(weights))
+    scaled = [float(w) * size / total for w in weights]
+    probabilities = [1.0] * size
+    aliases = list(range(size))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        less, more = small.pop(), large[-1]
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        if scaled[more] < 1.0:
+            small.append(large.pop())
+    # Anything left over is 1 up to floating point error, which the default probability already covers
+    return probabilities, aliases
+
+
+def successor_alias_arrays(offsets: Sequence[int], counts: Sequence[int]) -> Tuple[array.array, array.array]:
+    """
+    Builds the alias table of every row of CSR successor arrays (see markov_model), laid out alongside the counts.
+    The aliases of a row are indices within the row. Rows with no weight at all (e.g. chunks a conditioned
+    sampler weights as 0) are left drawing uniformly, as no walk reaches them.
+
+    Returns:
+        Tuple[array.array, array.array]: The keep probability (doubles) and alias (ints) of every edge
+    """
+    probabilities = array.array("d")
+    aliases = array.array("i")
+    for row in range(len(offsets) - 1):
+        weights = counts[offsets[row]:offsets[row + 1]]
+        if any(weights):
+            row_probabilities, row_aliases = alias_table(weights)
+        else:
+            row_probabilities, row_aliases = [1.0] * len(weights), range(len(weights))
+        probabilities.extend(row_probabilities)
+        aliases.extend(row_aliases)
+    return probabilities, aliases
+
+
+class AliasTable:
+    """
+    Precomputed table for drawing keys from a weighted dictionary in constant time (see alias_table).
+    A draw costs one random number and no allocation regardless of how many keys there are.
+    """
+    __slots__ = ("keys", "aliases", "probabilities", "size")
+
+    def __init__(self, dictionary: Dict[Any, Any]):
+        """
+        Parameters:
+            dictionary (Dict[Any, Any]): Dictionary mapping item to its weighting (counts, Fractions or floats)
+        """
+        self.keys: List[Any] = list(dictionary.keys())
+        self.size = len(self.keys)
+        if self.size == 0:
+            raise ValueError("Cannot build an alias table for an empty dictionary.")
+
+        self.probabilities, aliases = alias_table(list(dictionary.values()))
+        self.aliases: List[Any] = [self.keys[a] for a in aliases]
+
+    def draw(self, rng=random) -> Any:
+        """
+        Draws a random key, weighted by the values of the dictionary the table was built from.
+
+        Parameters:
+            rng (random.Random): Source of randomness, defaults to the global random module
+
+        Returns:
+            Any: Random key from the dictionary
+        """
+        u = rng.random() * self.size
+        i = int(u)
+        if u - i < self.probabilities[i]:
+            return self.keys[i]
+        return self.aliases[i]
+
+
+class ChainSampler:
+    """
+    Holds alias tables for every weighted choice made while walking a CardTypeModel, so that each
+    step of the random walk is a constant time draw.
+
+    Tables for the line counts and opening text are built up front. The successor tables are flat
+    arrays parallel to the model's successor edges. If the model carries them (see
+    CardTypeModel.sampling_arrays), they are used as they are. Otherwise the slice for a chunk is filled in
+    the first time the walk reaches it and reused from then on.
+
+    With chunk weights, every opening chunk and successor is drawn in proportion to its count times the weight
+    of the chunk drawn (see CardTypeModel.conditioned_sampler), and the successor tables are all built up front.
+
+    Walks can be given a number of chunks after which a line is steered to a full stop (see draw_toward_full_stop),
+    which bounds the length of every line.
+
+    Once compacted (see compact), a walk that reaches a chunk with a single successor appends the whole run of chunks
+    that must follow it at once, as a slice of a tuple laid out up front, without drawing or checking the line's
+    length for any of them. The lines walked, and the randomness used to walk them, are the same either way.
+    """
+    def __init__(self, type_model, chunk_weights: Optional[Sequence[float]] = None):
+        """
+        Parameters:
+            type_model (markov_model.CardTypeModel): The model to sample from
+            chunk_weights (Optional[Sequence[float]]): Positive weight of every chunk of the model
+        """
+        self.type_model = type_model
+        self.card_type = type_model.card_type
+        self.full_stop = type_model.full_stop
+        self.offsets = type_model.successor_offsets
+        self.targets = type_model.successor_targets
+        self.counts = type_model.successor_counts
+        self.chunk_weights = chunk_weights
+
+        lines_in_text = OrderedDict(zip(type_model.line_numbers, type_model.line_counts))
+        opening_text = OrderedDict(zip(type_model.opening_chunks, type_model.opening_counts))
+        if chunk_weights is not None:
+            opening_text = OrderedDict((chunk, count * chunk_weights[chunk]) for chunk, count in opening_text.items())
+        self.lines_in_text = AliasTable(lines_in_text) if lines_in_text else None
+        self.opening_text = AliasTable(opening_text) if opening_text else None
+
+        if chunk_weights is not None:
+            weights = [count * chunk_weights[target] for target, count in zip(self.targets, self.counts)]
+            self.probabilities, self.aliases = successor_alias_arrays(self.offsets, weights)
+            self.built = b"\x01" * len(self.full_stop)
+        elif type_model.alias_probabilities is not None:
+            self.probabilities = type_model.alias_probabilities
+            self.aliases = type_model.alias_indices
+            self.built = b"\x01" * len(self.full_stop)
+        else:
+            num_edges = len(self.targets)
+            self.probabilities = array.array("d", bytes(8 * num_edges))
+            self.aliases = array.array("i", bytes(4 * num_edges))
+            self.built = bytearray(len(self.full_stop))
+        # Tables of the successors draw_toward_full_stop may draw for each chunk, built as they are needed
+        self.toward_full_stop: Dict[int, AliasTable] = {}
+        # The chunk ending the run that must follow each chunk with a single successor, the tuple holding the run
+        # and where in it the run starts (see chain_analysis.single_successor_runs), filled in by compact
+        self.run_ends: Optional[array.array] = None
+        self.runs: Optional[List[Optional[Tuple[int, ...]]]] = None
+        self.run_starts: Optional[array.array] = None
+
+    def compact(self, shared: Optional['ChainSampler'] = None) -> 'ChainSampler':
+        """
+        Lays out the run of chunks that must follow each chunk with a single successor (see
+        chain_analysis.single_successor_runs), so that walks take each run at once instead of one draw per chunk.
+        The runs depend only on the chunk graph, so a sampler of the same model that is compacted already (e.g. the
+        card type's own) can be given to share them.
+        """
+        if self.run_ends is None:
+            if shared is not None and shared.run_ends is not None:
+                self.run_ends, self.runs, self.run_starts = shared.run_ends, shared.runs, shared.run_starts
+            else:
+                self.run_ends = chain_analysis.single_successor_run_ends(self.full_stop, self.offsets, self.targets)
+                self.runs, self.run_starts = chain_analysis.single_successor_runs(self.offsets, self.targets,
+                                                                                  self.run_ends)
+        return self
+
+    def _build_successors(self, chunk: int):
+        start, end = self.offsets[chunk], self.offsets[chunk + 1]
+        probabilities, aliases = alias_table(self.counts[start:end])
+        self.probabilities[start:end] = array.array("d", probabilities)
+        self.aliases[start:end] = array.array("i", aliases)
+        self.built[chunk] = 1
+
+    def draw_successor(self, chunk: int, rng=random) -> int:
+        """
+        Draws the index of a chunk to follow the given chunk, weighted by how often it has been seen to follow it.
+        """
+        start = self.offsets[chunk]
+        size = self.offsets[chunk + 1] - start
+        if size == 1:
+            return self.targets[start]
+        if not self.built[chunk]:
+            self._build_successors(chunk)
+
+        u = rng.random() * size
+        i = int(u)
+        if u - i < self.probabilities[start + i]:
+            return self.targets[start + i]
+        return self.targets[start + self.aliases[start + i]]
+
+    def draw_toward_full_stop(self, chunk: int, rng=random) -> int:
+        """
+        Draws the index of a chunk to follow the given chunk from among the successors that are fewer steps from a
+        full stop than it is (see chain_analysis.steps_to_full_stop), weighted as draw_successor weights them.
+        Drawing only these, a walk reaches a full stop in as many steps as the chunk is from one.
+        """
+        start = self.offsets[chunk]
+        if self.offsets[chunk + 1] - start == 1:
+            # The only successor is always a step closer, and as in draw_successor no randomness is used
+            return self.targets[start]
+        table = self.toward_full_stop.get(chunk)
+        if table is None:
+            steps = self.type_model.analysis_arrays()["steps_to_full_stop"]
+            edges = [e for e in range(start, self.offsets[chunk + 1]) if 0 <= steps[self.targets[e]] < steps[chunk]]
+            weights = OrderedDict((self.targets[e], self.counts[e]) for e in edges)
+            if self.chunk_weights is not None:
+                conditioned = OrderedDict((target, count * self.chunk_weights[target])
+                                          for target, count in weights.items())
+                # Steering to a full stop comes first, so if the weights rule out every closer successor the
+                # counts are used as they are
+                if any(conditioned.values()):
+                    weights = conditioned
+            table = self.toward_full_stop[chunk] = AliasTable(weights)
+        return table.draw(rng)
+
+    def walk_line(self, rng=random, max_line_chunks: Optional[int] = None) -> List[int]:
+        """
+        Walks from a random opening chunk to a full stop.
+
+        Parameters:
+            rng (random.Random): Source of randomness, defaults to the global random module
+            max_line_chunks (Optional[int]): Chunks after which the line is steered to a full stop (see
+                                             draw_toward_full_stop)
+
+        Returns:
+            List[int]: Indices of the chunks on the line
+        """
+        current_chunk = self.opening_text.draw(rng)
+        current_line = [current_chunk]
+        runs, run_starts = self.runs, self.run_starts
+
+        # Every chunk was seen on a line that ended in a full stop (see chain_analysis), so this will eventually
+        # terminate
+        while not self.full_stop[current_chunk]:
+            if runs is not None and runs[current_chunk] is not None:
+                # A run is what drawing one successor at a time would give, with or without max_line_chunks
+                current_line += runs[current_chunk][run_starts[current_chunk]:]
+                current_chunk = current_line[-1]
+                continue
+            if max_line_chunks is not None and len(current_line) >= max_line_chunks:
+                current_chunk = self.draw_toward_full_stop(current_chunk, rng)
+            else:
+                current_chunk = self.draw_successor(current_chunk, rng)
+            current_line.append(current_chunk)
+        return current_line
+
+    def walk(self, rng=random, max_line_chunks: Optional[int] = None) -> List[List[int]]:
+        """
+        Walks a random number of lines.
+
+        Parameters:
+            rng (random.Random): Source of randomness, defaults to the global random module
+            max_line_chunks (Optional[int]): See walk_line
+
+        Returns:
+            List[List[int]]: List of lines, each represented as a list of chunk indices
+        """
+        if self.lines_in_text is None or self.opening_text is None:
+            raise ValueError(f"No {self.card_type} cards were seen while training.")
+        return [self.walk_line(rng, max_line_chunks) for i in range(self.lines_in_text.draw(rng))]
+
+    def walk_batch(self, number: int, rng=random, max_line_chunks: Optional[int] = None) -> List[List[List[int]]]:
+        """
+        Walks a batch of cards at once. Every line of every card starts together and they are advanced in
+        lockstep, one chunk per round, with each line retired from the batch once it reaches a full stop.
+
+        Once compacted, a line takes each run of single successors at once and sits out the rounds the run covers,
+        so the lines drawing in each round, and the order they draw in, are as they would be without compacting.
+
+        Parameters:
+            number (int): Number of cards to walk
+            rng (random.Random): Source of randomness, defaults to the global random module
+            max_line_chunks (Optional[int]): See walk_line
+
+        Returns:
+            List[List[List[int]]]: For each card, its list of lines, each represented as a list of chunk indices
+        """
+        if self.lines_in_text is None or self.opening_text is None:
+            raise ValueError(f"No {self.card_type} cards were seen while training.")
+
+        cards = [[[self.opening_text.draw(rng)] for i in range(self.lines_in_text.draw(rng))] for c in range(number)]
+        full_stop, runs, run_starts = self.full_stop, self.runs, self.run_starts
+        if runs is not None:
+            for card in cards:
+                for line in card:
+                    if runs[line[0]] is not None:
+                        line += runs[line[0]][run_starts[line[0]]:]
+        active = [line for card in cards for line in card if not full_stop[line[-1]]]
+        line_chunks = 1
+        while active:
+            if max_line_chunks is not None and line_chunks >= max_line_chunks:
+                draw = self.draw_toward_full_stop
+            else:
+                draw = self.draw_successor
+            for line in active:
+                # Lines longer than the round took a run and wait for the round to catch up
+                if len(line) == line_chunks:
+                    chunk = draw(line[-1], rng)
+                    line.append(chunk)
+                    if runs is not None and runs[chunk] is not None:
+                        line += runs[chunk][run_starts[chunk]:]
+            line_chunks += 1
+            active = [line for line in active if not full_stop[line[-1]]]
+        return cards
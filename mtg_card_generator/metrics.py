@@ -0,0 +1,210 @@
+"""
+Records where the time of a run goes: wall time per stage, counters over the generated cards and peak memory.
+
+Recording is off unless enable() is called. While it is off, stage() is an empty context manager and nothing in
+the per-card code path is touched. enable() wraps the per-card functions listed in INSTRUMENTED (the determine_*
+functions, the walks, rendering and inference) with timed versions for the rest of the run. disable() puts the
+original functions back.
+
+Worker processes record on their own Recorder (see parallel_generation): collect() hands over what a worker has
+recorded so far and Recorder.merge() adds it to the run's totals.
+"""
+
+import contextlib
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# The Recorder while recording is enabled
+RECORDER: Optional['Recorder'] = None
+
+
+class Recorder:
+    """
+    Totals of the time spent in each stage and of the values of each counter.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        # Stage -> [calls, seconds]
+        self.stages: Dict[str, list] = OrderedDict()
+        # Counter -> [count, total, minimum, maximum]
+        self.counters: Dict[str, list] = OrderedDict()
+
+    def add_time(self, name: str, seconds: float):
+        totals = self.stages.get(name)
+        if totals is None:
+            self.stages[name] = [1, seconds]
+        else:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def count(self, name: str, value: int):
+        totals = self.counters.get(name)
+        if totals is None:
+            self.counters[name] = [1, value, value, value]
+        else:
+            totals[0] += 1
+            totals[1] += value
+            totals[2] = min(totals[2], value)
+            totals[3] = max(totals[3], value)
+
+    def merge(self, other: 'Recorder'):
+        """
+        Adds the stages and counters of another recorder, e.g. that of a worker process, to these.
+        """
+        for name, (calls, seconds) in other.stages.items():
+            totals = self.stages.setdefault(name, [0, 0.0])
+            totals[0] += calls
+            totals[1] += seconds
+        for name, (count, total, minimum, maximum) in other.counters.items():
+            totals = self.counters.get(name)
+            if totals is None:
+                self.counters[name] = [count, total, minimum, maximum]
+            else:
+                totals[0] += count
+                totals[1] += total
+                totals[2] = min(totals[2], minimum)
+                totals[3] = max(totals[3], maximum)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: The stages with their calls and seconds, the counters with their count, mean,
+                            minimum and maximum, the peak resident memory in KiB and the wall time so far
+        """
+        return {
+            "wall_seconds": round(time.perf_counter() - self.start, 6),
+            "peak_memory_kib": peak_memory_kib(),
+            "stages": {name: {"calls": calls, "seconds": round(seconds, 6)}
+                       for name, (calls, seconds) in self.stages.items()},
+            "counters": {name: {"count": count, "mean": round(total / count, 3), "min": minimum, "max": maximum}
+                         for name, (count, total, minimum, maximum) in self.counters.items()},
+        }
+
+
+def peak_memory_kib() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS and KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """
+    Times the body of the with statement as a stage, if recording is enabled. Meant for stages that run a
+    handful of times per run, such as loading or training the model.
+    """
+    recorder = RECORDER
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_time(name, time.perf_counter() - start)
+
+
+def timed(name: str, function: Callable, counter: Optional[Callable[[Any, Recorder], None]] = None) -> Callable:
+    """
+    Wraps a function to time each call as the stage `name`, then pass its result to `counter` with the recorder.
+    """
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        RECORDER.add_time(name, time.perf_counter() - start)
+        if counter is not None:
+            counter(result, RECORDER)
+        return result
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+def _count_walk(lines, recorder: Recorder):
+    recorder.count("lines_per_card", len(lines))
+    for line in lines:
+        recorder.count("chunks_per_line", len(line))
+
+
+def _count_walk_batch(cards, recorder: Recorder):
+    for lines in cards:
+        _count_walk(lines, recorder)
+
+
+def _count_scores(scores, recorder: Recorder):
+    recorder.count("inference_dictionary_size", len(scores))
+
+
+def _instrumented():
+    """
+    Lists (owner, attribute, stage, counter) for every function enable() wraps. Imported here rather than at the
+    top so that importing this module stays free.
+    """
+    import mtg_card_generator.generator.generate_card as generate_card
+    import mtg_card_generator.generator.inference as inference
+    import mtg_card_generator.generator.render_text as render_text
+    import mtg_card_generator.generator.sampling as sampling
+
+    determiners = ("determine_cmc", "determine_color", "determine_pip_intensity", "determine_power_toughness",
+                   "determine_rarity", "determine_subtype", "determine_loyalty", "determine_mana_cost")
+    return [(sampling.ChainSampler, "walk", "walk", _count_walk),
+            (sampling.ChainSampler, "walk_batch", "walk", _count_walk_batch),
+            (inference, "log_posterior", "inference", _count_scores),
+            (render_text, "render_text", "render", None)] + \
+           [(generate_card, name, name, None) for name in determiners]
+
+
+# (owner, attribute, original function) of every function wrapped by enable()
+_ORIGINALS = []
+
+
+def enable() -> Recorder:
+    """
+    Starts recording, if it isn't already.
+
+    Returns:
+        Recorder: The recorder for the run
+    """
+    global RECORDER
+    if RECORDER is None:
+        RECORDER = Recorder()
+        for owner, attribute, name, counter in _instrumented():
+            function = getattr(owner, attribute)
+            _ORIGINALS.append((owner, attribute, function))
+            setattr(owner, attribute, timed(name, function, counter))
+    return RECORDER
+
+
+def collect() -> Optional[Recorder]:
+    """
+    Hands over what has been recorded so far and carries on recording on a new recorder.
+
+    Returns:
+        Optional[Recorder]: The recorder so far, if recording is enabled
+    """
+    global RECORDER
+    recorder = RECORDER
+    if recorder is not None:
+        RECORDER = Recorder()
+    return recorder
+
+
+def disable() -> Optional[Recorder]:
+    """
+    Stops recording and restores the wrapped functions.
+
+    Returns:
+        Optional[Recorder]: The recorder of the run, if recording was enabled
+    """
+    global RECORDER
+    recorder, RECORDER = RECORDER, None
+    while _ORIGINALS:
+        owner, attribute, function = _ORIGINALS.pop()
+        setattr(owner, attribute, function)
+    return recorder
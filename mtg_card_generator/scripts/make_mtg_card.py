@@ -1,13 +1,23 @@
 """
 Command-line script to generate an MTG card
+
+Only the argument parser and the server client are imported up front. The model, the training code and the
+download code are imported on the paths that use them, so --help and asking a running server for cards start
+quickly, and generating from a saved model never imports requests (see benchmarks/import_check.py).
 """
 
 import argparse
+import functools
+import json
+import secrets
+import sys
 
-from typing import List
+from typing import Dict, List, Optional
 
-import mtg_card_generator.generator.generate_card as generate_card
-import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+import mtg_card_generator
+import mtg_card_generator.generator.card_client as card_client
+import mtg_card_generator.generator.card_writers as card_writers
+import mtg_card_generator.metrics as metrics
 
 
 def parse_args():
@@ -26,31 +36,237 @@ def parse_args():
                                                       "Defaults to third order, which I find tends to perform the "
                                                       "best.",
                         default=3, type=int)
+    parser.add_argument("--train-chunk-lengths", help="Text chunk lengths to train alongside --text-chunk-length "
+                                                      "when the model has to be trained, so that switching to "
+                                                      "them later doesn't retrain. Defaults to 2 3 4 5.",
+                        nargs="+", type=int)
     parser.add_argument("--reset-json", help="Forces the program to completely reload its data. This will update it "
                                              "to include the most recent cards, but this will take a significant "
                                              "amount of time.",
                         action="store_true")
+    parser.add_argument("--update-json", help="Downloads the card data again, but only adds the cards that are "
+                                              "new to the saved data and models rather than retraining them.",
+                        action="store_true")
+    parser.add_argument("--set", help="Only download cards from these sets (by set code) with --update-json, "
+                                      "e.g. after a set release.",
+                        nargs="+")
+    parser.add_argument("-j", "--jobs", help="Number of processes to train the model with, when it has to be "
+                                             "trained, and to generate the cards with. Defaults to 1.",
+                        default=1, type=int)
+    parser.add_argument("--seed", help="Seed for the run. The same seed gives exactly the same cards, with any "
+                                       "number of --jobs. Implies --no-server.",
+                        type=int)
+    parser.add_argument("--color", help="Only generate cards of exactly these colors, e.g. --color Blue Red, or "
+                                        "--color Colorless. The text is walked towards chunks seen on cards of "
+                                        "those colors rather than generated and thrown away. Implies --no-server.",
+                        nargs="+", choices=["White", "Blue", "Black", "Red", "Green", "Colorless"])
+    parser.add_argument("--cmc", help="Only generate cards of this converted mana cost, as --color does. Implies "
+                                      "--no-server.",
+                        type=int)
+    parser.add_argument("--rarity", help="Only generate cards of this rarity (e.g. Common), as --color does. "
+                                         "Implies --no-server.")
+    parser.add_argument("--max-line-chunks", help="Once a line of rules text is this many text chunks long, steer it "
+                                                  "to the nearest end of a line, so that no line runs on. Implies "
+                                                  "--no-server.",
+                        type=int, metavar="N")
+    parser.add_argument("--novel-only", help="Reject generated cards that copy real cards, and generate others in "
+                                             "their place: with text (the default), cards whose whole rules text "
+                                             "is a real card's; with lines, also cards whose every line is on a "
+                                             "real card. Implies --no-server.",
+                        nargs="?", choices=["text", "lines"], const="text")
+    parser.add_argument("--unique", help="Never give the same card type and rules text twice in a run. Implies "
+                                         "--no-server.",
+                        action="store_true")
+    parser.add_argument("--top", help="Instead of generating random cards, write the K most probable cards of each "
+                                      "card type, found by a beam search over the model for the most probable "
+                                      "text. The rest of each card is determined as usual. Lines are at most "
+                                      "--max-line-chunks chunks long (32 by default). Implies --no-server.",
+                        type=int, metavar="K")
+    parser.add_argument("--beam-width", help="Partial lines the search of --top keeps at each step. Wider beams "
+                                             "find more probable lines, at the cost of time. Defaults to 100.",
+                        type=int, metavar="W")
+    parser.add_argument("--serve", help="Instead of printing cards, keep the model loaded and serve cards over HTTP "
+                                        "on this address (host:port, or a path for a Unix socket). Defaults to "
+                                        f"{card_client.DEFAULT_ADDRESS}.",
+                        nargs="?", const=card_client.DEFAULT_ADDRESS, metavar="ADDRESS")
+    parser.add_argument("--server", help="Address of a running server (see --serve) to get the cards from. If no "
+                                         "server with the same text chunk length is running there, the cards are "
+                                         f"generated locally. Defaults to {card_client.DEFAULT_ADDRESS}.",
+                        default=card_client.DEFAULT_ADDRESS, metavar="ADDRESS")
+    parser.add_argument("--no-server", help="Always generate the cards locally.", action="store_true")
+    parser.add_argument("--profile", help="Print the time taken by each stage of the run (loading, training, "
+                                          "walking, each determine_* step, rendering, ...), counters over the "
+                                          "generated cards and the peak memory to stderr. Implies --no-server.",
+                        action="store_true")
+    parser.add_argument("--metrics-out", help="Write the stage times, counters and peak memory of the run to this "
+                                              "file as JSON. Implies --no-server.",
+                        metavar="PATH")
+    parser.add_argument("-f", "--format", help="How to write the cards: as text (the default), as JSON Lines with "
+                                               "every field of each card, or as CSV.",
+                        choices=list(card_writers.WRITERS), default="text")
+    parser.add_argument("-o", "--output", help="File to write the cards to. Defaults to stdout.", metavar="PATH")
+
+    args = parser.parse_args()
+    if args.top is not None and (args.novel_only or args.unique or conditions(args)):
+        parser.error("--top can't be combined with --novel-only, --unique, --color, --cmc or --rarity")
+    for option, value in (("--top", args.top), ("--beam-width", args.beam_width),
+                          ("--max-line-chunks", args.max_line_chunks)):
+        if value is not None and value < 1:
+            parser.error(f"{option} must be at least 1")
+    return args
+
+
+def request_cards(args) -> Optional[List[List[Dict]]]:
+    """
+    Gets the cards of each card type from a running server, or returns None if there is none to ask. The server
+    must answer card_client.server_stats in time with the same text chunk length before it is asked for cards, so
+    that a run with no server to ask isn't held up.
+    """
+    stats = card_client.server_stats(args.server)
+    if stats is None or stats.get("text_chunk_length") != args.text_chunk_length:
+        return None
+    batches = []
+    for card_type in args.card_type:
+        cards = card_client.request_cards(args.server, card_type, args.number,
+                                          chunk_length=args.text_chunk_length)
+        if cards is None:
+            return None
+        batches.append(cards)
+    return batches
+
+
+def conditions(args) -> Dict:
+    """
+    Collects the attributes the cards are conditioned on (see generate_card.conditioned_keys).
+    """
+    values = {"colors": args.color, "cmcs": args.cmc, "rarities": args.rarity}
+    return {attribute: value for attribute, value in values.items() if value is not None}
+
 
-    return parser.parse_args()
+def report_metrics(args, recorder: metrics.Recorder):
+    """
+    Prints the metrics of the run with --profile and writes them with --metrics-out.
+    """
+    report = recorder.report()
+    if args.metrics_out:
+        with open(args.metrics_out, "w") as F:
+            json.dump(dict(report, arguments=vars(args)), F, indent=2)
+
+    if args.profile:
+        print(f"Wall time {report['wall_seconds']:.3f} s, peak memory {report['peak_memory_kib']} KiB",
+              file=sys.stderr)
+        for name, stage in report["stages"].items():
+            print(f"{name:>26} {stage['calls']:>8} calls {stage['seconds']:>10.4f} s", file=sys.stderr)
+        for name, counter in report["counters"].items():
+            print(f"{name:>26} mean {counter['mean']:>8} min {counter['min']:>6} max {counter['max']:>6}",
+                  file=sys.stderr)
 
 
 def main():
     args = parse_args()
+    mtg_card_generator.configure_logging()
+    profiling = args.profile or args.metrics_out is not None
 
-    text_chunk_dictionary, opening_text, lines_in_text = initialize.initialize_aggregated_data(args.text_chunk_length,
-                                                                                               args.reset_json)
-    for card_type in args.card_type:
-        for i in range(args.number):
-            card = generate_card.generate_card(opening_text, lines_in_text, card_type)
-            print(card['manacost'])
-            print(card["type"], "-" if card.get("subtypes") else "", card.get("subtypes", ""))
-            print(card["rendered_lines"])
-            print(card["rarity"])
-            if card["type"] == "Creature":
-                print(f"{card['power_toughness'][0]}/{card['power_toughness'][1]}")
-            elif card["type"] == "Planeswalker":
-                print(card["loyalty"])
-            print("----------------------------------------------------\n", end="")
+    output = card_writers.open_output(args.output)
+    writer = card_writers.WRITERS[args.format](output)
+    try:
+        if args.serve is None and args.number <= card_client.MAX_CARDS and \
+                not (args.reset_json or args.update_json or args.no_server or profiling or args.seed is not None or
+                     args.novel_only or args.unique or conditions(args) or args.max_line_chunks is not None or
+                     args.top is not None):
+            batches = request_cards(args)
+            if batches is not None:
+                for cards in batches:
+                    writer.write(cards)
+                return
+
+        if not profiling:
+            generate(args, writer)
+            return
+        metrics.enable()
+        try:
+            generate(args, writer)
+        finally:
+            report_metrics(args, metrics.disable())
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def generate(args, writer):
+    """
+    Loads or trains the model, then either serves cards from it or writes the cards asked for, a block at a time
+    (see generate_card.generate_blocks). With more than one job, the blocks are generated on a pool of processes.
+    Copies of real cards are rejected within each block (see generate_card.novel_walks), and repeats across the
+    whole run by novelty.unique_cards, so both give the same cards for the same seed with any number of jobs.
+    """
+    import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+    # Only the card types asked for are trained and loaded, but a server may be asked for any of them
+    card_types = None if args.serve is not None else args.card_type
+    if args.update_json and not args.reset_json:
+        get_arguments = {"set": "|".join(args.set)} if args.set else {}
+        model = initialize.update_aggregated_data(args.text_chunk_length, args.jobs, card_types, **get_arguments)
+    else:
+        model = initialize.initialize_aggregated_data(args.text_chunk_length, args.reset_json, args.jobs,
+                                                      args.train_chunk_lengths or initialize.TRAINED_CHUNK_LENGTHS,
+                                                      card_types)
+
+    if args.serve is not None:
+        import mtg_card_generator.generator.card_server as card_server
+        card_server.serve(args.serve, model)
+        return
+
+    seed = args.seed if args.seed is not None else secrets.randbits(64)
+    if args.top is not None:
+        import mtg_card_generator.generator.line_search as line_search
+        for card_type in args.card_type:
+            with metrics.stage("search"):
+                beam_width = args.beam_width if args.beam_width is not None else line_search.DEFAULT_BEAM_WIDTH
+                max_line_chunks = args.max_line_chunks if args.max_line_chunks is not None else \
+                    line_search.DEFAULT_MAX_LINE_CHUNKS
+                cards = line_search.top_cards(model, card_type, args.top, beam_width, max_line_chunks, seed)
+            with metrics.stage("write"):
+                writer.write(cards)
+        return
+
+    import mtg_card_generator.generator.generate_card as generate_card
+    card_conditions = conditions(args) or None
+    if card_conditions:
+        # Conditions that no card was seen with are reported here rather than as a traceback from a block
+        for card_type in args.card_type:
+            try:
+                generate_card.conditioned_keys(model[card_type], card_conditions)
+            except ValueError as e:
+                sys.exit(str(e))
+    if args.novel_only:
+        model.novelty = initialize.load_novelty_index(model.corpus_key)
+    if args.jobs > 1:
+        import mtg_card_generator.generator.parallel_generation as parallel_generation
+        blocks = parallel_generation.generate_parallel(
+            functools.partial(initialize.load_saved_model, args.text_chunk_length, args.novel_only is not None,
+                              model.corpus_key),
+            [(card_type, args.number) for card_type in args.card_type], seed, args.jobs, args.novel_only,
+            card_conditions, args.max_line_chunks)
+    else:
+        blocks = (cards for card_type in args.card_type
+                  for cards in generate_card.generate_blocks(model, card_type, args.number, seed, args.novel_only,
+                                                             card_conditions, args.max_line_chunks))
+
+    if args.unique:
+        import mtg_card_generator.generator.novelty as novelty
+
+        def replace(card_type, n, attempt):
+            return generate_card.generate_cards(model, card_type, n, generate_card.derive_seed(seed, "unique", attempt),
+                                                args.novel_only, card_conditions, args.max_line_chunks)
+        blocks = novelty.unique_cards(blocks, replace)
+
+    while True:
+        with metrics.stage("generate"):
+            cards = next(blocks, None)
+        if cards is None:
+            break
+        with metrics.stage("write"):
+            writer.write(cards)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+"""
+Small synthetic card caches for the tests: random lines over a few words and phrases, so that models train in
+well under a second and without the network.
+"""
+
+import random
+
+WORDS = ["creature", "target", "draw", "card", "destroy", "exile", "gain", "life", "flying", "counter", "damage",
+         "opponent", "return", "hand", "graveyard", "spell", "control", "you"]
+PHRASES = ["until end of turn", "at the beginning of your upkeep", "put a +1/+1 counter on it"]
+
+
+def make_cards(number: int, seed: int):
+    rng = random.Random(seed)
+    cards = []
+    for i in range(number):
+        lines = []
+        for j in range(rng.randint(1, 3)):
+            words = [rng.choice(WORDS) for k in range(rng.randint(1, 6))]
+            if rng.random() < 0.5:
+                words.insert(rng.randint(0, len(words)), rng.choice(PHRASES))
+            lines.append(" ".join(words).capitalize() + ".")
+        cards.append({"name": f"Card {i}", "text": "\n".join(lines), "types": [rng.choice(["Creature", "Instant"])],
+                      "cmc": float(rng.randint(0, 6)), "colors": [rng.choice(["White", "Blue", "Red"])],
+                      "manaCost": "{2}{W}", "rarity": rng.choice(["Common", "Rare"]), "multiverseid": str(i)})
+    return cards
@@ -0,0 +1,58 @@
+"""
+Tests of counting cards into models (see aggregator): in parallel, for several chunk lengths at once and
+incrementally, each of which must give exactly the counts of counting every card serially.
+"""
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def cards():
+    return make_cards(500, 4)
+
+
+def counted(type_counts):
+    return (type_counts.chunk_indices, type_counts.cards_registered, type_counts.successors,
+            type_counts.opening_text, type_counts.lines_in_text, type_counts.satellites)
+
+
+def assert_same_counts(actual, expected):
+    assert list(actual) == list(expected)
+    for card_type in expected:
+        assert counted(actual[card_type]) == counted(expected[card_type]), card_type
+
+
+def test_counting_in_parallel_matches_counting_serially(cards, monkeypatch):
+    # user-006: partitions counted by a pool of processes are merged in order, numbering the chunks the same way
+    monkeypatch.setattr(aggregator, "PARTITION_SIZE", 60)
+    assert_same_counts(aggregator.count_data(cards, 2, jobs=3), aggregator.count_data(cards, 2))
+
+
+def test_updating_a_model_with_new_cards_matches_retraining(cards):
+    # user-008: new cards are counted into the saved model rather than recounting every card
+    old = aggregator.build_model(aggregator.count_data(cards[:350], 2), 2)
+    updated = aggregator.update_model(old, aggregator.count_data(cards[350:], 2))
+    retrained = aggregator.build_model(aggregator.count_data(cards, 2), 2)
+    assert list(updated) == list(retrained)
+    for card_type in retrained:
+        assert updated[card_type].vocabulary.tokens == retrained[card_type].vocabulary.tokens
+        for name, values in retrained[card_type].arrays().items():
+            assert list(updated[card_type].arrays()[name]) == list(values), name
+        for attribute, table in retrained[card_type].satellites.items():
+            assert [updated[card_type].satellites[attribute].dictionary(i) for i in range(len(retrained[card_type]))] \
+                == [table.dictionary(i) for i in range(len(retrained[card_type]))], attribute
+    # The old model is left as it was
+    before = aggregator.build_model(aggregator.count_data(cards[:350], 2), 2)
+    assert list(old["Creature"].cards_registered) == list(before["Creature"].cards_registered)
+
+
+def test_counting_several_chunk_lengths_at_once_matches_counting_each(cards):
+    # user-012: the cards are read, cleaned up and tokenized once for every chunk length
+    all_counts = aggregator.count_orders(cards, [2, 3, 5], card_types=["Instant", "Creature"])
+    assert list(all_counts) == [2, 3, 5]
+    for chunk_length, counts in all_counts.items():
+        assert_same_counts(counts, aggregator.count_data(cards, chunk_length, card_types=["Instant", "Creature"]))
@@ -0,0 +1,57 @@
+"""
+Tests api_fetch.download_cards against the local stand-in for the cards endpoint from benchmarks/download_check.py.
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("requests")
+
+import mtg_card_generator.data_processing.card_data_aggregator.api_fetch as api_fetch  # noqa: E402
+from mtg_card_generator.benchmarks.download_check import StubCardsAPI, serving  # noqa: E402
+
+NUM_CARDS = 250
+WORKERS = 4
+
+
+def card_names(cards):
+    return [card["name"] for card in cards]
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return os.path.join(str(tmp_path), "pages")
+
+
+def test_flaky_download_yields_every_card_in_order(checkpoint_path):
+    server = serving(StubCardsAPI(NUM_CARDS, fail_first=True, delay=0))
+    try:
+        cards = api_fetch.download_cards(checkpoint_path, server.url, WORKERS, retries=2, backoff=0.01)
+    finally:
+        server.shutdown()
+    assert card_names(cards) == [f"Card {i}" for i in range(NUM_CARDS)]
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_interrupted_download_resumes_from_checkpoint(checkpoint_path):
+    num_pages = NUM_CARDS // api_fetch.PAGE_SIZE + 1
+    broken_page = num_pages // 2
+
+    server = serving(StubCardsAPI(NUM_CARDS, broken_pages=[broken_page], delay=0))
+    try:
+        with pytest.raises(api_fetch.requests.RequestException):
+            api_fetch.download_cards(checkpoint_path, server.url, WORKERS, retries=1, backoff=0.01)
+    finally:
+        server.shutdown()
+    assert len(os.listdir(checkpoint_path)) >= broken_page
+
+    server = serving(StubCardsAPI(NUM_CARDS, delay=0))
+    try:
+        cards = api_fetch.download_cards(checkpoint_path, server.url, WORKERS, retries=1, backoff=0.01)
+    finally:
+        server.shutdown()
+    assert card_names(cards) == [f"Card {i}" for i in range(NUM_CARDS)]
+    # Only the pages missing from the checkpoint are asked for again
+    assert broken_page in server.requests
+    assert len(server.requests) < num_pages
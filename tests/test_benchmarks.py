@@ -0,0 +1,33 @@
+"""
+Tests of the benchmark suite (see benchmarks/benchmark_suite.py) and the synthetic card corpora it runs on.
+"""
+
+import pytest
+
+import mtg_card_generator.benchmarks.benchmark_suite as benchmark_suite
+import mtg_card_generator.benchmarks.synthetic_corpus as synthetic_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+
+
+def test_synthetic_corpus_is_deterministic():
+    # user-014: the benchmarks run offline on the same cards for the same number of cards and seed
+    cards = list(synthetic_corpus.synthetic_cards(500, 3))
+    assert cards == list(synthetic_corpus.synthetic_cards(500, 3))
+    assert cards != list(synthetic_corpus.synthetic_cards(500, 4))
+    assert list(synthetic_corpus.synthetic_cards(100, 3)) == cards[:100]
+    assert {card["types"][0] for card in cards} == set(synthetic_corpus.CARD_TYPES)
+    assert all(card_corpus.compact(card) == card for card in cards)
+
+
+def test_run_scale_times_every_stage():
+    results = benchmark_suite.run_scale(200, 3, 30, 1, 0)
+    assert [r["stage"] for r in results] == list(benchmark_suite.STAGES)
+    assert all(r["scale"] == 200 and r["operations"] > 0 and r["per_second"] > 0 for r in results)
+
+
+@pytest.mark.parametrize("per_second, passed", [(95.0, True), (150.0, True), (85.0, False)])
+def test_compare_flags_stages_slower_than_the_tolerance(per_second, passed):
+    baseline = {"commit": "abc1234", "results": [{"scale": 1000, "stage": "walking", "per_second": 100.0}]}
+    results = [{"scale": 1000, "stage": "walking", "per_second": per_second},
+               {"scale": 10000, "stage": "walking", "per_second": 1.0}]
+    assert benchmark_suite.compare(results, baseline, 0.1) is passed
@@ -0,0 +1,60 @@
+"""
+Tests of the card cache as a corpus of JSON lines (see card_corpus), and of converting the pickled cache of earlier
+versions into one.
+"""
+
+import pickle
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture
+def cards():
+    # Cards from the API carry many fields that aren't trained on
+    return [dict(card, imageUrl=f"https://example.com/{i}.png", foreignNames=[{"name": "Karte", "language": "German"}])
+            for i, card in enumerate(make_cards(50, 5))]
+
+
+def test_corpus_round_trips_the_trained_fields(tmp_path, cards):
+    # user-010: cards are streamed to and from a JSON lines file rather than pickled as one list
+    path = str(tmp_path / "cards.jsonl")
+    assert card_corpus.write_corpus(path, iter(cards)) == len(cards)
+    read = card_corpus.read_corpus(path)
+    assert next(read) == card_corpus.compact(cards[0])
+    assert list(read) == [card_corpus.compact(card) for card in cards[1:]]
+    assert "imageUrl" not in card_corpus.compact(cards[0]) and "text" in card_corpus.compact(cards[0])
+
+    assert card_corpus.append_to_corpus(path, cards[:2]) == len(cards) + 2
+    assert list(card_corpus.read_corpus(path))[-2:] == [card_corpus.compact(card) for card in cards[:2]]
+
+
+def test_interrupted_write_keeps_the_previous_corpus(tmp_path, cards):
+    path = str(tmp_path / "cards.jsonl")
+    card_corpus.write_corpus(path, cards[:10])
+
+    def interrupted():
+        yield from cards
+        raise ConnectionError("Download interrupted")
+    with pytest.raises(ConnectionError):
+        card_corpus.write_corpus(path, interrupted())
+    assert list(card_corpus.read_corpus(path)) == [card_corpus.compact(card) for card in cards[:10]]
+
+
+def test_legacy_cache_is_converted_and_kept(tmp_path, monkeypatch, cards):
+    paths = {name: str(tmp_path / file_name) for name, file_name in
+             [("CARDS_CACHE_PATH", "cards.jsonl"), ("LEGACY_CARDS_CACHE_PATH", "cards_json.dat"),
+              ("LEGACY_CARDS_BACKUP_PATH", "cards_json.dat.bak")]}
+    for name, path in paths.items():
+        monkeypatch.setattr(initialize, name, path)
+    with open(paths["LEGACY_CARDS_CACHE_PATH"], "wb") as F:
+        pickle.dump(cards, F)
+
+    initialize.convert_legacy_cache()
+    assert list(card_corpus.read_corpus(paths["CARDS_CACHE_PATH"])) == [card_corpus.compact(card) for card in cards]
+    with open(paths["LEGACY_CARDS_BACKUP_PATH"], "rb") as F:
+        assert pickle.load(F) == cards
@@ -0,0 +1,54 @@
+"""
+Tests of serving cards from a loaded model (see card_server) and asking a server for them (see card_client).
+"""
+
+import itertools
+import json
+import threading
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.card_client as card_client
+import mtg_card_generator.generator.card_server as card_server
+import mtg_card_generator.generator.generate_card as generate_card
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def model():
+    return aggregator.gather_data(make_cards(200, 11), chunk_length=2)
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def address(request, model, tmp_path):
+    server = card_server.make_server("127.0.0.1:0" if request.param == "tcp" else str(tmp_path / "cards.sock"), model)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        if request.param == "tcp":
+            yield f"127.0.0.1:{server.server_address[1]}"
+        else:
+            yield server.server_address
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_served_cards_are_the_cards_generated_locally(model, address):
+    # user-011: a running server answers with the cards make_mtg_card would generate itself for the same seed
+    cards = card_client.request_cards(address, "Instant", 30, seed=5, chunk_length=2)
+    local = itertools.chain.from_iterable(generate_card.generate_blocks(model, "Instant", 30, 5))
+    assert cards == json.loads(json.dumps(list(local)))
+    stats = card_client.server_stats(address)
+    assert stats["text_chunk_length"] == 2 and stats["requests"] == 1 and "p50_ms" in stats
+
+
+def test_unusable_answers_are_treated_as_no_server(address, tmp_path):
+    # make_mtg_card then generates the cards itself
+    assert card_client.request_cards(address, "Instant", 5, seed=5, chunk_length=3) is None
+    assert card_client.request_cards(address, "Sandwich", 5) is None
+    assert card_client.request_cards(address, "Instant", card_client.MAX_CARDS + 1) is None
+    assert card_client.request_cards(str(tmp_path / "nothing.sock"), "Instant", 5) is None
+    assert card_client.server_stats(str(tmp_path / "nothing.sock")) is None
@@ -0,0 +1,78 @@
+"""
+Tests that the writers of card_writers write back exactly the generated cards, one write per batch.
+"""
+
+import csv
+import io
+import json
+
+import pytest
+
+import mtg_card_generator.benchmarks.synthetic_corpus as synthetic_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.card_writers as card_writers
+import mtg_card_generator.generator.generate_card as generate_card
+
+
+@pytest.fixture(scope="module")
+def batches():
+    model = aggregator.gather_data(synthetic_corpus.synthetic_cards(500, 6), chunk_length=2,
+                                   card_types=["Creature", "Instant", "Planeswalker"])
+    return [generate_card.generate_cards(model, card_type, 20, seed)
+            for seed, card_type in enumerate(["Creature", "Instant", "Planeswalker"])]
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def write_batches(tmp_path, output_format, batches):
+    # user-016: every batch is formatted into one string and written at once, through a buffered file
+    path = str(tmp_path / f"cards.{output_format}")
+    with card_writers.open_output(path) as F:
+        writer = card_writers.WRITERS[output_format](F)
+        for batch in batches:
+            writer.write(batch)
+    with open(path, encoding="utf-8", newline="") as F:
+        return F.read()
+
+
+def test_jsonl_output_round_trips(tmp_path, batches):
+    written = write_batches(tmp_path, "jsonl", batches)
+    assert [json.loads(line) for line in written.splitlines()] == \
+        [json.loads(json.dumps(card)) for batch in batches for card in batch]
+
+
+def test_csv_output_has_a_row_per_card(tmp_path, batches):
+    rows = list(csv.reader(io.StringIO(write_batches(tmp_path, "csv", batches))))
+    cards = [card for batch in batches for card in batch]
+    assert rows[0] == list(card_writers.CSV_FIELDS)
+    expected = io.StringIO()
+    csv.writer(expected).writerows(card_writers.csv_row(card) for card in cards)
+    assert rows[1:] == list(csv.reader(io.StringIO(expected.getvalue())))
+    creature = dict(zip(rows[0], rows[1]))
+    assert creature["type"] == "Creature" and (creature["power"], creature["toughness"]) == \
+        tuple(str(value) for value in cards[0]["power_toughness"])
+    assert creature["subtypes"] == cards[0]["subtypes"] and creature["colors"] == " ".join(cards[0]["colors"])
+    assert creature["rendered_lines"] == cards[0]["rendered_lines"]
+
+
+def test_text_output_matches_format_text(tmp_path, batches):
+    assert write_batches(tmp_path, "text", batches) == \
+        "".join(card_writers.format_text(card) for batch in batches for card in batch)
+
+
+@pytest.mark.parametrize("output_format", sorted(card_writers.WRITERS))
+def test_each_batch_is_written_at_once(output_format, batches):
+    stream = CountingStream()
+    writer = card_writers.WRITERS[output_format](stream)
+    header_writes = stream.writes
+    for batch in batches:
+        writer.write(batch)
+    assert stream.writes - header_writes == len(batches)
@@ -0,0 +1,51 @@
+"""
+Tests of the analysis of how walks end (see chain_analysis) and of steering long lines to a full stop with
+max_line_chunks (see sampling.ChainSampler.walk_line).
+"""
+
+import random
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.chain_analysis as chain_analysis
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def model():
+    return aggregator.gather_data(make_cards(400, 2), chunk_length=2)
+
+
+def test_steps_to_full_stop():
+    # 0 -> 1 -> 2 (full stop), 3 -> {0, 2}, 4 -> 5 -> 4 (a loop that never ends)
+    full_stop = [0, 0, 1, 0, 0, 0]
+    successors = [[1], [2], [], [0, 2], [5], [4]]
+    offsets, targets = [0], []
+    for chunk_successors in successors:
+        targets.extend(chunk_successors)
+        offsets.append(len(targets))
+    assert list(chain_analysis.steps_to_full_stop(full_stop, offsets, targets)) == [2, 1, 0, 1, -1, -1]
+
+
+@pytest.mark.parametrize("card_type", ["Creature", "Instant"])
+def test_every_trained_chunk_reaches_a_full_stop(model, card_type):
+    # user-022: every chunk was seen on a line ending in a full stop, so no chunk ever needs pruning
+    analysis = model[card_type].analysis_arrays()
+    assert min(analysis["steps_to_full_stop"]) >= 0
+    assert all(expected >= steps for steps, expected in zip(analysis["steps_to_full_stop"],
+                                                            analysis["expected_steps"]))
+
+
+@pytest.mark.parametrize("max_line_chunks", [1, 3])
+def test_capped_lines_end_within_the_steps_to_a_full_stop(model, max_line_chunks):
+    # user-022: once a line reaches the cap, every step brings it closer to a full stop
+    type_model = model["Creature"]
+    steps = type_model.analysis_arrays()["steps_to_full_stop"]
+    longest = max_line_chunks + max(steps)
+    rng = random.Random(4)
+    for i in range(300):
+        for line in type_model.sampler.walk(rng, max_line_chunks):
+            assert type_model.full_stop[line[-1]]
+            assert len(line) <= longest
@@ -0,0 +1,82 @@
+"""
+Tests that compacting the chunk graph (see sampling.ChainSampler.compact) walks exactly the lines a sampler
+drawing one chunk at a time walks, and that inference adds up the same weights over the runs. benchmarks/
+compaction_check.py checks the walks on the card cache and reports the steps and time saved.
+"""
+
+import random
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.chain_analysis as chain_analysis
+import mtg_card_generator.generator.inference as inference
+import mtg_card_generator.generator.sampling as sampling
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def model():
+    return aggregator.gather_data(make_cards(400, 0), chunk_length=2)
+
+
+def walk_cards(sampler, batch, max_line_chunks, number=500, seed=7):
+    rng = random.Random(seed)
+    if batch:
+        return sampler.walk_batch(number, rng, max_line_chunks)
+    return [sampler.walk(rng, max_line_chunks) for i in range(number)]
+
+
+@pytest.mark.parametrize("card_type", ["Creature", "Instant"])
+@pytest.mark.parametrize("batch", [False, True])
+@pytest.mark.parametrize("max_line_chunks", [None, 3])
+def test_compacted_walks_match_stepwise_walks(model, card_type, batch, max_line_chunks):
+    type_model = model[card_type]
+    stepwise = sampling.ChainSampler(type_model)
+    compacted = sampling.ChainSampler(type_model).compact()
+    assert any(end >= 0 for end in compacted.run_ends)
+    assert walk_cards(compacted, batch, max_line_chunks) == walk_cards(stepwise, batch, max_line_chunks)
+
+
+@pytest.mark.parametrize("var_names", [["cmcs"], ["colors"], ["pip_intensity", 3.0]])
+def test_inference_over_runs_matches_chunk_by_chunk(model, var_names):
+    type_model = model["Creature"]
+    type_model.format_probabilities(compact=True)
+    cards = [[[type_model.chunk(i) for i in line] for line in lines]
+             for lines in type_model.sampler.walk_batch(200, random.Random(3))]
+    try:
+        compacted = [inference.log_posterior(lines, var_names) for lines in cards]
+        type_model.format_probabilities(compact=False)
+        stepwise = [inference.log_posterior(lines, var_names) for lines in cards]
+    finally:
+        type_model.format_probabilities(compact=True)
+    for expected, actual in zip(stepwise, compacted):
+        assert list(actual) == list(expected)
+        assert all(actual[key] == pytest.approx(expected[key]) for key in expected)
+
+
+def graph(successors):
+    offsets, targets = [0], []
+    for chunk_successors in successors:
+        targets.extend(chunk_successors)
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def test_single_successor_run_ends():
+    # 0 -> 1 -> 2 -> 3 (full stop), 4 -> 2, 5 -> {1, 6}, 6 -> 7 -> 6 (a loop that never ends)
+    full_stop = [0, 0, 0, 1, 0, 0, 0, 0]
+    offsets, targets = graph([[1], [2], [3], [], [2], [1, 6], [7], [6]])
+    assert list(chain_analysis.single_successor_run_ends(full_stop, offsets, targets)) == [3, 3, 3, -1, 3, -1, -1, -1]
+
+
+def test_single_successor_runs_share_their_tuples():
+    # The same graph: 4 joins the run of 0 at 2
+    full_stop = [0, 0, 0, 1, 0, 0, 0, 0]
+    offsets, targets = graph([[1], [2], [3], [], [2], [1, 6], [7], [6]])
+    ends = chain_analysis.single_successor_run_ends(full_stop, offsets, targets)
+    runs, starts = chain_analysis.single_successor_runs(offsets, targets, ends)
+    assert [run[start:] if run is not None else None for run, start in zip(runs, starts)] == \
+        [(1, 2, 3), (2, 3), (3,), None, (2, 3), None, None, None]
+    assert runs[0] is runs[1] is runs[2]
@@ -0,0 +1,73 @@
+"""
+Tests of the attributes generate_card determines for generated cards, on a model of the synthetic card cache of
+the benchmarks (see benchmarks/synthetic_corpus.py), whose mana costs have a pip of each color of the card.
+"""
+
+import random
+
+import pytest
+
+import mtg_card_generator.benchmarks.synthetic_corpus as synthetic_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.generate_card as generate_card
+
+
+@pytest.fixture(scope="module")
+def model():
+    return aggregator.gather_data(synthetic_corpus.synthetic_cards(2000, 0), chunk_length=2,
+                                  card_types=["Creature", "Instant"])
+
+
+def pips(card):
+    return {symbol for symbol in card["manacost"] if symbol in "WUBRGC"}
+
+
+def assert_mana_cost_matches_colors(card):
+    colors = set(card["colors"])
+    if colors == {"C"}:
+        assert pips(card) <= {"C"}, card
+    else:
+        assert pips(card) == colors, card
+    generic = "".join(symbol for symbol in card["manacost"] if symbol.isdigit())
+    assert int(generic or 0) + len([s for s in card["manacost"] if s in "WUBRGC"]) == card["cmc"], card
+
+
+@pytest.mark.parametrize("conditions", [{"colors": ["Blue"], "cmcs": 2}, {"colors": ["Blue", "Red"]},
+                                        {"cmcs": 1}, {"colors": ["Colorless"]}, {"colors": ["White"], "cmcs": 1}])
+@pytest.mark.parametrize("card_type", ["Creature", "Instant"])
+def test_conditioned_mana_cost_matches_colors(model, card_type, conditions):
+    # user-021: e.g. --color Blue --cmc 2 gave the mana cost "2", with no blue pip
+    cards = generate_card.generate_cards(model, card_type, 300, 5, conditions=conditions)
+    for card in cards:
+        if "colors" in conditions:
+            assert card["colors"] == [generate_card.COLORS_TO_PIP[c] for c in conditions["colors"]]
+        if "cmcs" in conditions:
+            assert card["cmc"] == conditions["cmcs"]
+        assert_mana_cost_matches_colors(card)
+
+
+def test_unconditioned_mana_cost_matches_colors(model):
+    for card in generate_card.generate_cards(model, "Creature", 500, 6):
+        assert_mana_cost_matches_colors(card)
+
+
+def test_cmc_too_low_for_the_colors_is_refused(model):
+    with pytest.raises(ValueError):
+        generate_card.conditioned_keys(model["Creature"], {"colors": ["Blue", "Red"], "cmcs": 1})
+
+
+@pytest.mark.parametrize("card_type", ["Creature", "Instant"])
+def test_generate_cards_is_the_batch_walk_with_each_card_inferred_in_turn(model, card_type):
+    # user-005: the batch API walks every card in lockstep and shares the posteriors between cards of the batch
+    cards = generate_card.generate_cards(model, card_type, 200, 9)
+    assert len(cards) == 200 and all(card["type"] == card_type for card in cards)
+    assert generate_card.generate_cards(model, card_type, 200, 9) == cards
+    assert generate_card.generate_cards(model, card_type, 200, 10) != cards
+
+    rng = random.Random(9)
+    type_model = model[card_type]
+    walks = type_model.sampler.walk_batch(200, rng)
+    assert all(type_model.full_stop[line[-1]] for lines in walks for line in lines)
+    assert [generate_card.generate_card_parameters([[type_model.chunk(i) for i in line] for line in lines],
+                                                   card_type, rng)
+            for lines in walks] == cards
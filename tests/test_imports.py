@@ -0,0 +1,59 @@
+"""
+Tests that make_mtg_card only imports what each run needs, by listing sys.modules in a fresh interpreter.
+benchmarks/import_check.py reports the import times of whole runs.
+"""
+
+import os
+import subprocess
+import sys
+
+from typing import List
+
+import pytest
+
+from mtg_card_generator.benchmarks.import_check import GENERATION_FORBIDDEN, HELP_FORBIDDEN, SCRIPT
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Every module generating cards from a saved model imports
+GENERATION_MODULES = ("mtg_card_generator.scripts.make_mtg_card",
+                      "mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data",
+                      "mtg_card_generator.generator.generate_card",
+                      "mtg_card_generator.generator.line_search",
+                      "mtg_card_generator.generator.card_client")
+
+
+def imported_modules(code: str) -> List[str]:
+    """
+    Runs code in a fresh interpreter and returns the names of the modules it left in sys.modules.
+    """
+    code += "\nsys.stdout = sys.__stdout__\nprint('\\n'.join(sys.modules))"
+    process = subprocess.run([sys.executable, "-c", "import sys\n" + code], cwd=REPOSITORY, capture_output=True,
+                             text=True, check=True)
+    return process.stdout.splitlines()
+
+
+def forbidden_imports(modules: List[str], forbidden) -> List[str]:
+    return [name for name in modules if any(name == f or name.startswith(f + ".") for f in forbidden)]
+
+
+def test_help_imports_no_model_code():
+    modules = imported_modules(f"""
+import io, runpy
+sys.argv = ["make_mtg_card", "--help"]
+sys.stdout = io.StringIO()
+try:
+    runpy.run_module({SCRIPT!r}, run_name="__main__")
+except SystemExit:
+    pass
+""")
+    # Run as __main__, the script itself isn't in sys.modules but its package is
+    assert SCRIPT.rpartition(".")[0] in modules
+    assert forbidden_imports(modules, HELP_FORBIDDEN) == []
+
+
+@pytest.mark.parametrize("module", GENERATION_MODULES)
+def test_generation_imports_no_training_code(module):
+    modules = imported_modules(f"import {module}")
+    assert module in modules
+    assert forbidden_imports(modules, GENERATION_FORBIDDEN) == []
@@ -0,0 +1,69 @@
+"""
+Tests that inferring the attributes of a card in log space (see inference) gives the posterior that multiplying the
+smoothed probabilities of its text chunks as Fractions does, up to floating point error.
+"""
+
+import math
+import random
+
+from fractions import Fraction
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.inference as inference
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def model():
+    return aggregator.gather_data(make_cards(400, 2), chunk_length=2)
+
+
+@pytest.fixture(scope="module")
+def cards(model):
+    type_model = model["Creature"]
+    return [[[type_model.chunk(i) for i in line] for line in lines]
+            for lines in type_model.sampler.walk_batch(100, random.Random(4))]
+
+
+def exact_posterior(lines, var_names):
+    """
+    Multiplies the smoothed probability of each value over every chunk on the card as Fractions and normalizes the
+    product over the values seen on any of them.
+    """
+    counts = []
+    for line in lines:
+        for text_chunk in line:
+            dictionary = text_chunk.model.satellites[var_names[0]].dictionary(text_chunk.index)
+            counts.append(dictionary.get(var_names[1], {}) if len(var_names) > 1 else dictionary)
+    keys = {key for dictionary in counts for key in dictionary}
+    # With a pseudo-count of 1, the smoothed probability of a value is proportional to its count plus 1 on a chunk
+    products = {key: Fraction(math.prod(dictionary.get(key, 0) + 1 for dictionary in counts)) for key in keys}
+    total = sum(products.values())
+    return {key: product / total for key, product in products.items()}
+
+
+def normalize(scores):
+    largest = max(scores.values())
+    weights = {key: math.exp(score - largest) for key, score in scores.items()}
+    total = sum(weights.values())
+    return {key: weight / total for key, weight in weights.items()}
+
+
+@pytest.mark.parametrize("var_names", [["cmcs"], ["colors"], ["rarities"], ["pip_intensity", 3.0]])
+def test_log_posterior_matches_the_product_of_fractions(cards, var_names):
+    # user-003: the Fractions grew with every chunk on the card; the log weights sum to the same posterior
+    for lines in cards:
+        expected = exact_posterior(lines, var_names)
+        actual = normalize(inference.log_posterior(lines, var_names)) if expected else {}
+        assert set(actual) == set(expected)
+        assert all(actual[key] == pytest.approx(float(expected[key]), abs=1e-12) for key in expected)
+
+
+def test_batch_posterior_matches_log_posterior(model, cards):
+    batch = inference.BatchPosterior()
+    for lines in cards + cards:
+        indices = tuple(tuple(text_chunk.index for text_chunk in line) for line in lines)
+        assert batch.log_posterior(indices, lines, ["cmcs"]) == pytest.approx(inference.log_posterior(lines, ["cmcs"]))
@@ -0,0 +1,71 @@
+"""
+Tests the beam search for the most probable lines and texts of a card type (see line_search) against scoring every
+line of a small model.
+"""
+
+import itertools
+import math
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.line_search as line_search
+
+from tests.synthetic_cards import make_cards
+
+MAX_LINE_CHUNKS = 5
+
+
+@pytest.fixture(scope="module")
+def type_model():
+    return aggregator.gather_data(make_cards(150, 10), chunk_length=3, card_types=["Instant"])["Instant"]
+
+
+def every_line(type_model, max_line_chunks):
+    """
+    Scores every line of at most max_line_chunks chunks, as ChainSampler would draw it.
+    """
+    openings = dict(zip(type_model.opening_chunks, type_model.opening_counts))
+    stack = [(math.log(count / sum(openings.values())), [chunk]) for chunk, count in openings.items()]
+    lines = []
+    while stack:
+        log_probability, line = stack.pop()
+        if type_model.full_stop[line[-1]]:
+            lines.append((log_probability, line))
+        elif len(line) < max_line_chunks:
+            successors = dict(type_model.successor_items(line[-1]))
+            total = sum(successors.values())
+            stack.extend((log_probability + math.log(count / total), line + [target])
+                         for target, count in successors.items())
+    return sorted(lines, reverse=True)
+
+
+@pytest.mark.parametrize("k", [1, 10, 40])
+def test_wide_beam_finds_the_most_probable_lines(type_model, k):
+    # user-025: with a beam holding every partial line the search is exact
+    expected = every_line(type_model, MAX_LINE_CHUNKS)[:k]
+    found = line_search.top_lines(type_model, k, beam_width=10 ** 6, max_line_chunks=MAX_LINE_CHUNKS)
+    assert [score for score, line in found] == pytest.approx([score for score, line in expected])
+    scores = dict((tuple(line), score) for score, line in every_line(type_model, MAX_LINE_CHUNKS))
+    assert all(scores[tuple(line)] == pytest.approx(score) for score, line in found)
+
+
+def test_narrow_beam_finds_real_lines_no_better_than_the_best(type_model):
+    best = every_line(type_model, MAX_LINE_CHUNKS)[:10]
+    scores = dict((tuple(line), score) for score, line in every_line(type_model, MAX_LINE_CHUNKS))
+    found = line_search.top_lines(type_model, 10, beam_width=3, max_line_chunks=MAX_LINE_CHUNKS)
+    assert found == sorted(found, reverse=True)
+    for (score, line), (best_score, best_line) in zip(found, best):
+        assert scores[tuple(line)] == pytest.approx(score)
+        assert score <= best_score + 1e-9
+
+
+def test_top_texts_are_the_most_probable_texts_of_the_lines(type_model):
+    lines = line_search.top_lines(type_model, 6, beam_width=10 ** 6, max_line_chunks=MAX_LINE_CHUNKS)
+    total = sum(type_model.line_counts)
+    expected = sorted((math.log(count / total) + sum(lines[i][0] for i in indices), indices)
+                      for number, count in zip(type_model.line_numbers, type_model.line_counts)
+                      for indices in itertools.product(range(len(lines)), repeat=number))[::-1][:15]
+    texts = line_search.top_texts(type_model, lines, 15)
+    assert [score for score, text in texts] == pytest.approx([score for score, indices in expected])
+    assert len({tuple(map(tuple, text)) for score, text in texts}) == len(texts)
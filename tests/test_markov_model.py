@@ -0,0 +1,62 @@
+"""
+Tests that the array-backed model (see markov_model) holds the same chunk graph and counts as counting the
+chunked lines of the cards into dictionaries keyed by the chunks' tokens.
+"""
+
+from collections import Counter
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.template_classes.markov_model as markov_model
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+
+from tests.synthetic_cards import make_cards
+
+CHUNK_LENGTH = 3
+
+
+@pytest.fixture(scope="module")
+def cards():
+    return make_cards(300, 3)
+
+
+def count_by_tokens(cards, card_type):
+    """
+    Counts the chunks, successor pairs, opening chunks and rarities of the card type, keyed by chunk tokens and
+    whether the chunk ends a line.
+    """
+    registered, successors, openings, rarities = Counter(), Counter(), Counter(), Counter()
+    for c_type, card, lines in aggregator.preprocess(cards):
+        if c_type != card_type:
+            continue
+        for tokens in tokenizer.read_tokens(lines):
+            chunks = [(tuple(chunk), False) for chunk in tokenizer.chunkify(tokens, CHUNK_LENGTH)]
+            chunks[-1] = chunks[-1][0], True
+            openings[chunks[0]] += 1
+            registered.update(chunks)
+            successors.update(zip(chunks, chunks[1:]))
+            rarities.update((chunk, card["rarity"]) for chunk in chunks)
+    return registered, successors, openings, rarities
+
+
+@pytest.mark.parametrize("card_type", ["Creature", "Instant"])
+def test_arrays_hold_the_counts_of_the_chunked_lines(cards, card_type):
+    # user-004: one row of token ids per chunk and CSR successor edges instead of a TextChunk object per chunk
+    type_model = aggregator.build_model(aggregator.count_data(cards, CHUNK_LENGTH), CHUNK_LENGTH)[card_type]
+    key = [(tuple(type_model.tokens(i)), bool(type_model.full_stop[i])) for i in range(len(type_model))]
+    assert len(set(key)) == len(key)
+
+    registered, successors, openings, rarities = count_by_tokens(cards, card_type)
+    assert dict(zip(key, type_model.cards_registered)) == registered
+    assert {(key[i], key[target]): count for i in range(len(type_model))
+            for target, count in type_model.successor_items(i)} == successors
+    assert dict(zip((key[i] for i in type_model.opening_chunks), type_model.opening_counts)) == openings
+    table = type_model.satellites["rarities"]
+    assert {(key[i], rarity): count for i in range(len(type_model)) for rarity, count in table.items(i)} == rarities
+
+
+def test_vocabulary_interns_each_token_once():
+    vocabulary = markov_model.Vocabulary(["draw"])
+    assert [vocabulary.intern(token) for token in ["a", "draw", "a", "card"]] == [1, 0, 1, 2]
+    assert vocabulary.tokens == ["draw", "a", "card"] and len(vocabulary) == 3
@@ -0,0 +1,60 @@
+"""
+Tests of the run metrics (see metrics.py), including those recorded by the worker processes of a parallel run.
+"""
+
+import functools
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.parallel_generation as parallel_generation
+import mtg_card_generator.metrics as metrics
+
+from tests.synthetic_cards import make_cards
+
+
+@functools.lru_cache(maxsize=None)
+def load_model():
+    return aggregator.gather_data(make_cards(300, 0), chunk_length=2)
+
+
+@pytest.fixture
+def recording():
+    recorder = metrics.enable()
+    try:
+        yield recorder
+    finally:
+        metrics.disable()
+
+
+def test_merge_adds_stages_and_counters():
+    first, second = metrics.Recorder(), metrics.Recorder()
+    first.add_time("walk", 1.0)
+    first.count("lines_per_card", 2)
+    second.add_time("walk", 0.5)
+    second.add_time("render", 0.25)
+    second.count("lines_per_card", 5)
+    second.count("lines_per_card", 1)
+    first.merge(second)
+    assert first.stages == {"walk": [2, 1.5], "render": [1, 0.25]}
+    assert first.counters == {"lines_per_card": [3, 8, 1, 5]}
+
+
+def test_collect_starts_a_new_recorder(recording):
+    metrics.RECORDER.add_time("walk", 1.0)
+    collected = metrics.collect()
+    assert collected is recording and collected.stages == {"walk": [1, 1.0]}
+    assert metrics.RECORDER is not recording and not metrics.RECORDER.stages
+
+
+def test_parallel_run_records_the_workers_stages(recording):
+    # user-015: with -j N the per-card stages run in the workers and must still be reported
+    n = generate_card.BLOCK_SIZE + 200
+    blocks = list(parallel_generation.generate_parallel(load_model, [("Instant", n)], seed=3, jobs=2))
+    report = metrics.disable().report()
+    assert sum(len(cards) for cards in blocks) == n
+    assert report["stages"]["render"]["calls"] == n
+    assert report["stages"]["determine_cmc"]["calls"] == n
+    assert report["counters"]["lines_per_card"]["count"] == n
+    assert report["counters"]["worker_peak_memory_kib"]["count"] == 2
@@ -0,0 +1,133 @@
+"""
+Tests of saving and loading the model (see model_store and initialize_aggregated_data.load_saved_model).
+"""
+
+import os
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.card_data_aggregator.card_corpus as card_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.initialize_aggregated_data as initialize
+import mtg_card_generator.data_processing.card_data_aggregator.model_store as model_store
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.probability_calculation as probability_calculation
+import mtg_card_generator.generator.sampling as sampling
+
+from tests.synthetic_cards import make_cards
+
+CHUNK_LENGTH = 2
+
+
+@pytest.fixture
+def card_cache(tmp_path, monkeypatch):
+    """
+    A card cache under tmp_path, with no models saved for it yet.
+
+    Returns:
+        str: The path of the card cache
+    """
+    cache_path = str(tmp_path / "cards.jsonl")
+    cards = make_cards(200, 1)
+    card_corpus.write_corpus(cache_path, (card_corpus.compact(card) for card in cards))
+    monkeypatch.setattr(initialize, "CARDS_CACHE_PATH", cache_path)
+    monkeypatch.setattr(model_store, "MODELS_PATH", str(tmp_path / "models"))
+    return cache_path
+
+
+@pytest.fixture
+def saved_cache(card_cache):
+    """
+    A card cache and the model trained on it, saved under tmp_path.
+
+    Returns:
+        str: The hash of the card cache
+    """
+    cache_path = card_cache
+    corpus_key = model_store.corpus_hash(cache_path)
+    model = aggregator.build_model(aggregator.count_data(card_corpus.read_corpus(cache_path), CHUNK_LENGTH),
+                                   CHUNK_LENGTH)
+    model_store.save_model(model_store.model_path(corpus_key, CHUNK_LENGTH), model, corpus_key)
+    return corpus_key
+
+
+def test_loaded_model_knows_its_corpus_key(saved_cache):
+    model = initialize.load_saved_model(CHUNK_LENGTH)
+    assert model is not None and model.corpus_key == saved_cache
+
+
+def test_load_saved_model_with_a_known_key_does_not_hash_the_cache(saved_cache, monkeypatch):
+    # user-017: the workers of a parallel run are given the key rather than each reading the whole cache
+    def corpus_hash(path):
+        raise AssertionError("The card cache was hashed again")
+    monkeypatch.setattr(model_store, "corpus_hash", corpus_hash)
+    model = initialize.load_saved_model(CHUNK_LENGTH, corpus_key=saved_cache)
+    assert model is not None and model.corpus_key == saved_cache
+    # Card types are loaded lazily, from the files of the same key
+    assert model["Instant"].card_type == "Instant"
+
+
+def test_remove_stale_models_keeps_only_the_current_corpus(saved_cache, tmp_path):
+    # user-024: models of older card data and older formats don't pile up in the models directory
+    models_path = tmp_path / "models"
+    current = os.path.basename(model_store.model_path(saved_cache, CHUNK_LENGTH))
+    stale = ["model_0123456789abcdef_tcl2_v3", f"model_{saved_cache[:16]}_tcl2_v2.bin",
+             f"novelty_{saved_cache[:16]}_v1.bin", "novelty_0123456789abcdef_v2.bin"]
+    (models_path / stale[0]).mkdir()
+    for name in stale[1:]:
+        (models_path / name).write_bytes(b"")
+    model_store.save_novelty_index(model_store.novelty_path(saved_cache),
+                                   aggregator.build_novelty_index(card_corpus.read_corpus(initialize.CARDS_CACHE_PATH)),
+                                   saved_cache)
+    (models_path / "notes.txt").write_text("not a model")
+
+    removed = model_store.remove_stale_models(saved_cache)
+
+    assert sorted(os.path.basename(path) for path in removed) == sorted(stale)
+    assert sorted(os.listdir(models_path)) == sorted(
+        [current, os.path.basename(model_store.novelty_path(saved_cache)), "notes.txt"])
+    assert initialize.load_saved_model(CHUNK_LENGTH, corpus_key=saved_cache) is not None
+
+
+def test_saved_model_round_trips(saved_cache):
+    # user-001: a saved model loads back with the same arrays and generates the same cards as the trained one
+    cards = card_corpus.read_corpus(initialize.CARDS_CACHE_PATH)
+    trained = aggregator.build_model(aggregator.count_data(cards, CHUNK_LENGTH), CHUNK_LENGTH).format_probabilities()
+    loaded = initialize.load_saved_model(CHUNK_LENGTH, corpus_key=saved_cache)
+    for card_type in ("Creature", "Instant"):
+        assert loaded[card_type].vocabulary.tokens == trained[card_type].vocabulary.tokens
+        for name, values in trained[card_type].arrays().items():
+            assert list(loaded[card_type].arrays()[name]) == list(values), name
+        assert generate_card.generate_cards(loaded, card_type, 50, 11) == \
+            generate_card.generate_cards(trained, card_type, 50, 11)
+
+
+def test_every_chunk_length_is_trained_and_saved_in_one_pass(card_cache, monkeypatch):
+    # user-012: switching chunk length loads another saved model rather than retraining
+    model = initialize.initialize_aggregated_data(3, chunk_lengths=(2, 3, 4), card_types=["Instant"])
+    assert model.chunk_length == 3 and "Instant" in model.card_types
+    corpus_key = model_store.corpus_hash(card_cache)
+    assert model_store.saved_chunk_lengths(corpus_key) == [2, 3, 4]
+
+    def count_orders(*args, **kwargs):
+        raise AssertionError("The model was trained again")
+    monkeypatch.setattr(aggregator, "count_orders", count_orders)
+    for chunk_length in (2, 4):
+        model = initialize.initialize_aggregated_data(chunk_length, chunk_lengths=(2, 3, 4), card_types=["Instant"])
+        assert model.chunk_length == chunk_length
+        assert generate_card.generate_cards(model, "Instant", 5, 1)
+
+
+def test_saved_shards_carry_the_sampling_tables_as_views_onto_the_file(saved_cache):
+    # user-018: workers map the same file and read the alias tables and log weights from it rather than building
+    # a copy each
+    type_model = initialize.load_saved_model(CHUNK_LENGTH, corpus_key=saved_cache)["Creature"]
+    assert isinstance(type_model.alias_probabilities, memoryview)
+    assert isinstance(type_model.successor_targets, memoryview)
+    assert type_model.sampler.probabilities is type_model.alias_probabilities
+    probabilities, aliases = sampling.successor_alias_arrays(type_model.successor_offsets, type_model.successor_counts)
+    assert list(type_model.alias_probabilities) == list(probabilities)
+    assert list(type_model.alias_indices) == list(aliases)
+    for table in type_model.satellites.values():
+        assert isinstance(table.log_weights, memoryview)
+        assert list(table.log_weights) == list(probability_calculation.log_weights(table.counts))
@@ -0,0 +1,70 @@
+"""
+Tests of telling generated text apart from the text of real cards, and generated cards apart from each other (see
+novelty), as --novel-only and --unique do.
+"""
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.novelty as novelty
+import mtg_card_generator.generator.render_text as render_text
+
+from tests.synthetic_cards import make_cards
+
+
+@pytest.fixture(scope="module")
+def cards():
+    return make_cards(300, 9)
+
+
+@pytest.fixture(scope="module")
+def model(cards):
+    model = aggregator.gather_data(cards, chunk_length=3, card_types=["Instant"])
+    model.novelty = aggregator.build_novelty_index(cards)
+    return model
+
+
+def real_texts(cards, level):
+    """
+    Renders the rules text of the real cards as generated cards are rendered, or each line of it for "lines".
+    """
+    texts = [[tokens for tokens in tokenizer.read_tokens(lines) if tokens]
+             for card_type, c, lines in aggregator.preprocess(cards)]
+    if level == "lines":
+        return {render_text.render_words(tokens) for text in texts for tokens in text}
+    return {"\n".join(render_text.render_words(tokens) for tokens in text) for text in texts}
+
+
+def test_index_finds_the_lines_and_texts_of_real_cards():
+    index = novelty.NoveltyIndex.from_texts([[["draw", "a", "card", "."]], [["flying"], ["haste"], []]])
+    assert not index.is_novel([["draw", "a", "card", "."]])
+    assert not index.is_novel([["flying"], ["haste"]])
+    assert index.is_novel([["haste"], ["flying"]])
+    assert not index.is_novel([["haste"], ["flying"]], "lines")
+    assert index.is_novel([["haste"], ["draw", "a", "card"]], "lines")
+    assert index.is_novel([["draw", "a"], ["card", "."]])
+
+
+@pytest.mark.parametrize("level", novelty.NOVELTY_LEVELS)
+def test_novel_only_cards_copy_no_real_card(model, cards, level):
+    # user-020: a chunk length of 3 on few cards copies real cards often, which --novel-only must catch
+    real = real_texts(cards, level)
+
+    def copies(card):
+        lines = card["rendered_lines"].split("\n")
+        return all(line in real for line in lines) if level == "lines" else card["rendered_lines"] in real
+    assert any(copies(card) for card in generate_card.generate_cards(model, "Instant", 300, 1))
+    generated = generate_card.generate_cards(model, "Instant", 300, 1, novel_only=level)
+    assert len(generated) == 300
+    assert not any(copies(card) for card in generated)
+
+
+def test_unique_cards_drops_repeats_and_fills_the_blocks_back_up():
+    def card(text):
+        return {"type": "Instant", "rendered_lines": text}
+    blocks = [[card("a"), card("b"), card("a")], [card("b"), card("c")]]
+    replacements = iter([[card("c")], [card("d")], [card("e")]])
+    unique = list(novelty.unique_cards(blocks, lambda card_type, n, attempt: next(replacements)))
+    assert unique == [[card("a"), card("b"), card("c")], [card("d"), card("e")]]
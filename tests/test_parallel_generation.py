@@ -0,0 +1,34 @@
+"""
+Tests that generating the blocks of a seeded run on a pool of processes (see parallel_generation) gives the cards of
+generating them in turn in one process, as make_mtg_card gives the same cards with -j 1 and -j 3.
+"""
+
+import functools
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.generate_card as generate_card
+import mtg_card_generator.generator.parallel_generation as parallel_generation
+
+from tests.synthetic_cards import make_cards
+
+
+@functools.lru_cache(maxsize=None)
+def load_model():
+    cards = make_cards(300, 8)
+    model = aggregator.gather_data(cards, chunk_length=2)
+    model.novelty = aggregator.build_novelty_index(cards)
+    return model
+
+
+@pytest.mark.parametrize("options", [{}, {"conditions": {"colors": ["Blue"]}, "max_line_chunks": 4},
+                                     {"novel_only": "lines"}])
+def test_parallel_blocks_match_serial_blocks(options):
+    # user-017: every block is generated from a seed of its own, so the blocks can be spread over processes
+    requests = [("Creature", generate_card.BLOCK_SIZE + 150), ("Instant", 40)]
+    serial = [block for card_type, n in requests
+              for block in generate_card.generate_blocks(load_model(), card_type, n, 42, **options)]
+    parallel = list(parallel_generation.generate_parallel(load_model, requests, 42, 3, **options))
+    assert [len(block) for block in parallel] == [generate_card.BLOCK_SIZE, 150, 40]
+    assert parallel == serial
@@ -0,0 +1,32 @@
+"""
+Tests that rendering a line by joining the text rendered once for each of its chunks (see render_text.render_line)
+gives the text of rendering its words one by one.
+"""
+
+import random
+
+import pytest
+
+import mtg_card_generator.benchmarks.synthetic_corpus as synthetic_corpus
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.render_text as render_text
+
+
+@pytest.mark.parametrize("chunk_length", [2, 3])
+def test_rendering_by_join_matches_rendering_word_by_word(chunk_length):
+    # user-019: each chunk is rendered once and kept, and lines are rendered by joining the chunks' text
+    model = aggregator.gather_data(synthetic_corpus.synthetic_cards(1000, 1), chunk_length,
+                                   card_types=["Creature", "Planeswalker"])
+    for card_type in ("Creature", "Planeswalker"):
+        type_model = model[card_type]
+        for lines in type_model.sampler.walk_batch(300, random.Random(chunk_length)):
+            for line in lines:
+                chunks = [type_model.chunk(i) for i in line]
+                assert render_text.render_line(chunks) == render_text.render_words(type_model.line_tokens(line))
+                # Rendering again reads the kept text of every chunk
+                assert render_text.render_line(chunks) == render_text.render_words(type_model.line_tokens(line))
+
+
+def test_render_words_spaces_words_but_not_punctuation():
+    assert render_text.render_words(["~", "deals", "3", "damage", "to", "target", "player", "'s", "face", "."]) == \
+        " ~ deals 3 damage to target player's face."
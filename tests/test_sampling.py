@@ -0,0 +1,70 @@
+"""
+Tests of the alias tables walks draw from (see sampling): each table must give every key exactly the probability of
+its weight, whether it is built for a dictionary, a row of the successor arrays or the model's saved arrays.
+"""
+
+import random
+
+import pytest
+
+import mtg_card_generator.data_processing.card_data_aggregator.aggregator as aggregator
+import mtg_card_generator.generator.sampling as sampling
+
+from tests.synthetic_cards import make_cards
+
+
+def table_probabilities(probabilities, aliases):
+    """
+    Returns the probability of drawing each index from an alias table: a slot is picked uniformly, then kept with
+    its keep probability or exchanged for its alias.
+    """
+    size = len(probabilities)
+    drawn = [0.0] * size
+    for i, (keep, alias) in enumerate(zip(probabilities, aliases)):
+        drawn[i] += keep / size
+        drawn[alias] += (1.0 - keep) / size
+    return drawn
+
+
+@pytest.mark.parametrize("weights", [[1], [3, 1], [1, 1, 1, 1], [5, 0, 2, 9, 1], [0.25, 1e-3, 7.5]])
+def test_alias_table_draws_each_index_in_proportion_to_its_weight(weights):
+    # user-002: walks draw from alias tables rather than building a cumulative list for every step
+    total = sum(weights)
+    drawn = table_probabilities(*sampling.alias_table(weights))
+    assert drawn == pytest.approx([w / total for w in weights])
+
+
+def test_alias_table_draws_match_the_dictionary():
+    table = sampling.AliasTable({"a": 1, "b": 0, "c": 3})
+    rng = random.Random(0)
+    draws = [table.draw(rng) for i in range(40000)]
+    assert draws.count("b") == 0
+    assert draws.count("c") / len(draws) == pytest.approx(0.75, abs=0.01)
+    with pytest.raises(ValueError):
+        sampling.AliasTable({})
+
+
+def test_successor_alias_arrays_hold_a_table_per_row():
+    # Three rows of successors, one of them with no weight at all
+    offsets, counts = [0, 2, 5, 7], [4, 1, 1, 1, 2, 0, 0]
+    probabilities, aliases = sampling.successor_alias_arrays(offsets, counts)
+    for start, end in zip(offsets, offsets[1:]):
+        row = counts[start:end]
+        assert all(0 <= a < end - start for a in aliases[start:end])
+        expected = [c / sum(row) for c in row] if sum(row) else [1 / len(row)] * len(row)
+        assert table_probabilities(probabilities[start:end], aliases[start:end]) == pytest.approx(expected)
+
+
+def test_draw_successor_follows_the_successor_counts():
+    type_model = aggregator.gather_data(make_cards(400, 0), chunk_length=2)["Creature"]
+    sampler = sampling.ChainSampler(type_model)
+    chunk = max(range(len(type_model)),
+                key=lambda c: type_model.successor_offsets[c + 1] - type_model.successor_offsets[c])
+    start, end = type_model.successor_offsets[chunk], type_model.successor_offsets[chunk + 1]
+    counts = dict(zip(type_model.successor_targets[start:end], type_model.successor_counts[start:end]))
+    assert len(counts) > 1
+    rng = random.Random(1)
+    draws = [sampler.draw_successor(chunk, rng) for i in range(20000)]
+    total = sum(counts.values())
+    for target, count in counts.items():
+        assert draws.count(target) / len(draws) == pytest.approx(count / total, abs=0.015)
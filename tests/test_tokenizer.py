@@ -0,0 +1,36 @@
+"""
+Tests the rules text tokenizer against lines whose tokens are as nltk.tokenize.word_tokenize gives them.
+benchmarks/tokenizer_conformance.py compares the two on the whole card cache when nltk is installed.
+"""
+
+import pytest
+
+import mtg_card_generator.data_processing.word_processing.tokenizer as tokenizer
+
+GOLDEN = [
+    ("Flying", ["Flying"]),
+    ("{T}: Add {G}.", ["{", "T", "}", ":", "Add", "{", "G", "}", "."]),
+    ("~ gets +1/+1 until end of turn.", ["~", "gets", "+1/+1", "until", "end", "of", "turn", "."]),
+    ("+1: Put a +1/+1 counter on up to one target creature.",
+     ["+1", ":", "Put", "a", "+1/+1", "counter", "on", "up", "to", "one", "target", "creature", "."]),
+    ("−3: Destroy target creature.", ["−3", ":", "Destroy", "target", "creature", "."]),
+    ("Creatures you control don't untap.", ["Creatures", "you", "control", "do", "n't", "untap", "."]),
+    ("~'s power is equal to the number of cards in your hand.",
+     ["~", "'s", "power", "is", "equal", "to", "the", "number", "of", "cards", "in", "your", "hand", "."]),
+    ("Draw a card, then discard a card.", ["Draw", "a", "card", ",", "then", "discard", "a", "card", "."]),
+    ("Destroy target creature. Its controller gains 3 life.",
+     ["Destroy", "target", "creature", ".", "Its", "controller", "gains", "3", "life", "."]),
+    ("Search your library for a basic land card (e.g. a Forest).",
+     ["Search", "your", "library", "for", "a", "basic", "land", "card", "(", "e.g.", "a", "Forest", ")", "."]),
+    ("Choose one —", ["Choose", "one", "—"]),
+]
+
+
+@pytest.mark.parametrize("line, tokens", GOLDEN)
+def test_word_tokenize(line, tokens):
+    assert tokenizer.word_tokenize(line) == tokens
+
+
+def test_read_tokens_lowercases_each_line():
+    assert tokenizer.read_tokens(["Flying", "{T}: Add {G}."]) == [["flying"],
+                                                                  ["{", "t", "}", ":", "add", "{", "g", "}", "."]]